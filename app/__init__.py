@@ -6,8 +6,19 @@ def create_app():
     print("DEBUG: >>> INSIDE create_app() IN app/__init__.py <<<", flush=True)
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'secret_key_for_production_env' 
+    app.config.from_object('config.Config')
 
-  
+    from . import catalog, data_manager, fragment_cache, identity_map, password_hashing, sqlite_store, sales_journal, sales_segments
+    from . import static_assets
+    data_manager.configure(app.config)
+    catalog.configure(app.config)
+    fragment_cache.configure(app.config)
+    password_hashing.configure(app.config)
+    identity_map.init_app(app)
+    static_assets.init_app(app)
+    app.cli.add_command(sqlite_store.import_json_command)
+    app.cli.add_command(sales_journal.compact_sales_command)
+    app.cli.add_command(sales_segments.partition_sales_command)
 
     # Register blueprints
     from .features.home import home_bp
@@ -0,0 +1,144 @@
+# artproject/app/catalog.py
+# Shared, versioned snapshot of the catalog (trips and merchandise). Every request
+# thread reads the same snapshot with no lock and no store access; a change is
+# published as a whole new snapshot (copy-on-write) that replaces the old one in a
+# single reference swap, so a reader sees either the old catalog or the new one.
+#
+# data_manager publishes each committed seat, stock or item change as soon as it
+# is written. Changes made by other worker processes are noticed through
+# data_manager.catalog_source_key(), checked at most every CHECK_INTERVAL seconds.
+# A publish only moves the snapshot's key on to the one taken right after the
+# write if the snapshot matched the store right before it; otherwise the store
+# also holds changes the snapshot lacks, and the next check reloads it.
+# The version number only grows, so it can key caches of anything built from the
+# catalog. Stored records are shared by every snapshot: treat them as read-only.
+# Version numbers are local to this process; fingerprint() is a digest of the
+# records themselves and so is the same in every worker (e.g. for HTTP ETags).
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Iterable, Optional
+
+from app import data_manager
+
+CHECK_INTERVAL = float(os.environ.get('ART_CATALOG_CHECK_INTERVAL', '1.0'))
+
+_STORES = {"trips": "id", "merchandise": "merchandiseID"} # store name -> key field
+
+
+class CatalogSnapshot:
+    __slots__ = ('version', 'trips', 'merchandise', 'source_key', 'modified_at', 'store_versions', '_fingerprints')
+
+    def __init__(self, version: int, trips: dict, merchandise: dict, source_key, modified_at: dict,
+                 store_versions: dict):
+        self.version = version
+        self.trips = MappingProxyType(trips) # trip ID -> record, in store order
+        self.merchandise = MappingProxyType(merchandise) # merchandiseID -> record, in store order
+        self.source_key = MappingProxyType(source_key) # data_manager.catalog_source_key() this snapshot matches
+        self.modified_at = MappingProxyType(modified_at) # store name -> time.time() it last changed (or was loaded)
+        self.store_versions = MappingProxyType(store_versions) # store name -> snapshot version it last changed in
+        self._fingerprints = {} # store name -> digest, filled in on first use
+
+    def records(self, store_name: str):
+        return self.trips if store_name == "trips" else self.merchandise
+
+    def fingerprint(self, store_name: str) -> str:
+        """Digest of one store's records in this snapshot; equal snapshots give equal digests in any process."""
+        digest = self._fingerprints.get(store_name)
+        if digest is None:
+            encoded = json.dumps(list(self.records(store_name).values()), sort_keys=True, separators=(',', ':'))
+            digest = self._fingerprints[store_name] = hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+        return digest
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_checked_at = 0.0
+_versions = itertools.count(1)
+_publish_lock = threading.Lock() # Serialises publishers only; readers just take the current reference
+
+
+def configure(config):
+    global CHECK_INTERVAL
+    CHECK_INTERVAL = float(config.get('CATALOG_CHECK_INTERVAL', CHECK_INTERVAL))
+    invalidate() # The storage backend may have changed
+
+
+def get_snapshot() -> CatalogSnapshot:
+    """The current catalog snapshot, loaded on first use."""
+    global _checked_at
+    snapshot = _snapshot
+    if snapshot is None:
+        return _reload()
+    now = time.monotonic()
+    if now - _checked_at >= CHECK_INTERVAL:
+        _checked_at = now
+        if data_manager.catalog_source_key() != dict(snapshot.source_key): # Changed by another process
+            return _reload()
+    return snapshot
+
+
+def version() -> int:
+    return get_snapshot().version
+
+
+def _keyed(records: Iterable[dict], key_field: str) -> dict:
+    return {record.get(key_field): record for record in records if isinstance(record, dict)}
+
+
+def _reload() -> CatalogSnapshot:
+    global _snapshot, _checked_at
+    with _publish_lock:
+        # Taken before reading, so a write in between leaves the snapshot looking stale, not fresh
+        source_key = data_manager.catalog_source_key()
+        if _snapshot is not None and dict(_snapshot.source_key) == source_key:
+            return _snapshot # Another thread reloaded first
+        now, version = time.time(), next(_versions)
+        _snapshot = CatalogSnapshot(version,
+                                    _keyed(data_manager.get_all_trips_data() or [], "id"),
+                                    _keyed(data_manager.get_all_merchandise_data() or [], "merchandiseID"),
+                                    source_key, {name: now for name in _STORES}, {name: version for name in _STORES})
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+def publish(store_name: str, records: Iterable[dict], source_change: Optional[tuple] = None):
+    """
+    Publishes a new snapshot with these just-committed trip or merchandise records
+    in place of the old ones (new ones are appended). A record older than the one
+    already in the snapshot is ignored, so out-of-order publishers cannot roll
+    the catalog back. source_change is the store's (source key before, after) the
+    write, both taken under the writer's lock; without it the snapshot keeps its
+    old key and is reloaded at the next check.
+    """
+    global _snapshot
+    key_field = _STORES[store_name]
+    with _publish_lock:
+        snapshot = _snapshot
+        if snapshot is None:
+            return # Nothing loaded yet; the first reader loads the current data
+        changed = dict(snapshot.records(store_name))
+        for record in records:
+            key = record.get(key_field)
+            current = changed.get(key)
+            if current is None or int(record.get("version") or 0) >= int(current.get("version") or 0):
+                changed[key] = record
+        trips = changed if store_name == "trips" else dict(snapshot.trips)
+        merchandise = changed if store_name == "merchandise" else dict(snapshot.merchandise)
+        source_key = dict(snapshot.source_key)
+        if source_change is not None and source_key.get(store_name) == source_change[0]:
+            source_key[store_name] = source_change[1] # Nothing but this write happened since the snapshot
+        version = next(_versions)
+        modified_at = dict(snapshot.modified_at, **{store_name: time.time()})
+        store_versions = dict(snapshot.store_versions, **{store_name: version})
+        _snapshot = CatalogSnapshot(version, trips, merchandise, source_key, modified_at, store_versions)
+
+
+def invalidate():
+    """Drops the snapshot (e.g. after a bulk save_all_*); the next reader loads a fresh one."""
+    global _snapshot
+    with _publish_lock:
+        _snapshot = None
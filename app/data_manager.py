@@ -1,6 +1,11 @@
+import contextlib
 import json
 import os
-import uuid # For generating other IDs like accountID, lineItemID
+import threading
+
+from app.file_lock import file_lock
+from app.indexes import DuplicateKeyError, GroupIndex, RecordIndex, email_key, field_key, normalized_email, order_time_key
+from app.versioning import apply_deltas, apply_versioned
 
 # Define root path for data files to be relative to the artproject directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # This should point to artproject root
@@ -10,27 +15,177 @@ SALES_FILE = os.path.join(BASE_DIR, 'sales.json')
 MERCHANDISE_FILE = os.path.join(BASE_DIR, 'merchandise_data.json')
 ACCOUNTS_FILE = os.path.join(BASE_DIR, 'accounts_data.json')
 TRIPS_FILE = os.path.join(BASE_DIR, 'trips.json') 
+SALES_SEGMENTS_DIR = os.path.join(BASE_DIR, 'sales_segments')
+SALES_JSONL_FILE = os.path.join(BASE_DIR, 'sales.jsonl')
+
+# Storage backend: "json" uses the files above, "sqlite" delegates to app.sqlite_store.
+# Set from app.config by configure(); the environment provides the default for scripts.
+STORAGE_BACKEND = os.environ.get('ART_STORAGE_BACKEND', 'json')
+# JSON backend only: append order saves to a journal instead of rewriting sales.json
+SALES_JOURNAL_ENABLED = os.environ.get('ART_SALES_JOURNAL', '0') == '1'
+SALES_JOURNAL_COMPACT_EVERY = int(os.environ.get('ART_SALES_JOURNAL_COMPACT_EVERY', '500'))
+_sales_journal = None
+# JSON backend only: store orders in monthly segment files instead of one sales.json
+SALES_PARTITIONED = os.environ.get('ART_SALES_PARTITIONED', '0') == '1'
+_sales_segments = None
+# JSON backend only: keep orders in a memory-mapped, offset-indexed JSONL file
+SALES_JSONL = os.environ.get('ART_SALES_JSONL', '0') == '1'
+_sales_jsonl = None
+# JSON backend only: funnel order/trip/merchandise saves through one batching writer thread
+GROUP_COMMIT_ENABLED = os.environ.get('ART_GROUP_COMMIT', '1') == '1'
+_group_writer = None
+# Numbers leased per ID sequence at a time (see _get_id_allocator)
+ID_BLOCK_SIZE = int(os.environ.get('ART_ID_BLOCK_SIZE', '20'))
+_id_allocator = None
+_singleton_lock = threading.Lock() # Guards lazy creation of the sales stores, writer and allocator above
+
+def configure(config):
+    """Applies storage settings from a Flask config (or any mapping)."""
+    global STORAGE_BACKEND, SALES_JOURNAL_ENABLED, SALES_JOURNAL_COMPACT_EVERY, _sales_journal, GROUP_COMMIT_ENABLED
+    global ID_BLOCK_SIZE, _id_allocator, SALES_PARTITIONED, SALES_SEGMENTS_DIR, _sales_segments
+    global SALES_JSONL, SALES_JSONL_FILE, _sales_jsonl
+    STORAGE_BACKEND = config.get('STORAGE_BACKEND', STORAGE_BACKEND)
+    SALES_JOURNAL_ENABLED = bool(config.get('SALES_JOURNAL', SALES_JOURNAL_ENABLED))
+    SALES_JOURNAL_COMPACT_EVERY = int(config.get('SALES_JOURNAL_COMPACT_EVERY', SALES_JOURNAL_COMPACT_EVERY))
+    SALES_PARTITIONED = bool(config.get('SALES_PARTITIONED', SALES_PARTITIONED))
+    SALES_SEGMENTS_DIR = config.get('SALES_SEGMENTS_DIR') or SALES_SEGMENTS_DIR
+    SALES_JSONL = bool(config.get('SALES_JSONL', SALES_JSONL))
+    SALES_JSONL_FILE = config.get('SALES_JSONL_FILE') or SALES_JSONL_FILE
+    GROUP_COMMIT_ENABLED = bool(config.get('GROUP_COMMIT', GROUP_COMMIT_ENABLED))
+    ID_BLOCK_SIZE = int(config.get('ID_BLOCK_SIZE', ID_BLOCK_SIZE))
+    _sales_journal = None # Rebuilt with the new settings on next use
+    _sales_segments = None
+    _sales_jsonl = None
+    _id_allocator = None
+    if STORAGE_BACKEND not in ('json', 'sqlite'):
+        raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Expected 'json' or 'sqlite'.")
+    if sum((SALES_JOURNAL_ENABLED, SALES_PARTITIONED, SALES_JSONL)) > 1:
+        raise ValueError("Enable at most one of SALES_JOURNAL, SALES_PARTITIONED and SALES_JSONL.")
+    if config.get('SQLITE_DATABASE'):
+        from app import sqlite_store
+        sqlite_store.configure(config['SQLITE_DATABASE'])
+
+def get_sales_journal():
+    """Returns the shared SalesJournal when the JSON backend runs in journal mode, else None."""
+    global _sales_journal
+    if STORAGE_BACKEND != 'json' or not SALES_JOURNAL_ENABLED:
+        return None
+    with _singleton_lock:
+        if _sales_journal is None:
+            from app.sales_journal import SalesJournal
+            _sales_journal = SalesJournal(SALES_FILE, compact_every=SALES_JOURNAL_COMPACT_EVERY)
+        return _sales_journal
+
+def get_sales_segments():
+    """Returns the shared SegmentedSalesStore when the JSON backend partitions sales by month, else None."""
+    global _sales_segments
+    if STORAGE_BACKEND != 'json' or not SALES_PARTITIONED:
+        return None
+    with _singleton_lock:
+        if _sales_segments is None:
+            from app.sales_segments import SegmentedSalesStore
+            _sales_segments = SegmentedSalesStore(SALES_SEGMENTS_DIR, SALES_FILE, _commit_records_to_file)
+        return _sales_segments
+
+def get_sales_jsonl():
+    """Returns the shared JsonlSalesStore when the JSON backend keeps orders in sales.jsonl, else None."""
+    global _sales_jsonl
+    if STORAGE_BACKEND != 'json' or not SALES_JSONL:
+        return None
+    with _singleton_lock:
+        if _sales_jsonl is None:
+            from app.sales_jsonl import JsonlSalesStore
+            _sales_jsonl = JsonlSalesStore(SALES_JSONL_FILE, legacy_path=SALES_FILE)
+        return _sales_jsonl
+
+def _sales_store():
+    """
+    The order store that replaces plain sales.json, if one is enabled: the journal,
+    monthly segments or JSONL file. All three offer get, get_by_account, iter_all,
+    replace_all and save_versioned.
+    """
+    return get_sales_journal() or get_sales_segments() or get_sales_jsonl()
+
+def get_group_writer():
+    """Returns the shared GroupCommitWriter when group commit applies, else None."""
+    global _group_writer
+    if STORAGE_BACKEND != 'json' or not GROUP_COMMIT_ENABLED:
+        return None
+    with _singleton_lock:
+        if _group_writer is None:
+            from app.group_commit import GroupCommitWriter
+            _group_writer = GroupCommitWriter(_commit_record_batch)
+        return _group_writer
+
+def _sqlite_backend():
+    """Returns the sqlite_store module when the SQLite backend is selected, else None."""
+    if STORAGE_BACKEND == 'sqlite':
+        from app import sqlite_store
+        return sqlite_store
+    return None
+
+# --- ID Allocation ---
+# Every ID comes from a BlockIdAllocator: each process leases ID_BLOCK_SIZE numbers
+# per sequence at a time (under an OS file lock, or in one SQLite transaction) and
+# issues them from memory. Leased numbers left unused when a worker exits are skipped.
+def _get_id_allocator():
+    global _id_allocator
+    with _singleton_lock:
+        if _id_allocator is None:
+            from app.id_allocator import BlockIdAllocator
+            _id_allocator = BlockIdAllocator(_reserve_id_block, block_size=ID_BLOCK_SIZE)
+        return _id_allocator
+
+def _counter_file(sequence):
+    if sequence == "order":
+        return ORDER_COUNTER_FILE
+    return os.path.join(BASE_DIR, f'{sequence}_counter.txt')
+
+def _highest_numbered_id(records, key_field, prefix):
+    highest = 0
+    for record in records:
+        value = str(record.get(key_field) or "")
+        if value.startswith(prefix) and value[len(prefix):].isdigit():
+            highest = max(highest, int(value[len(prefix):]))
+    return highest
+
+def _sequence_seed(sequence):
+    """First value for a sequence with no stored counter: one past the highest ID already in the data."""
+    if sequence == "order":
+        return max(1000, _highest_numbered_id(get_all_sales_data(), "orderID", "ORD") + 1)
+    if sequence == "account":
+        return _highest_numbered_id(get_all_accounts_data(), "accountID", "acc") + 1
+    return 1
+
+def _reserve_id_block(sequence, block_size):
+    store = _sqlite_backend()
+    if store:
+        return store.reserve_id_block(sequence, block_size, _sequence_seed)
+    counter_file = _counter_file(sequence)
+    with file_lock(counter_file + '.lock'):
+        try:
+            with open(counter_file, 'r') as f:
+                start = int(f.read().strip())
+        except (FileNotFoundError, ValueError): # Missing or unreadable counter
+            start = _sequence_seed(sequence)
+        tmp_path = counter_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(start + block_size))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, counter_file)
+    return start
 
 def generate_unique_id(prefix=""):
-    return prefix + str(uuid.uuid4().hex)[:8] # Shorter unique ID
+    # Nine digits, so new IDs can never equal the older 8-character random hex IDs
+    return f"{prefix}{_get_id_allocator().next_value(prefix or 'id'):09d}"
 
 # --- Order Counter ---
 def get_next_order_id():
-    try:
-        with open(ORDER_COUNTER_FILE, 'r') as f:
-            current_id = int(f.read().strip())
-        next_id_str = f"ORD{current_id}" # Add prefix
-        with open(ORDER_COUNTER_FILE, 'w') as f:
-            f.write(str(current_id + 1))
-        return next_id_str
-    except FileNotFoundError:
-        with open(ORDER_COUNTER_FILE, 'w') as f:
-            f.write('1001') # Start from 1001 if file not found
-        return "ORD1000"
-    except ValueError: # If file content is not an int
-         with open(ORDER_COUNTER_FILE, 'w') as f:
-            f.write('1001')
-         return "ORD1000"
+    return f"ORD{_get_id_allocator().next_value('order')}"
+
+def get_next_account_id():
+    return f"acc{_get_id_allocator().next_value('account'):03d}"
 
 
 # --- Generic JSON Read/Write ---
@@ -53,65 +208,543 @@ def write_json_file(filepath, data):
     with open(filepath, 'w') as f:
         json.dump(data, f, indent=2)
 
+
+def write_json_file_atomic(filepath, data):
+    """Writes via a temp file + fsync + rename, so readers never see a half-written file."""
+    tmp_path = filepath + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+
+
+# --- Parsed File Cache ---
+# Keeps the parsed contents of each data file in memory so repeated reads in one
+# request (or across requests) skip the open + json.loads. An entry is reused only
+# while the file's (inode, mtime, size) and our own save generation are unchanged,
+# so edits made by another process or by a save_all_* call force a re-read. Every
+# write replaces the file (write_json_file_atomic), so the inode changes even when
+# a write lands in the same mtime tick and leaves the size as it was.
+# Cached data is shared between callers: treat it as read-only. Saves build new
+# lists (copy-on-write) rather than editing the cached ones.
+_cache_lock = threading.Lock()
+_file_cache = {} # filepath -> {"stat_key", "generation", "data", "indexes"}
+_file_generations = {} # filepath -> number of saves made by this process
+_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def _file_stat_key(filepath):
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _get_cache_entry(filepath):
+    stat_key = _file_stat_key(filepath)
+    with _cache_lock:
+        generation = _file_generations.get(filepath, 0)
+        entry = _file_cache.get(filepath)
+        if entry is not None and stat_key is not None and entry["stat_key"] == stat_key and entry["generation"] == generation:
+            _cache_stats["hits"] += 1
+            return entry
+        _cache_stats["misses"] += 1
+
+    # Parse outside the lock; the stat key was taken first, so a concurrent write
+    # can only make this entry look stale, never fresher than it is.
+    entry = {"stat_key": stat_key, "generation": generation, "data": read_json_file(filepath), "indexes": {}}
+    if stat_key is not None:
+        with _cache_lock:
+            if _file_generations.get(filepath, 0) == generation:
+                _file_cache[filepath] = entry
+    return entry
+
+def read_json_file_cached(filepath):
+    return _get_cache_entry(filepath)["data"]
+
+def _install_cache_entry(filepath, data, indexes):
+    """Caches data this process just wrote, so the next read needs no re-parse."""
+    with _cache_lock:
+        generation = _file_generations.get(filepath, 0) + 1
+        _file_generations[filepath] = generation
+        _file_cache[filepath] = {"stat_key": _file_stat_key(filepath), "generation": generation,
+                                 "data": data, "indexes": indexes}
+
+def invalidate_cache(filepath):
+    with _cache_lock:
+        _file_generations[filepath] = _file_generations.get(filepath, 0) + 1
+        _file_cache.pop(filepath, None)
+        _cache_stats["invalidations"] += 1
+
+def write_json_file_invalidating(filepath, data):
+    try:
+        write_json_file_atomic(filepath, data) # Replaced, not rewritten in place: see _file_stat_key
+    finally:
+        # Invalidate even when the write fails, so the cache never gets ahead of the disk
+        invalidate_cache(filepath)
+
+def get_cache_stats():
+    """Returns hit/miss counters and the number of files currently cached."""
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["cached_files"] = len(_file_cache)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] / lookups) if lookups else 0.0
+    return stats
+
+def clear_cache(reset_stats=False):
+    with _cache_lock:
+        for filepath in list(_file_cache):
+            _file_generations[filepath] = _file_generations.get(filepath, 0) + 1
+        _file_cache.clear()
+        if reset_stats:
+            for key in _cache_stats:
+                _cache_stats[key] = 0
+
+
+# --- Primary-key / Email Indexes ---
+# Built lazily per cached file version and dropped with it, so they always match
+# the cached data. Group-commit saves patch the primary-key index copy-on-write.
+_INDEX_KEYS = {
+    "accountID": field_key("accountID"),
+    "email": email_key, # Lower-cased, so lookups and uniqueness ignore case
+    "merchandiseID": field_key("merchandiseID"),
+    "orderID": field_key("orderID"),
+    "id": field_key("id"),
+}
+
+# Secondary (one-to-many) indexes: name -> (group key function, sort key function)
+_GROUP_INDEXES = {
+    "placingAccountID": (field_key("placingAccountID"), order_time_key),
+}
+
+def _index_for_entry(entry, index_name):
+    index = entry["indexes"].get(index_name)
+    if index is None:
+        if index_name in _GROUP_INDEXES:
+            index = GroupIndex(entry["data"], *_GROUP_INDEXES[index_name])
+        else:
+            index = RecordIndex(entry["data"], _INDEX_KEYS[index_name])
+        entry["indexes"][index_name] = index # Benign race: two threads may build the same index
+    return index
+
+def get_record_index(filepath, index_name):
+    """Returns the index (RecordIndex, or GroupIndex for one-to-many keys) over the current contents of `filepath`."""
+    return _index_for_entry(_get_cache_entry(filepath), index_name)
+
+def _records_by_ids(filepath, key_field, ids):
+    """Records with the given keys (unknown ones skipped), in the order asked for, from one read of the file."""
+    index = get_record_index(filepath, key_field)
+    return [record for key in ids if (record := index.get(key)) is not None]
+
+# --- Group Commit ---
+_RECORD_STORES = {
+    # store name -> (data file, primary key field)
+    "sales": (SALES_FILE, "orderID"),
+    "trips": (TRIPS_FILE, "id"),
+    "merchandise": (MERCHANDISE_FILE, "merchandiseID"),
+}
+
+def _commit_record_batch(store_name, items):
+    """
+    Applies a batch of (record, expected_version) saves to one store with a single
+    write. Returns one result per item: the record's new version, or the
+    VersionConflictError it was rejected with. Runs on the writer thread, or on the
+    caller's thread when group commit is off.
+    """
+    sales_store = _sales_store() if store_name == "sales" else None
+    if sales_store:
+        return sales_store.save_versioned(items)
+    filepath, key_field = _RECORD_STORES[store_name]
+    source_changes = {}
+    results = _commit_records_to_file(filepath, key_field, items, source_changes)
+    _catalog_changed(store_name, [dict(record, version=result) for (record, _), result in zip(items, results)
+                                  if not isinstance(result, Exception)], source_changes.get(filepath))
+    return results
+
+def _catalog_changed(store_name, records=None, source_change=None):
+    """
+    Publishes committed trip/merchandise records to the shared catalog; records=None
+    reloads it. source_change is the store's (key before, key after) the write, as
+    in catalog_source_key(), taken while the write still held the store's lock.
+    """
+    if store_name not in ("trips", "merchandise"):
+        return
+    from app import catalog
+    if records is None:
+        catalog.invalidate()
+    elif records:
+        catalog.publish(store_name, records, source_change)
+
+def catalog_source_key():
+    """{"trips": key, "merchandise": key}, each changing whenever that store is written, by any process (see app.catalog)."""
+    store = _sqlite_backend()
+    if store:
+        return store.catalog_source_key()
+    return {"trips": _file_stat_key(TRIPS_FILE), "merchandise": _file_stat_key(MERCHANDISE_FILE)}
+
+def _commit_records_to_file(filepath, key_field, items, source_changes=None):
+    """
+    Applies (record, expected_version) saves to one JSON file with a single atomic
+    write. If it writes, source_changes (when given) gets {filepath: (stat key
+    before, stat key after)}, both taken under the file lock.
+    """
+    written = None
+    try:
+        # The OS lock keeps other worker processes from interleaving their read-modify-write
+        with file_lock(filepath + '.lock'):
+            # Re-validated under the lock, so the cached copy is the file as it is now
+            entry = _get_cache_entry(filepath)
+            index = _index_for_entry(entry, key_field)
+            records, results = apply_versioned(items, key_field, index.get)
+            if not records:
+                return results # Every save conflicted; nothing to write
+            data, new_indexes = _upserted_entry(entry, key_field, records)
+            write_json_file_atomic(filepath, data)
+            written = (data, new_indexes)
+            if source_changes is not None:
+                source_changes[filepath] = (entry["stat_key"], _file_stat_key(filepath))
+            return results
+    finally:
+        if written:
+            _install_cache_entry(filepath, *written)
+        else:
+            invalidate_cache(filepath)
+
+def _upserted_entry(entry, key_field, records):
+    """(data, indexes) for a cache entry with `records` upserted, patching its indexes rather than rebuilding them."""
+    data, new_index = _index_for_entry(entry, key_field).upserted(records)
+    new_indexes = {key_field: new_index}
+    changed_positions = {new_index.position(record.get(key_field)) for record in records}
+    changed_positions.discard(None)
+    for name, existing in list(entry["indexes"].items()):
+        if name != key_field: # Secondary indexes (e.g. email, placingAccountID) are patched, not rebuilt
+            new_indexes[name] = existing.patched(data, changed_positions)
+    return data, new_indexes
+
+def _save_versioned(store_name, record, expected_version):
+    """Saves one record to a JSON-backed store; returns its new version or raises VersionConflictError."""
+    writer = get_group_writer()
+    if writer:
+        return writer.submit(store_name, (record, expected_version)) # Blocks until the batch is written
+    result = _commit_record_batch(store_name, [(record, expected_version)])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+# --- Unit of Work ---
+def commit_unit_of_work(saves, deltas):
+    """
+    Commits everything one business operation changed (see app.unit_of_work):
+    saves is {store name: [(record, expected_version)]}, deltas is
+    {store name: {(key, field): change}} for trip seats and stock levels.
+    Either every change is written, each store once, or none is: conflicts and
+    shortfalls are found before anything is written, and stores already written
+    are restored if a later one fails. Returns {store name: {key: saved record}}.
+    """
+    store = _sqlite_backend()
+    source_changes = {} # store name -> (source key before, after), see _catalog_changed
+    if store:
+        committed = store.commit_unit_of_work(saves, deltas, source_changes)
+    else:
+        committed = _commit_unit_of_work_to_files(saves, deltas, source_changes)
+    for name, records in committed.items():
+        _catalog_changed(name, list(records.values()), source_changes.get(name))
+    return committed
+
+def _commit_unit_of_work_to_files(saves, deltas, source_changes):
+    if "sales" in deltas:
+        raise ValueError("Orders do not support delta updates.")
+    committed = {}
+    restore = [] # (filepath, data before this commit) of files already replaced
+    file_stores = sorted((set(saves) | set(deltas)) - {"sales"})
+    with contextlib.ExitStack() as locks:
+        # Locks taken in a fixed order, so two operations can never wait on each other
+        for name in file_stores:
+            locks.enter_context(file_lock(_RECORD_STORES[name][0] + '.lock'))
+        prepared = []
+        for name in file_stores:
+            filepath, key_field = _RECORD_STORES[name]
+            entry = _get_cache_entry(filepath)
+            index = _index_for_entry(entry, key_field)
+            items = apply_deltas(deltas.get(name, {}), index.get) + list(saves.get(name, ()))
+            records, results = apply_versioned(items, key_field, index.get)
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+            prepared.append((name, filepath, entry, _upserted_entry(entry, key_field, records)))
+            committed[name] = {record.get(key_field): record for record in records}
+        try:
+            for name, filepath, entry, written in prepared:
+                write_json_file_atomic(filepath, written[0])
+                restore.append((filepath, entry["data"]))
+                source_changes[name] = (entry["stat_key"], _file_stat_key(filepath)) # Still under the lock
+                _install_cache_entry(filepath, *written)
+            # Orders go last, through whichever sales store is active; they are the one
+            # write that can still be rejected (their store is not locked above)
+            if saves.get("sales"):
+                results = _commit_record_batch("sales", saves["sales"])
+                for result in results:
+                    if isinstance(result, Exception):
+                        raise result
+                committed["sales"] = {record.get("orderID"): dict(record, version=version)
+                                      for (record, _), version in zip(saves["sales"], results)}
+        except BaseException:
+            for filepath, previous in reversed(restore):
+                try:
+                    write_json_file_atomic(filepath, previous)
+                finally:
+                    invalidate_cache(filepath)
+            raise
+    return committed
+
 # --- Accounts Data ---
 def get_all_accounts_data():
-    return read_json_file(ACCOUNTS_FILE)
+    store = _sqlite_backend()
+    if store:
+        return store.get_all_accounts_data()
+    return read_json_file_cached(ACCOUNTS_FILE)
 
 def save_all_accounts_data(accounts_data):
-    write_json_file(ACCOUNTS_FILE, accounts_data)
+    store = _sqlite_backend()
+    if store:
+        return store.save_all_accounts_data(accounts_data)
+    write_json_file_invalidating(ACCOUNTS_FILE, accounts_data)
+
+def create_account_data(account_data):
+    """
+    Inserts a new account. Raises DuplicateKeyError (a ValueError) if its accountID,
+    or its email compared case-insensitively, is already taken; the check and the
+    write happen under one lock, so two concurrent sign-ups cannot both claim an email.
+    """
+    store = _sqlite_backend()
+    if store:
+        return store.create_account_data(account_data)
+    _commit_account(account_data, create=True)
+
+def save_account_data(account_data):
+    """Inserts or updates a single account record; its email must not belong to another account."""
+    store = _sqlite_backend()
+    if store:
+        return store.save_account_data(account_data)
+    _commit_account(account_data, create=False)
+
+def _commit_account(account_data, create):
+    written = None
+    try:
+        with file_lock(ACCOUNTS_FILE + '.lock'):
+            entry = _get_cache_entry(ACCOUNTS_FILE) # Re-validated under the lock
+            by_id = _index_for_entry(entry, "accountID")
+            by_email = _index_for_entry(entry, "email")
+            account_id = account_data.get("accountID")
+            if create and account_id in by_id:
+                raise DuplicateKeyError(f"Account ID {account_id} is already in use.")
+            owner = by_email.get(email_key(account_data))
+            if owner is not None and owner.get("accountID") != account_id:
+                raise DuplicateKeyError('That email address is already registered.')
+            data, new_indexes = _upserted_entry(entry, "accountID", [account_data]) # Patches both indexes
+            write_json_file_atomic(ACCOUNTS_FILE, data)
+            written = (data, new_indexes)
+    finally:
+        if written:
+            _install_cache_entry(ACCOUNTS_FILE, *written)
+        else:
+            invalidate_cache(ACCOUNTS_FILE)
 
 def get_account_by_id_data(account_id):
-    accounts = get_all_accounts_data()
-    for acc in accounts:
-        if acc.get("accountID") == account_id:
-            return acc
-    return None
+    store = _sqlite_backend()
+    if store:
+        return store.get_account_by_id_data(account_id)
+    return get_record_index(ACCOUNTS_FILE, "accountID").get(account_id)
+
+def get_accounts_by_ids_data(account_ids):
+    store = _sqlite_backend()
+    if store:
+        return store.get_accounts_by_ids_data(list(account_ids))
+    return _records_by_ids(ACCOUNTS_FILE, "accountID", account_ids)
 
 def get_account_by_email_data(email):
-    accounts = get_all_accounts_data()
-    for acc in accounts:
-        if acc.get("email") == email:
-            return acc
-    return None
+    store = _sqlite_backend()
+    if store:
+        return store.get_account_by_email_data(email)
+    return get_record_index(ACCOUNTS_FILE, "email").get(normalized_email(email))
 
 # --- Merchandise Data ---
 def get_all_merchandise_data():
-    return read_json_file(MERCHANDISE_FILE)
+    store = _sqlite_backend()
+    if store:
+        return store.get_all_merchandise_data()
+    return read_json_file_cached(MERCHANDISE_FILE)
 
 def save_all_merchandise_data(merch_data): # For updating stock
-    write_json_file(MERCHANDISE_FILE, merch_data)
+    store = _sqlite_backend()
+    if store:
+        store.save_all_merchandise_data(merch_data)
+    else:
+        write_json_file_invalidating(MERCHANDISE_FILE, merch_data)
+    _catalog_changed("merchandise")
+
+def save_merchandise_data(item_data, expected_version=None):
+    """
+    Inserts or updates a single merchandise record and returns its new version.
+    With expected_version set, raises VersionConflictError if the stored record
+    is no longer at that version.
+    """
+    store = _sqlite_backend()
+    if store:
+        source_changes = {}
+        version = store.save_merchandise_data(item_data, expected_version, source_changes)
+        _catalog_changed("merchandise", [dict(item_data, version=version)], source_changes.get("merchandise"))
+        return version
+    return _save_versioned("merchandise", item_data, expected_version)
 
 def get_merchandise_by_id_data(merch_id):
-    merchandise_list = get_all_merchandise_data()
-    for item in merchandise_list:
-        if item.get("merchandiseID") == merch_id:
-            return item
-    return None
+    store = _sqlite_backend()
+    if store:
+        return store.get_merchandise_by_id_data(merch_id)
+    return get_record_index(MERCHANDISE_FILE, "merchandiseID").get(merch_id)
+
+def get_merchandise_by_ids_data(merch_ids):
+    store = _sqlite_backend()
+    if store:
+        return store.get_merchandise_by_ids_data(list(merch_ids))
+    return _records_by_ids(MERCHANDISE_FILE, "merchandiseID", merch_ids)
 
 # --- Sales/Orders Data ---
 def get_all_sales_data(): # Sales data contains orders
-    return read_json_file(SALES_FILE)
+    """Returns an iterator over every order dict; with partitioned sales, segments are read only as it reaches them."""
+    store = _sqlite_backend()
+    if store:
+        return iter(store.get_all_sales_data())
+    sales_store = _sales_store()
+    if sales_store:
+        return sales_store.iter_all()
+    return iter(read_json_file_cached(SALES_FILE))
 
 def save_all_sales_data(sales_data):
-    write_json_file(SALES_FILE, sales_data)
+    store = _sqlite_backend()
+    if store:
+        return store.save_all_sales_data(sales_data)
+    sales_store = _sales_store()
+    if sales_store:
+        return sales_store.replace_all(list(sales_data))
+    write_json_file_invalidating(SALES_FILE, sales_data)
+
+def save_order_data(order_data, expected_version=None):
+    """
+    Inserts or updates a single order record and returns its new version.
+    With expected_version set, raises VersionConflictError if the stored record
+    is no longer at that version.
+    """
+    store = _sqlite_backend()
+    if store:
+        return store.save_order_data(order_data, expected_version)
+    return _save_versioned("sales", order_data, expected_version)
 
 def get_order_by_id_data(order_id):
-    orders = get_all_sales_data()
-    for order_data in orders:
-        if order_data.get("orderID") == order_id:
-            return order_data
-    return None
+    store = _sqlite_backend()
+    if store:
+        return store.get_order_by_id_data(order_id)
+    sales_store = _sales_store()
+    if sales_store:
+        return sales_store.get(order_id)
+    return get_record_index(SALES_FILE, "orderID").get(order_id)
+
+def get_orders_by_ids_data(order_ids):
+    store = _sqlite_backend()
+    if store:
+        return store.get_orders_by_ids_data(list(order_ids))
+    sales_store = _sales_store()
+    if sales_store:
+        return sales_store.get_many(order_ids)
+    return _records_by_ids(SALES_FILE, "orderID", order_ids)
+
+def get_orders_by_account_id_data(account_id):
+    """Returns only this account's order dicts, oldest first by orderTimestamp."""
+    store = _sqlite_backend()
+    if store:
+        return store.get_orders_by_account_id_data(account_id)
+    sales_store = _sales_store()
+    if sales_store:
+        return sales_store.get_by_account(account_id)
+    return get_record_index(SALES_FILE, "placingAccountID").get(account_id)
+
+def _order_header(order):
+    """
+    The fields the order history list shows: the header and the summary stored
+    by Order.save. Orders saved before summaries existed carry a slim copy of
+    their line items instead, for the summary to be built from.
+    """
+    payment = order.get("payment")
+    header = {
+        "orderID": order.get("orderID"),
+        "placingAccountID": order.get("placingAccountID"),
+        "status": order.get("status"),
+        "totalAmount": order.get("totalAmount"),
+        "orderTimestamp": order.get("orderTimestamp"),
+        "paymentStatus": payment.get("paymentStatus") if isinstance(payment, dict) else None,
+        "summary": order.get("summary"),
+    }
+    if not isinstance(header["summary"], dict):
+        header["lineItems"] = [{"item_type": li.get("item_type"), "item_name": li.get("item_name"),
+                                "quantity": li.get("quantity"), "line_item_status": li.get("line_item_status")}
+                               for li in order.get("orderLinetems") or () if isinstance(li, dict)]
+    return header
+
+def get_order_headers_page_data(account_id, limit, before=None):
+    """
+    One page of an account's order history, newest first: at most `limit`
+    order headers (see _order_header) sorting below the cursor `before`, the
+    (orderTimestamp, orderID) of the last order on the previous page.
+    """
+    store = _sqlite_backend()
+    if store:
+        return store.get_order_headers_page_data(account_id, limit, before)
+    sales_store = _sales_store()
+    if sales_store:
+        page = sales_store.get_page_by_account(account_id, limit, before)
+    else:
+        page = get_record_index(SALES_FILE, "placingAccountID").page(account_id, limit, before)
+    return [_order_header(order) for order in page]
+
 
 # --- Trips Data ---
 def get_all_trips_data():
-    return read_json_file(TRIPS_FILE)
+    store = _sqlite_backend()
+    if store:
+        return store.get_all_trips_data()
+    return read_json_file_cached(TRIPS_FILE)
 
 def save_all_trips_data(trips_data):
-    write_json_file(TRIPS_FILE, trips_data)
+    store = _sqlite_backend()
+    if store:
+        store.save_all_trips_data(trips_data)
+    else:
+        write_json_file_invalidating(TRIPS_FILE, trips_data)
+    _catalog_changed("trips")
+
+def save_trip_data(trip_data, expected_version=None):
+    """
+    Inserts or updates a single trip record and returns its new version.
+    With expected_version set, raises VersionConflictError if the stored record
+    is no longer at that version.
+    """
+    store = _sqlite_backend()
+    if store:
+        source_changes = {}
+        version = store.save_trip_data(trip_data, expected_version, source_changes)
+        _catalog_changed("trips", [dict(trip_data, version=version)], source_changes.get("trips"))
+        return version
+    return _save_versioned("trips", trip_data, expected_version)
 
 def get_trip_by_id_data(trip_id): # Potentially useful, though not strictly required by this scenario
-    trips = get_all_trips_data()
-    for trip in trips:
-        if trip.get("id") == trip_id:
-            return trip
-    return None
\ No newline at end of file
+    store = _sqlite_backend()
+    if store:
+        return store.get_trip_by_id_data(trip_id)
+    return get_record_index(TRIPS_FILE, "id").get(trip_id)
+
+def get_trips_by_ids_data(trip_ids):
+    store = _sqlite_backend()
+    if store:
+        return store.get_trips_by_ids_data(list(trip_ids))
+    return _records_by_ids(TRIPS_FILE, "id", trip_ids)
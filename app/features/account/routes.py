@@ -3,6 +3,7 @@ from flask import render_template, redirect, url_for, flash
 from . import account_bp
 from .forms import RegistrationForm
 from app.models.account import Account
+from app.password_hashing import PasswordHashingBusyError
 
 @account_bp.route('/register', methods=['GET', 'POST'])
 def create_account_page():
@@ -19,6 +20,8 @@ def create_account_page():
             return redirect(url_for('login.login_page'))
         except ValueError as e:
             flash(str(e), 'danger')
+        except PasswordHashingBusyError as e:
+            flash(str(e), 'warning')
         except Exception as e:
             flash(f'An unexpected error occurred during account creation: {e}', 'danger')
             
@@ -3,9 +3,27 @@ from flask import render_template
 from . import home_bp
 from app.models.merchandise import Merchandise
 from app.models.account import Account
+from app import fragment_cache
+from app.http_caching import catalog_validator, conditional_get
 
 @home_bp.route('/')
+@conditional_get(catalog_validator("merchandise")) # The page shows catalog items only
 def index():
+    try:
+        sample_accounts = Account.get_all()[:2] 
+    except Exception as e:
+        sample_accounts = []
+
+    # Rendered once per merchandise version (see app/fragment_cache.py)
+    featured_merchandise = fragment_cache.render_catalog("home_featured_merchandise", "merchandise",
+                                                         _render_featured_merchandise)
+    return render_template('home.html',
+                           featured_merchandise=featured_merchandise,
+                           sample_accounts=sample_accounts,
+                           title="Welcome to ART System")
+
+
+def _render_featured_merchandise():
     sample_merch = [] # Default to empty
     raw_merch_list = None # To store the direct output of get_all()
     try:
@@ -14,13 +32,6 @@ def index():
             sample_merch = raw_merch_list[:3]
         else:
             print(f"ERROR home.index: Merchandise.get_all() did not return a list. sample_merch remains empty.")
-        sample_accounts = Account.get_all()[:2] 
-
     except Exception as e:
-        # sample_merch will remain [] due to initialization above
-        sample_accounts = []
-
-    return render_template('home.html',
-                           sample_merch=sample_merch,
-                           sample_accounts=sample_accounts,
-                           title="Welcome to ART System")
\ No newline at end of file
+        pass # sample_merch will remain [] due to initialization above
+    return render_template('_featured_merchandise.html', sample_merch=sample_merch)
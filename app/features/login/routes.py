@@ -3,6 +3,7 @@ from flask import render_template, redirect, url_for, flash, request, session #
 from . import login_bp
 from .forms import LoginForm
 from app.models.account import Account
+from app.password_hashing import PasswordHashingBusyError
 # from app.auth_utils import get_current_user_id # Can use this if you want
 
 @login_bp.route('/login', methods=['GET', 'POST'])
@@ -17,7 +18,13 @@ def login_page():
         password = form.password.data
         account = Account.get_by_email(email)
 
-        if account and account.check_password(password):
+        try:
+            password_ok = bool(account) and account.check_password(password)
+        except PasswordHashingBusyError as e:
+            flash(str(e), 'warning')
+            return render_template('login.html', title="Login", form=form), 503
+
+        if password_ok:
             session['user_id'] = account.accountID # <<< STORE USER ID IN SESSION
             session['user_name'] = account.name   # <<< Optional: store name for display
             flash(f'Welcome back, {account.name}! You have been logged in.', 'success')
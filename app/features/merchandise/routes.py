@@ -1,8 +1,14 @@
 from flask import render_template, current_app
 from . import merchandise_bp
 from app.models.merchandise import Merchandise
+from app import fragment_cache
+from app.http_caching import catalog_validator, conditional_get
 
 @merchandise_bp.route('/')
+@conditional_get(catalog_validator("merchandise")) # 304 for repeat visits while the stock list is unchanged
 def list_merchandise():
-    all_merchandise = Merchandise.get_all()
-    return render_template('merchandise_list.html', merchandise_items=all_merchandise, title="Browse Merchandise")
\ No newline at end of file
+    # The grid is rendered once per merchandise version (see app/fragment_cache.py)
+    merchandise_grid = fragment_cache.render_catalog(
+        "merchandise_list_grid", "merchandise",
+        lambda: render_template('_merchandise_grid.html', merchandise_items=Merchandise.get_all()))
+    return render_template('merchandise_list.html', merchandise_grid=merchandise_grid, title="Browse Merchandise")
\ No newline at end of file
@@ -1,5 +1,5 @@
 # artproject/app/features/order/routes.py
-from flask import render_template, redirect, url_for, flash, request, session
+from flask import current_app, render_template, redirect, url_for, flash, request, session
 from . import order_bp
 from .forms import (
     BuyTicketForm,
@@ -16,24 +16,22 @@ from app.models.enums import OrderStatus, PaymentStatus, TicketStatus # Use Enum
 from flask import get_flashed_messages # Import this for conditional flashing
 
 # data_manager is still needed for generating unique IDs and potentially low-level file saving called by models
-from app import data_manager
+from app import data_manager, fragment_cache
 from app.auth_utils import login_required, get_current_user_id
+from app.http_caching import catalog_validator, conditional_get
 from datetime import datetime, timezone
 
 
 # --- Scenario 1: Buying a Ticket ---
 @order_bp.route('/buy-ticket', methods=['GET', 'POST'])
 @login_required
+@conditional_get(catalog_validator("trips"), has_form=True) # GET only: the trip list is unchanged -> 304
 def buy_ticket():
     form = BuyTicketForm()
     current_user_id = get_current_user_id()
 
-    # Use Trip model to get all trips as objects ---
-    all_trips_objects = Trip.get_all() # Get list of Trip objects
-    # Filter available trips (as objects)
-    available_trips_for_selection = [
-        trip for trip in all_trips_objects if trip and trip.available_seats > 0
-    ]
+    # Trips with seats left, in departure order, from the trip index (no scan of every trip)
+    available_trips_for_selection = Trip.search(with_seats=True)
 
     # Populate choices from Trip objects for display and selection
     # Use trip.id for value, and attributes for display string
@@ -59,7 +57,9 @@ def buy_ticket():
             created_order = Order.create_ticket_order(
                 account_id=current_user_id,
                 trip_id=selected_trip_id_from_form,
-                payment_method_details=f"Simulated {payment_type.capitalize()}"
+                payment_method_details=f"Simulated {payment_type.capitalize()}",
+                # Already loaded above for the choices list
+                trip=next((trip for trip in available_trips_for_selection if trip.id == selected_trip_id_from_form), None)
             )
 
             if created_order:
@@ -97,8 +97,7 @@ def buy_ticket():
                  # created_order is None if account or trip not found inside the factory
                  flash("Error: Could not create order. Selected trip or your account not found.", "danger")
                  # Repopulate choices just in case
-                 all_trips_objects_rerender = Trip.get_all()
-                 available_trips_for_selection_rerender = [trip for trip in all_trips_objects_rerender if trip and trip.available_seats > 0]
+                 available_trips_for_selection_rerender = Trip.search(with_seats=True)
                  form.selected_trip_id.choices = [
                     (trip.id, f"{trip.route} - {trip.date} {trip.time} (RM {trip.price:.2f}, Seats: {trip.available_seats})")
                     for trip in available_trips_for_selection_rerender
@@ -110,8 +109,7 @@ def buy_ticket():
             # Catch specific business logic errors from the factory method (like not enough seats)
             flash(f"Purchase failed: {e}", "warning")
             # Repopulate choices and re-render form
-            all_trips_objects_rerender = Trip.get_all()
-            available_trips_for_selection_rerender = [trip for trip in all_trips_objects_rerender if trip and trip.available_seats > 0]
+            available_trips_for_selection_rerender = Trip.search(with_seats=True)
             form.selected_trip_id.choices = [
                (trip.id, f"{trip.route} - {trip.date} {trip.time} (RM {trip.price:.2f}, Seats: {trip.available_seats})")
                for trip in available_trips_for_selection_rerender
@@ -121,8 +119,7 @@ def buy_ticket():
             # Catch critical errors during saving/payment processing inside the factory
              flash(f"A system error occurred during order processing: {e}", "danger")
              # Repopulate choices and re-render form
-             all_trips_objects_rerender = Trip.get_all()
-             available_trips_for_selection_rerender = [trip for trip in all_trips_objects_rerender if trip and trip.available_seats > 0]
+             available_trips_for_selection_rerender = Trip.search(with_seats=True)
              form.selected_trip_id.choices = [
                 (trip.id, f"{trip.route} - {trip.date} {trip.time} (RM {trip.price:.2f}, Seats: {trip.available_seats})")
                 for trip in available_trips_for_selection_rerender
@@ -132,8 +129,7 @@ def buy_ticket():
             # Catch any other unexpected errors
             flash(f"An unexpected error occurred: {e}", "danger")
             # Repopulate choices and re-render form
-            all_trips_objects_rerender = Trip.get_all()
-            available_trips_for_selection_rerender = [trip for trip in all_trips_objects_rerender if trip and trip.available_seats > 0]
+            available_trips_for_selection_rerender = Trip.search(with_seats=True)
             form.selected_trip_id.choices = [
                (trip.id, f"{trip.route} - {trip.date} {trip.time} (RM {trip.price:.2f}, Seats: {trip.available_seats})")
                for trip in available_trips_for_selection_rerender
@@ -192,15 +188,8 @@ def reschedule_ticket_find():
             flash(f"Critical error: Details for the original trip associated with your ticket could not be found. Please contact support.", "danger")
             return render_template('reschedule_ticket_find.html', form=form, title="Reschedule Ticket")
 
-        # --- Load all Trip objects and filter alternatives ---
-        all_trips_objects = Trip.get_all()
-        # Filter alternative trips (objects) based on route, excluding original, and availability
-        alternative_trips = [
-            trip for trip in all_trips_objects
-            if trip and trip.route == original_trip.route and
-               trip.id != original_trip.id and
-               trip.available_seats > 0
-        ]
+        # --- Alternatives: same route, other trips, seats left (trip index lookup) ---
+        alternative_trips = Trip.search(route=original_trip.route, with_seats=True, exclude_id=original_trip.id)
 
         reschedule_form = RescheduleTicketForm()
         reschedule_form.order_id.data = order_id_input
@@ -241,13 +230,8 @@ def reschedule_ticket_confirm_submit():
     if original_trip_id_for_choices:
         original_trip_for_choices = Trip.get_by_id(original_trip_id_for_choices)
         if original_trip_for_choices:
-            _all_trips_objects_for_choices = Trip.get_all()
-            _alternative_trips_for_choices = [
-                trip for trip in _all_trips_objects_for_choices
-                if trip and trip.route == original_trip_for_choices.route and
-                   trip.id != original_trip_for_choices.id and
-                   trip.available_seats > 0
-            ]
+            _alternative_trips_for_choices = Trip.search(route=original_trip_for_choices.route, with_seats=True,
+                                                         exclude_id=original_trip_for_choices.id)
             form.selected_new_trip_id.choices = [
                 (t.id, f"{t.route} - {t.date} {t.time} (RM {t.price:.2f}, Seats: {t.available_seats})")
                 for t in _alternative_trips_for_choices
@@ -376,6 +360,13 @@ def reschedule_ticket_confirm_submit():
 
 
 # --- Scenario 3: Buying Merchandise (Bulk) ---
+def _merchandise_bulk_grid():
+    """The item grid of the bulk-buy form, rendered once per merchandise version (see app/fragment_cache.py)."""
+    return fragment_cache.render_catalog(
+        "order_merchandise_bulk_grid", "merchandise",
+        lambda: render_template('_merchandise_bulk_grid.html',
+                                merchandise_list=[item.to_dict() for item in Merchandise.get_all() if item]))
+
 @order_bp.route('/buy-merchandise', methods=['GET', 'POST'])
 @login_required
 def buy_merchandise_bulk():
@@ -392,7 +383,7 @@ def buy_merchandise_bulk():
         # We validate payment type here, and check item quantities/stock manually.
         if not form.validate(): # This form currently only has payment_type validation
             flash("Please select a payment method.", "danger")
-            return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, title="Buy Merchandise")
+            return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, merchandise_grid=_merchandise_bulk_grid, title="Buy Merchandise")
 
         items_selected_for_purchase = []
         purchase_possible = True
@@ -425,12 +416,12 @@ def buy_merchandise_bulk():
 
         if not items_selected_for_purchase:
             flash("No items selected or quantities are zero.", "info")
-            return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, title="Buy Merchandise")
+            return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, merchandise_grid=_merchandise_bulk_grid, title="Buy Merchandise")
 
         if not purchase_possible:
              # If purchase_possible was set to False due to insufficient stock on any requested item
              flash("Please adjust quantities for items with insufficient stock to proceed.", "danger")
-             return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, title="Buy Merchandise")
+             return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, merchandise_grid=_merchandise_bulk_grid, title="Buy Merchandise")
 
 
         # --- Use Order factory method to create the order ---
@@ -441,7 +432,9 @@ def buy_merchandise_bulk():
              created_order = Order.create_merchandise_order(
                  account_id=current_user_id,
                  items_with_quantities=items_selected_for_purchase,
-                 payment_method_details=f"Simulated {payment_type.capitalize()}"
+                 payment_method_details=f"Simulated {payment_type.capitalize()}",
+                 # Already loaded above; saves re-reading each selected item
+                 merchandise={item.merchandiseID: item for item in all_merchandise_items_objects if item}
              )
 
              if created_order:
@@ -460,28 +453,28 @@ def buy_merchandise_bulk():
                  # created_order is None if account or no valid items found in factory
                  flash("Error: Could not create order. Your account not found or no items were valid for purchase.", "danger")
                  # Re-render with errors
-                 return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, title="Buy Merchandise")
+                 return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, merchandise_grid=_merchandise_bulk_grid, title="Buy Merchandise")
 
         except ValueError as e:
             # Catch specific business logic errors from the factory method (like not enough stock)
             flash(f"Purchase failed: {e}", "warning")
             # Re-render with errors
-            return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, title="Buy Merchandise")
+            return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, merchandise_grid=_merchandise_bulk_grid, title="Buy Merchandise")
         except RuntimeError as e:
             # Catch critical errors during saving/payment processing inside the factory
              flash(f"A system error occurred during order processing: {e}", "danger")
              # Re-render with errors
-             return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, title="Buy Merchandise")
+             return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, merchandise_grid=_merchandise_bulk_grid, title="Buy Merchandise")
         except Exception as e:
             # Catch any other unexpected errors
             flash(f"An unexpected error occurred: {e}", "danger")
             # Re-render with errors
-            return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, title="Buy Merchandise")
+            return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, merchandise_grid=_merchandise_bulk_grid, title="Buy Merchandise")
 
 
     # This handles the GET request.
     # Pass the list of Merchandise objects (converted to dicts for template consistency)
-    return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, title="Buy Merchandise")
+    return render_template('buy_merchandise_bulk.html', form=form, merchandise_list=all_merchandise_items_for_display, merchandise_grid=_merchandise_bulk_grid, title="Buy Merchandise")
 
 
 # --- Scenario 4: Cancel Order ---
@@ -598,21 +591,36 @@ def cancel_order_confirm_action():
 @login_required
 def list_orders():
     current_user_id = get_current_user_id()
-    # Use Order class method to get user's orders as objects
-    user_orders_objects = Order.get_orders_by_account_id(current_user_id)
+    # Keyset pagination: one page of header-only OrderSummary rows, newest first.
+    # ?before_ts=...&before_id=... is the (orderTimestamp, orderID) of the last row
+    # shown, so every page costs the same however many orders the account has.
+    before = None
+    if request.args.get('before_id'):
+        before = (request.args.get('before_ts', ''), request.args['before_id'])
+    page_size = current_app.config.get('ORDERS_PAGE_SIZE', 20)
+    order_summaries, next_cursor = Order.get_history_page(current_user_id, page_size, before)
 
-    # Pass the list of Order objects to the template
     # ---  Pass Enum classes to the template context ---
     return render_template('list_orders_new.html',
-                           orders=user_orders_objects,
+                           orders=order_summaries,
+                           next_cursor=next_cursor,
+                           is_first_page=before is None,
                            title="My Orders",
                            OrderStatus=OrderStatus, # Pass the Enum class
                            TicketStatus=TicketStatus, # Pass the Enum class
                            PaymentStatus=PaymentStatus # Pass the Enum class
                           )
 
+def _order_page_validator(order_id):
+    # Loaded through the identity map, so view_order reuses this object
+    order = Order.get_by_id(order_id)
+    if not order or order.placingAccountID != get_current_user_id():
+        return None # The view flashes and redirects
+    return f"{order.orderID}:{order.version}", None
+
 @order_bp.route('/<string:order_id>')
 @login_required
+@conditional_get(_order_page_validator) # The page shows this one order; its version changes on every save
 def view_order(order_id):
     current_user_id = get_current_user_id()
     # Load Order object
@@ -0,0 +1,94 @@
+# artproject/app/fragment_cache.py
+# Cache of rendered HTML blocks built only from the catalog (the merchandise
+# grids and the home page's featured items). An entry is keyed by the block's
+# name and the version its catalog store had when it was rendered
+# (CatalogSnapshot.store_versions, see app/catalog.py), so a stock or item
+# change - Merchandise.update_stock or save, which publish a new snapshot -
+# makes the next render a miss; the stale entry is dropped when the new one is
+# stored. Seat sales bump only the trips version and leave merchandise blocks
+# cached. At most MAX_ENTRIES blocks are kept, least recently used evicted first.
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from markupsafe import Markup
+
+from app import catalog
+
+MAX_ENTRIES = int(os.environ.get('ART_FRAGMENT_CACHE_SIZE', '64'))
+# Print the counters every this many lookups (0: never)
+REPORT_EVERY = int(os.environ.get('ART_FRAGMENT_CACHE_REPORT_EVERY', '0'))
+
+_lock = threading.Lock()
+_entries = OrderedDict() # (name, store version) -> Markup, least recently used first
+_versions = {} # name -> newest store version stored for it
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def configure(config):
+    global MAX_ENTRIES, REPORT_EVERY
+    MAX_ENTRIES = int(config.get('FRAGMENT_CACHE_SIZE', MAX_ENTRIES))
+    REPORT_EVERY = int(config.get('FRAGMENT_CACHE_REPORT_EVERY', REPORT_EVERY))
+    clear(reset_stats=True) # Keys are catalog versions, which restart with the catalog
+
+
+def render_catalog(name: str, store_name: str, render: Callable[[], str]) -> Markup:
+    """
+    The block `name`, built from the catalog store `store_name`: cached, or
+    render() (which must read the catalog itself, after this call has taken the
+    store's version) whose result is cached for that version.
+    """
+    # Taken before render() reads the catalog, so an entry is never older than its key
+    version = catalog.get_snapshot().store_versions[store_name]
+    key = (name, version)
+    with _lock:
+        html = _entries.get(key)
+        if html is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+        lookups = _stats["hits"] + _stats["misses"]
+    if REPORT_EVERY and lookups % REPORT_EVERY == 0:
+        stats = get_stats()
+        print(f"Fragment cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%}), "
+              f"{stats['evictions']} evictions, {stats['entries']} entries.")
+    if html is not None:
+        return html
+    html = Markup(render()) # Outside the lock: concurrent misses render the same block, the last store wins
+    with _lock:
+        newest = _versions.get(name)
+        if newest is not None and newest > version:
+            return html # A newer version of the block is already cached; don't bring back this one
+        if newest is not None and newest != version:
+            if _entries.pop((name, newest), None) is not None:
+                _stats["invalidations"] += 1
+        _versions[name] = version
+        _entries[key] = html
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            (evicted_name, evicted_version), _ = _entries.popitem(last=False)
+            if _versions.get(evicted_name) == evicted_version:
+                del _versions[evicted_name]
+            _stats["evictions"] += 1
+    return html
+
+
+def get_stats():
+    """Returns hit/miss/eviction counters and the number of blocks currently cached."""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] / lookups) if lookups else 0.0
+    return stats
+
+
+def clear(reset_stats=False):
+    with _lock:
+        _entries.clear()
+        _versions.clear()
+        if reset_stats:
+            for key in _stats:
+                _stats[key] = 0
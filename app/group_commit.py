@@ -0,0 +1,94 @@
+# artproject/app/group_commit.py
+# Group-commit writer: a single background thread applies queued record saves in
+# batches, so N concurrent checkouts cost one write + fsync per touched file
+# instead of N read-modify-write cycles. Callers block until their batch commits.
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+
+class GroupCommitWriter:
+    def __init__(self, commit_batch: Callable[[str, list], Optional[list]], max_batch_size: int = 256):
+        """
+        commit_batch(store_name, items) must durably apply all `items` to the
+        named store in one go; it is only ever called from the writer thread.
+        It may return one result per item: an exception fails only that item's
+        submit(), anything else is returned from it.
+        """
+        self._commit_batch = commit_batch
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "mutations": 0, "store_writes": 0, "failed_batches": 0}
+
+    def submit(self, store_name: str, item, timeout: float = None):
+        """Queues one record save and waits for the batch containing it to commit."""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((store_name, item, future))
+        return future.result(timeout) # Re-raises the batch's (or this item's) exception, if any
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = (stats["mutations"] / stats["batches"]) if stats["batches"] else 0.0
+        return stats
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so a forked worker starts its own writer
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue() # Entries inherited from the parent belong to its threads
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Everything that queued up while the previous batch was being written joins this one
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        by_store = {} # store_name -> [(item, future)], in submission order
+        for store_name, item, future in batch:
+            by_store.setdefault(store_name, []).append((item, future))
+
+        failed = False
+        for store_name, items in by_store.items():
+            try:
+                results = self._commit_batch(store_name, [item for item, _ in items])
+            except Exception as e:
+                failed = True
+                print(f"ERROR GroupCommitWriter: batch of {len(items)} saves to '{store_name}' failed: {e}")
+                for _, future in items:
+                    future.set_exception(e)
+            else:
+                if results is None:
+                    results = [None] * len(items)
+                for (_, future), result in zip(items, results):
+                    if isinstance(result, Exception):
+                        future.set_exception(result) # e.g. a version conflict on this record only
+                    else:
+                        future.set_result(result)
+
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["mutations"] += len(batch)
+            self._stats["store_writes"] += len(by_store)
+            if failed:
+                self._stats["failed_batches"] += 1
@@ -0,0 +1,115 @@
+# artproject/app/http_caching.py
+# Conditional GET for pages whose HTML depends only on data with a cheap version:
+# the catalog (see app/catalog.py) or a single order's record version. The view
+# is wrapped so that a repeat visit whose If-None-Match (or, failing that,
+# If-Modified-Since) still matches gets a 304 before any data is loaded or any
+# template rendered.
+#
+# The ETag covers everything else a page shows: the signed-in user (the layout
+# prints their name), the deployed code and templates, and for pages with a form
+# the CSRF token, which Flask-WTF only accepts for WTF_CSRF_TIME_LIMIT seconds.
+# Pages rendered with flashed messages are never cached, since a message is
+# shown once. If-Modified-Since alone only revalidates pages that are the same
+# for everyone (no signed-in user, no form); the others need the ETag.
+import functools
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+from flask import current_app, make_response, request, session
+
+from app import catalog
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_DIST_DIR = os.path.join(_APP_DIR, 'static', 'dist')
+
+
+def _code_fingerprint() -> str:
+    """Changes whenever a file of the app (code, template or static asset) does, e.g. on a deploy."""
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(_APP_DIR):
+        # static/dist is built from files already covered here (see app/static_assets.py)
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__' and os.path.join(root, d) != _DIST_DIR)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f"{os.path.relpath(path, _APP_DIR)}:{st.st_mtime_ns}:{st.st_size};".encode('utf-8'))
+    return digest.hexdigest()
+
+_CODE_FINGERPRINT = _code_fingerprint()
+
+
+def _csrf_part() -> str:
+    # The cached page's token must still be valid when the form is submitted: a page
+    # is only revalidated within the half of the time limit it was rendered in
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    bucket = int(datetime.now(timezone.utc).timestamp() // (time_limit / 2)) if time_limit else 0
+    return f"{session.get('csrf_token', '')}:{bucket}"
+
+
+def page_etag(data_version: str, has_form: bool = False) -> str:
+    parts = [request.endpoint or '', data_version, _CODE_FINGERPRINT,
+             str(session.get('user_id', '')), str(session.get('user_name', ''))]
+    if has_form:
+        parts.append(_csrf_part())
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _is_fresh(etag: str, last_modified: Optional[datetime], personalised: bool) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag) # If-Modified-Since is ignored when this is sent
+    if request.if_modified_since and last_modified is not None and not personalised:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def _set_validators(response, etag: str, last_modified: Optional[datetime]):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True # Per-user page: browsers may keep it, shared caches may not
+    response.cache_control.no_cache = True # ...but must revalidate on every use
+    response.vary.add('Cookie')
+    return response
+
+
+def conditional_get(validator: Callable[..., Optional[Tuple[str, Optional[datetime]]]], has_form: bool = False):
+    """
+    Decorator for a view: validator(**view_args) returns (data version string,
+    last-modified datetime or None) for the data the page shows, or None if this
+    response should not be cached (e.g. the view is about to redirect).
+    Only GET and HEAD requests are affected.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+            validators = validator(**kwargs)
+            if validators is None:
+                return view(*args, **kwargs)
+            data_version, last_modified = validators
+            etag = page_etag(data_version, has_form)
+            if _is_fresh(etag, last_modified, personalised=has_form or 'user_id' in session):
+                return _set_validators(current_app.response_class(status=304), etag, last_modified)
+            response = make_response(view(*args, **kwargs))
+            # Not for errors or redirects, nor if the view left a flashed message for the next page
+            if response.status_code == 200 and not session.get('_flashes'):
+                _set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def catalog_validator(*store_names: str):
+    """A conditional_get validator for pages built from these catalog stores ("trips", "merchandise")."""
+    def validator(**view_args):
+        snapshot = catalog.get_snapshot()
+        modified = max(snapshot.modified_at[name] for name in store_names)
+        return ('/'.join(snapshot.fingerprint(name) for name in store_names),
+                datetime.fromtimestamp(modified, timezone.utc))
+    return validator
@@ -0,0 +1,36 @@
+# artproject/app/id_allocator.py
+# Hi/lo ID allocation: each worker process leases a block of sequential numbers
+# from shared storage (one locked read + write per block) and hands them out from
+# memory, so issuing an ID normally costs no I/O and two processes can never be
+# given the same number.
+import os
+import threading
+from typing import Callable
+
+
+class BlockIdAllocator:
+    def __init__(self, reserve_block: Callable[[str, int], int], block_size: int = 20):
+        """
+        reserve_block(sequence, block_size) must atomically advance the stored
+        counter for `sequence` by block_size and return the first value of the
+        reserved block.
+        """
+        self._reserve_block = reserve_block
+        self.block_size = max(1, int(block_size))
+        self._lock = threading.Lock()
+        self._blocks = {} # sequence -> [next value, end of block (exclusive)]
+        self._pid = os.getpid()
+
+    def next_value(self, sequence: str) -> int:
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker must not keep handing out numbers from its parent's lease
+                self._blocks = {}
+                self._pid = os.getpid()
+            block = self._blocks.get(sequence)
+            if block is None or block[0] >= block[1]:
+                start = self._reserve_block(sequence, self.block_size)
+                block = self._blocks[sequence] = [start, start + self.block_size]
+            value = block[0]
+            block[0] += 1
+            return value
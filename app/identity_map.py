@@ -0,0 +1,80 @@
+# artproject/app/identity_map.py
+# Request-scoped identity map: within one request, loading the same account,
+# order, trip or merchandise item again (e.g. get_current_user, then the route's
+# own Account.get_by_id) returns the object already loaded instead of re-reading
+# and re-hydrating it. The map lives on flask.g and is dropped at teardown;
+# outside a request every lookup goes to the store.
+#
+# Entries are keyed by (kind, id). Writes keep the map honest: a committed unit
+# of work evicts the records it changed, and a discarded one clears the map,
+# since loaded objects may still hold the changes that were never written.
+from typing import Callable, Dict, Iterable
+
+from flask import g, has_request_context
+
+_MISSING = object()
+
+
+def _current_map():
+    if not has_request_context():
+        return None
+    identity_map = g.get('_identity_map')
+    if identity_map is None:
+        identity_map = g._identity_map = {}
+    return identity_map
+
+
+def lookup(kind: str, key, load: Callable[[], object]):
+    """The object for (kind, key) loaded earlier in this request, else load() (remembered, even if None)."""
+    identity_map = _current_map()
+    if identity_map is None:
+        return load()
+    obj = identity_map.get((kind, key), _MISSING)
+    if obj is _MISSING:
+        obj = identity_map[(kind, key)] = load()
+    return obj
+
+
+def lookup_many(kind: str, keys: Iterable, load_many: Callable[[list], Dict[object, object]]) -> dict:
+    """{key: object} like lookup(), loading every key not yet in the map with one load_many(keys) call."""
+    keys = list(dict.fromkeys(keys))
+    identity_map = _current_map()
+    if identity_map is None:
+        return load_many(keys)
+    missing = [key for key in keys if (kind, key) not in identity_map]
+    if missing:
+        loaded = load_many(missing)
+        for key in missing:
+            identity_map[(kind, key)] = loaded.get(key)
+    return {key: obj for key in keys if (obj := identity_map[(kind, key)]) is not None}
+
+
+def canonical(kind: str, key, obj):
+    """The object already mapped for (kind, key), or `obj` (now mapped) if there is none."""
+    identity_map = _current_map()
+    if identity_map is None or obj is None:
+        return obj
+    existing = identity_map.get((kind, key))
+    if existing is not None:
+        return existing
+    identity_map[(kind, key)] = obj
+    return obj
+
+
+def forget_unless(kind: str, key, fresh: list):
+    """Evicts (kind, key) unless the mapped object is one of `fresh` (objects known to match the store)."""
+    identity_map = _current_map()
+    if identity_map is not None and not any(identity_map.get((kind, key)) is obj for obj in fresh):
+        identity_map.pop((kind, key), None)
+
+
+def clear():
+    identity_map = _current_map()
+    if identity_map is not None:
+        identity_map.clear()
+
+
+def init_app(app):
+    @app.teardown_appcontext
+    def _drop_identity_map(exception=None):
+        g.pop('_identity_map', None)
@@ -0,0 +1,160 @@
+# artproject/app/indexes.py
+# Dict indexes over the record lists that data_manager loads, so lookups by ID or
+# email are O(1) instead of a linear scan of the whole file.
+from bisect import bisect_left
+from typing import Callable, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+
+def field_key(field: str) -> Callable[[dict], Optional[Hashable]]:
+    """Key function for an exact-match index on one field."""
+    def key_fn(record: dict):
+        return record.get(field)
+    return key_fn
+
+
+def normalized_email(email: Optional[str]) -> Optional[str]:
+    """Case-insensitive form of an email address used for lookups and uniqueness."""
+    if not email:
+        return None
+    return email.strip().lower()
+
+
+def email_key(record: dict) -> Optional[str]:
+    return normalized_email(record.get("email"))
+
+
+class RecordIndex:
+    """
+    Maps key_fn(record) -> position in a list of records. The first record with a
+    given key wins, matching the linear scans this replaces.
+    The index never mutates `records`; upserted() returns a new list and index.
+    """
+    def __init__(self, records: List[dict], key_fn: Callable[[dict], Optional[Hashable]], positions: dict = None):
+        self.records = records
+        self.key_fn = key_fn
+        if positions is None:
+            positions = {}
+            for i, record in enumerate(records):
+                key = key_fn(record)
+                if key is not None and key not in positions:
+                    positions[key] = i
+        self._positions = positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def get(self, key) -> Optional[dict]:
+        i = self._positions.get(key)
+        return self.records[i] if i is not None else None
+
+    def position(self, key) -> Optional[int]:
+        return self._positions.get(key)
+
+    def upserted(self, new_records: List[dict]) -> Tuple[List[dict], 'RecordIndex']:
+        """Returns (records, index) with each new record replacing its key's entry, or appended."""
+        records = list(self.records)
+        positions = dict(self._positions)
+        for record in new_records:
+            key = self.key_fn(record)
+            i = positions.get(key)
+            if i is None:
+                if key is not None:
+                    positions[key] = len(records)
+                records.append(record)
+            else:
+                records[i] = record
+        return records, RecordIndex(records, self.key_fn, positions)
+
+    def patched(self, new_records: List[dict], changed_positions: Iterable[int]) -> 'RecordIndex':
+        """
+        Returns an index over `new_records`, which differ from self.records only at
+        changed_positions (for secondary keys such as email). Rebuilt from scratch
+        in the rare case a changed record moved off a key it was first for.
+        """
+        positions = dict(self._positions)
+        for i in changed_positions:
+            new_key = self.key_fn(new_records[i])
+            if i < len(self.records):
+                old_key = self.key_fn(self.records[i])
+                if old_key != new_key and positions.get(old_key) == i:
+                    return RecordIndex(new_records, self.key_fn) # A later duplicate may now be first
+            if new_key is not None and (new_key not in positions or positions[new_key] > i):
+                positions[new_key] = i
+        return RecordIndex(new_records, self.key_fn, positions)
+
+
+class DuplicateKeyError(ValueError):
+    """A save would give a record a unique key (e.g. an email address) another record already has."""
+
+
+class GroupIndex:
+    """
+    Secondary index: maps group_fn(record) -> positions of every record in that
+    group, ordered by sort_fn(record). Used e.g. for accountID -> that account's orders.
+    """
+    def __init__(self, records: List[dict], group_fn: Callable[[dict], Optional[Hashable]],
+                 sort_fn: Callable[[dict], tuple], groups: dict = None):
+        self.records = records
+        self.group_fn = group_fn
+        self.sort_fn = sort_fn
+        if groups is None:
+            groups = {}
+            for i, record in enumerate(records):
+                key = group_fn(record)
+                if key is not None:
+                    groups.setdefault(key, []).append(i)
+            for positions in groups.values():
+                positions.sort(key=lambda i: sort_fn(records[i]))
+        self._groups = groups
+
+    def get(self, key) -> List[dict]:
+        return [self.records[i] for i in self._groups.get(key, ())]
+
+    def page(self, key, limit: int, before: Optional[tuple] = None) -> List[dict]:
+        """The group's last `limit` records sorting below `before` (all, if None), last first. O(log n + limit)."""
+        positions = self._groups.get(key, [])
+        end = len(positions) if before is None else \
+            bisect_left(positions, tuple(before), key=lambda i: self.sort_fn(self.records[i]))
+        return [self.records[i] for i in reversed(positions[max(0, end - limit):end])]
+
+    def patched(self, new_records: List[dict], changed_positions: Iterable[int]) -> 'GroupIndex':
+        """Returns an index over `new_records`, which differ from self.records only at changed_positions."""
+        groups = dict(self._groups) # Shallow copy; only the touched groups' lists are copied below
+        touched = set()
+        for i in changed_positions:
+            if i < len(self.records):
+                old_key = self.group_fn(self.records[i])
+                if old_key in groups:
+                    if old_key not in touched:
+                        groups[old_key] = list(groups[old_key])
+                        touched.add(old_key)
+                    if i in groups[old_key]:
+                        groups[old_key].remove(i)
+            new_key = self.group_fn(new_records[i])
+            if new_key is not None:
+                if new_key not in touched:
+                    groups[new_key] = list(groups.get(new_key, ()))
+                    touched.add(new_key)
+                groups[new_key].append(i)
+        for key in touched:
+            groups[key].sort(key=lambda i: self.sort_fn(new_records[i]))
+        return GroupIndex(new_records, self.group_fn, self.sort_fn, groups)
+
+
+def order_time_key(order: dict) -> tuple:
+    """Sort key for orders: oldest first by orderTimestamp (ISO strings in UTC sort correctly), then orderID."""
+    return (order.get("orderTimestamp") or "", order.get("orderID") or "")
+
+
+def keyset_page(records: Sequence[dict], limit: int, before: Optional[tuple] = None,
+                sort_fn: Callable[[dict], tuple] = order_time_key) -> List[dict]:
+    """
+    Keyset pagination over records sorted oldest first by sort_fn: the newest
+    `limit` records whose key is below the cursor `before` (the key of the last
+    record on the previous page), newest first.
+    """
+    end = len(records) if before is None else bisect_left(records, tuple(before), key=sort_fn)
+    return list(reversed(records[max(0, end - limit):end]))
@@ -1,11 +1,5 @@
 # app/models/account.py
-import json
-import os # For path joining
-from werkzeug.security import generate_password_hash # Let's add proper hashing back in
-
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # This gets to 'app' directory
-PROJECT_ROOT = os.path.dirname(BASE_DIR) # This gets to 'artproject' directory
-ACCOUNTS_FILE = os.path.join(PROJECT_ROOT, 'accounts_data.json')
+from app import data_manager, identity_map, password_hashing
 
 
 class Account:
@@ -18,103 +12,86 @@ class Account:
         self.orders = orders if orders is not None else []
 
     def check_password(self, password):
-        """Checks if the provided password matches the stored hash."""
-        from werkzeug.security import check_password_hash # Import here to avoid circularity if Account is imported elsewhere early
-        return check_password_hash(self.password_hash, password)
+        """
+        Checks if the provided password matches the stored hash (in the hashing pool).
+        A correct password stored under outdated hash parameters is rehashed and saved.
+        May raise PasswordHashingBusyError when the pool is saturated.
+        """
+        if not password_hashing.verify_password(self.password_hash, password):
+            return False
+        if password_hashing.needs_rehash(self.password_hash):
+            self._rehash_password(password)
+        return True
 
-    @classmethod
-    def _load_accounts_data(cls):
+    def _rehash_password(self, password):
+        old_hash = self.password_hash
         try:
-            if not os.path.exists(ACCOUNTS_FILE): # Create file if it doesn't exist
-                with open(ACCOUNTS_FILE, 'w') as f:
-                    json.dump([], f) # Start with an empty list
-                return []
-            with open(ACCOUNTS_FILE, 'r') as f:
-                data = json.load(f)
-                return data if isinstance(data, list) else [] # Ensure it's a list
-        except (FileNotFoundError, json.JSONDecodeError):
-            print(f"Error: Could not load or parse {ACCOUNTS_FILE}. Returning empty list.")
-            return [] # Return empty list on error to prevent crashes, create if not found
+            new_hash = password_hashing.hash_password(password)
+            stored = data_manager.get_account_by_id_data(self.accountID)
+            if stored and stored.get('password_hash') == old_hash: # Not changed by another request meanwhile
+                data_manager.save_account_data(dict(stored, password_hash=new_hash))
+                self.password_hash = new_hash
+        except Exception as e:
+            # The login itself succeeded; the upgrade is retried on the next one
+            print(f"Warning: Could not rehash the password of account {self.accountID}: {e}")
 
     @classmethod
-    def _save_accounts_data(cls, accounts_list):
-        try:
-            with open(ACCOUNTS_FILE, 'w') as f:
-                json.dump(accounts_list, f, indent=2)
-        except IOError as e:
-            print(f"Error saving accounts data: {e}")
-            # Potentially raise the error or handle it more gracefully
+    def from_dict(cls, acc_data: dict):
+        """Creates an Account object from a stored account dictionary."""
+        if not acc_data:
+            return None
+        return cls(
+            accountID=acc_data.get('accountID'),
+            name=acc_data.get('name'),
+            email=acc_data.get('email'),
+            phoneNumber=acc_data.get('phoneNumber'),
+            password_hash=acc_data.get('password_hash'), # Load HASH
+            orders=list(acc_data.get('orders', [])), # Copy: the dict may be shared with data_manager's cache
+        )
 
     @classmethod
     def get_by_email(cls, email):
-        accounts_data = cls._load_accounts_data()
-        for acc_data in accounts_data:
-            if acc_data['email'] == email:
-                return cls(
-                    accountID=acc_data.get('accountID'),
-                    name=acc_data.get('name'),
-                    email=acc_data.get('email'),
-                    phoneNumber=acc_data.get('phoneNumber'),
-                    password_hash=acc_data.get('password_hash'), # Load HASH
-                    orders=acc_data.get('orders', []),
-                )
-        return None
+        """Returns the Account with this email (case-insensitive), or None. Uses data_manager's email index."""
+        account = cls.from_dict(data_manager.get_account_by_email_data(email))
+        return identity_map.canonical("account", account.accountID, account) if account else None
 
     @classmethod
     def get_by_id(cls, account_id: str):
-        """Returns an Account object by its ID, or None if not found."""
-        accounts_data = cls._load_accounts_data()
-        for acc_data in accounts_data:
-            if acc_data.get('accountID') == account_id:
-                # Ensure all args expected by __init__ are provided or have defaults
-                return cls(
-                    accountID=acc_data.get('accountID'),
-                    name=acc_data.get('name'),
-                    email=acc_data.get('email'),
-                    phoneNumber=acc_data.get('phoneNumber'),
-                    password_hash=acc_data.get('password_hash'),
-                    orders=acc_data.get('orders', []),
-                )
-        return None
+        """Returns an Account object by its ID, or None if not found. Cached for the rest of the request."""
+        return identity_map.lookup("account", account_id, lambda: cls.from_dict(data_manager.get_account_by_id_data(account_id)))
+
+    @classmethod
+    def get_many(cls, account_ids) -> dict:
+        """{accountID: Account} for the given IDs (unknown ones left out), from one read of the store."""
+        return identity_map.lookup_many("account", account_ids, lambda missing: {
+            acc_data.get('accountID'): cls.from_dict(acc_data)
+            for acc_data in data_manager.get_accounts_by_ids_data(missing)})
 
     @classmethod
     def create(cls, name, email, phoneNumber, password): # Changed method name for clarity
         """
-        Creates a new account, hashes the password, and saves it to the JSON file.
+        Creates a new account, hashes the password, and saves it through data_manager.
         Returns the new Account object or raises ValueError if email exists.
         """
-        accounts_list = cls._load_accounts_data()
-
-        # Custom validation for email uniqueness (already in your form, but good to have here too)
-        if cls.get_by_email(email): # Use existing get_by_email
+        email = (email or "").strip()
+        # Fast path for the common case; data_manager re-checks under its lock, so of two
+        # concurrent sign-ups with the same email only one can succeed
+        if cls.get_by_email(email):
             raise ValueError('That email address is already registered.')
 
-        # Generate a simple new account ID (you might want a more robust system later)
-        if accounts_list:
-            last_id_num = int(accounts_list[-1]['accountID'].replace('acc', ''))
-            new_id_num = last_id_num + 1
-        else:
-            new_id_num = 1
-        new_account_id = f"acc{new_id_num:03d}"
+        # Leased from data_manager's ID allocator, so concurrent sign-ups never share an ID
+        new_account_id = data_manager.get_next_account_id()
 
         new_account_data = {
             "accountID": new_account_id,
             "name": name,
             "email": email,
             "phoneNumber": phoneNumber,
-            "password_hash": generate_password_hash(password), # HASH THE PASSWORD
+            "password_hash": password_hashing.hash_password(password), # HASH THE PASSWORD (in the hashing pool)
             "orders": [],
         }
 
-        accounts_list.append(new_account_data)
-        cls._save_accounts_data(accounts_list)
+        data_manager.create_account_data(new_account_data) # Raises DuplicateKeyError (a ValueError) if taken meanwhile
 
         # Return an instance of the Account class
-        return cls(
-            accountID=new_account_data['accountID'],
-            name=new_account_data['name'],
-            email=new_account_data['email'],
-            phoneNumber=new_account_data['phoneNumber'],
-            password_hash=new_account_data['password_hash'],
-            orders=new_account_data['orders'],
-        )
\ No newline at end of file
+        return cls.from_dict(new_account_data)
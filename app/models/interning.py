@@ -0,0 +1,11 @@
+# artproject/app/models/interning.py
+import sys
+
+
+def intern_str(value):
+    """
+    sys.intern() for strings, so the thousands of repeated item names, routes,
+    account IDs etc. decoded from the data files share one object each.
+    Non-strings (None, numbers) are returned unchanged.
+    """
+    return sys.intern(value) if type(value) is str else value
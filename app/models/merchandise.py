@@ -1,29 +1,70 @@
 # artproject/app/models/merchandise.py
-from typing import Optional, List
-from app import data_manager 
+from typing import Dict, Optional, List
+from app import catalog, data_manager, identity_map
+from app.unit_of_work import current_unit_of_work, unit_of_work
+from app.versioning import SAVE_RETRY_ATTEMPTS, VersionConflictError, wait_before_retry
+from .interning import intern_str
 
 class Merchandise:
-    def __init__(self, merchandiseID: str, name: str, description: str, price: float, stockLevel: int):
+    __slots__ = ('merchandiseID', 'name', 'description', 'price', 'stockLevel', 'version')
+
+    def __init__(self, merchandiseID: str, name: str, description: str, price: float, stockLevel: int, version: int = 0):
         self.merchandiseID: str = merchandiseID
-        self.name: str = name
-        self.description: str = description
+        self.name: str = intern_str(name) # Shared with the line items that name this item
+        self.description: str = description # One per item: nothing to share
         self.price: float = price
         self.stockLevel: int = stockLevel
+        self.version: int = version # Stored version this object was read at (see app/versioning.py)
 
     def update_stock(self, quantity_change: int):
-        """Positive for adding stock, negative for reducing."""
-        self.stockLevel += quantity_change
-        if self.stockLevel < 0:
-            print(f"Warning: Stock for {self.name} is now negative: {self.stockLevel}")
-            self.stockLevel = 0
-        # IMPORTANT: Now we also need to save this change back to the file
-        all_merch = data_manager.get_all_merchandise_data()
-        for i, item_data in enumerate(all_merch):
-            if item_data.get("merchandiseID") == self.merchandiseID:
-                all_merch[i]["stockLevel"] = self.stockLevel
-                break
-        data_manager.save_all_merchandise_data(all_merch)
+        """
+        Positive for adding stock, negative for reducing.
+        Saved as a compare-and-swap on the item's version; on a conflict the
+        current stock level is re-read and the change re-applied (bounded retry).
+        Inside a unit of work the change is applied when the operation commits,
+        and insufficient stock fails the whole operation instead of clamping.
+        """
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.register_delta("merchandise", self.merchandiseID, "stockLevel", quantity_change,
+                               on_commit=self._set_stored)
+            return
+        for attempt in range(SAVE_RETRY_ATTEMPTS):
+            new_level = self.stockLevel + quantity_change
+            if new_level < 0:
+                print(f"Warning: Stock for {self.name} is now negative: {new_level}")
+                new_level = 0
+            item_data = self.to_dict()
+            item_data["stockLevel"] = new_level
+            try:
+                self.version = data_manager.save_merchandise_data(item_data, expected_version=self.version)
+            except VersionConflictError as e:
+                conflict = e
+                wait_before_retry(attempt)
+                current = data_manager.get_merchandise_by_id_data(self.merchandiseID)
+                if not current:
+                    raise
+                self.stockLevel = int(current.get("stockLevel", 0))
+                self.version = int(current.get("version") or 0)
+                continue
+            self.stockLevel = new_level
+            identity_map.forget_unless("merchandise", self.merchandiseID, [self])
+            return
+        raise conflict # Still contended after SAVE_RETRY_ATTEMPTS attempts
 
+    @staticmethod
+    def apply_stock_deltas(deltas: Dict[str, int]):
+        """
+        Applies {merchandiseID: change} to several items in one pass: every item
+        must exist and keep a stock level of at least 0, and all of them are
+        written with one save of the merchandise store, or none is (ValueError, or
+        ShortfallError for insufficient stock).
+        Joins the caller's unit of work, committing with it.
+        """
+        with unit_of_work() as uow:
+            for merchandise_id, change in deltas.items():
+                if change:
+                    uow.register_delta("merchandise", merchandise_id, "stockLevel", change)
 
     def check_availability(self, quantity: int = 1) -> bool:
         return self.stockLevel >= quantity
@@ -39,19 +80,30 @@ class Merchandise:
 
     @staticmethod
     def get_by_id(merchandise_id: str) -> Optional['Merchandise']:
-        item_data = data_manager.get_merchandise_by_id_data(merchandise_id)
-        if item_data:
-            # Create a Merchandise object from the dictionary data
-            return Merchandise(**item_data)
-        return None
+        def load():
+            item_data = catalog.get_snapshot().merchandise.get(merchandise_id) # Shared snapshot, see app/catalog.py
+            if item_data:
+                # Create a Merchandise object from the dictionary data
+                return Merchandise(**item_data)
+            return None
+        # Repeated lookups in one request return the same object (see app/identity_map.py)
+        return identity_map.lookup("merchandise", merchandise_id, load)
+
+    @staticmethod
+    def get_many(merchandise_ids) -> Dict[str, 'Merchandise']:
+        """{merchandiseID: Merchandise} for the given IDs (unknown ones left out), from the catalog snapshot."""
+        def load_many(missing):
+            items = catalog.get_snapshot().merchandise
+            return {merchandise_id: Merchandise(**items[merchandise_id]) for merchandise_id in missing if merchandise_id in items}
+        return identity_map.lookup_many("merchandise", merchandise_ids, load_many)
 
     @staticmethod
     def get_all() -> List['Merchandise']:        
         all_items_data = None # Initialize to see if it gets populated
         try:
-            all_items_data = data_manager.get_all_merchandise_data()
+            all_items_data = list(catalog.get_snapshot().merchandise.values()) # Shared snapshot, see app/catalog.py
         except Exception as e_data_manager:
-            print(f"ERROR Merchandise.get_all(): EXCEPTION calling data_manager.get_all_merchandise_data(): {e_data_manager}") # 4. Error from data_manager?
+            print(f"ERROR Merchandise.get_all(): EXCEPTION loading the catalog snapshot: {e_data_manager}") # 4. Error from data_manager?
             return [] # Return empty if data_manager failed
 
         if not isinstance(all_items_data, list):
@@ -84,18 +136,20 @@ class Merchandise:
             "name": self.name,
             "description": self.description,
             "price": self.price,
-            "stockLevel": self.stockLevel
+            "stockLevel": self.stockLevel,
+            "version": self.version
         }
 
     def save(self):
         """Saves the current merchandise item or updates it in the data file."""
-        all_merch_data = data_manager.get_all_merchandise_data()
-        item_exists = False
-        for i, item_data in enumerate(all_merch_data):
-            if item_data.get("merchandiseID") == self.merchandiseID:
-                all_merch_data[i] = self.to_dict() # Update existing
-                item_exists = True
-                break
-        if not item_exists:
-            all_merch_data.append(self.to_dict()) # Add new
-        data_manager.save_all_merchandise_data(all_merch_data)
\ No newline at end of file
+        # Fails with VersionConflictError if the item was changed since it was loaded
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.register_save("merchandise", self.merchandiseID, self.to_dict(), self.version, on_commit=self._set_stored)
+            return
+        self.version = data_manager.save_merchandise_data(self.to_dict(), expected_version=self.version) # Updates existing or adds new
+        identity_map.forget_unless("merchandise", self.merchandiseID, [self])
+
+    def _set_stored(self, item_data: dict):
+        self.stockLevel = int(item_data.get("stockLevel", 0))
+        self.version = int(item_data.get("version") or 0)
@@ -4,8 +4,11 @@ from .account import Account
 from .payment import Payment
 from .merchandise import Merchandise
 from .trip import Trip # Import Trip model here
-from app import data_manager # Your data persistence layer
-from typing import List, Optional, Union, TYPE_CHECKING
+from .interning import intern_str
+from app import data_manager, identity_map # Your data persistence layer
+from app.unit_of_work import current_unit_of_work, unit_of_work
+from app.versioning import ShortfallError
+from typing import Dict, List, Optional, Tuple, Union, TYPE_CHECKING
 from datetime import datetime, timezone
 import json # For pretty printing in debug
 
@@ -14,8 +17,76 @@ if TYPE_CHECKING:
     from .trip import Trip # For type hinting
     from .merchandise import Merchandise # For type hinting
 
+_HYDRATED = object() # Marks lazily loaded fields that have already been decoded
+
+
+def _parse_order_timestamp(order_timestamp_str: Optional[str], order_id: str) -> datetime:
+    """UTC datetime for a stored orderTimestamp; the current time if it is missing or unreadable."""
+    order_timestamp_obj = datetime.now(timezone.utc) # Default to current time
+    if order_timestamp_str:
+        try:
+            if order_timestamp_str.endswith('Z'):
+                order_timestamp_str = order_timestamp_str[:-1] + '+00:00'
+            dt_obj = datetime.fromisoformat(order_timestamp_str)
+            # Ensure timestamp is UTC and offset-aware
+            order_timestamp_obj = dt_obj.astimezone(timezone.utc) if dt_obj.tzinfo else dt_obj.replace(tzinfo=timezone.utc)
+        except ValueError as e:
+            print(f"Warning: Invalid order timestamp format '{order_timestamp_str}' for order {order_id}: {e}. Using current time.")
+    return order_timestamp_obj
+
+
+def _item_type_summary(line_items: List[tuple]) -> str:
+    """E.g. "Ticket" or "Mixed (Merchandise, Ticket)" from (item_type, item_name, is_active) tuples."""
+    if not line_items:
+        return "No Items"
+    item_types_present = set(item_type.capitalize() for item_type, _, _ in line_items)
+    if len(item_types_present) == 1:
+        return item_types_present.pop()
+    elif len(item_types_present) > 1:
+        return f"Mixed ({', '.join(sorted(list(item_types_present)))})"
+    return "Various Items"
+
+
+def _item_names_summary(line_items: List[tuple], max_items_to_show=3) -> str:
+    """The active items' names (all names if none is active), cut off after max_items_to_show."""
+    if not line_items:
+        return "N/A"
+
+    active_item_names = [item_name for _, item_name, is_active in line_items if is_active]
+
+    items_to_summarize = active_item_names
+    if not items_to_summarize:
+        items_to_summarize = [item_name for _, item_name, _ in line_items] # Fallback to all items if no active
+
+    if not items_to_summarize:
+         return "No items in order"
+
+    if len(items_to_summarize) > max_items_to_show:
+        return ", ".join(items_to_summarize[:max_items_to_show]) + "..."
+    return ", ".join(items_to_summarize)
+
+
+def build_order_summary(line_items: List[tuple], quantities: List[int]) -> dict:
+    """
+    The denormalized summary stored with each order (under "summary") when it is
+    saved, so lists and dashboards never have to read the line items. Takes
+    (item_type, item_name, is_active) tuples and the matching quantities.
+    """
+    return {
+        "primaryItemType": _item_type_summary(line_items),
+        "itemNames": _item_names_summary(line_items),
+        "lineItemCount": len(line_items),
+        "activeLineItemCount": sum(1 for _, _, is_active in line_items if is_active),
+        "activeQuantity": sum(quantity for (_, _, is_active), quantity in zip(line_items, quantities) if is_active),
+        "hasActiveTicket": any(item_type == "ticket" and is_active for item_type, _, is_active in line_items),
+    }
+
 
 class SalesLineItem:
+    # Slots instead of a per-instance __dict__: the sales history holds many of these
+    __slots__ = ('lineItemID', '_item_id', 'item_type', 'quantity', 'unit_price', 'item_name',
+                 'line_item_status', 'lineTotal')
+
     def __init__(self, lineItemID: str,
                  item_id: str, # ID of the actual Ticket (Trip ID) or Merchandise object
                  item_type: str, # "ticket" or "merchandise"
@@ -26,10 +97,10 @@ class SalesLineItem:
                  ):
         self.lineItemID: str = lineItemID
         self._item_id: str = item_id
-        self.item_type: str = item_type
+        self.item_type: str = intern_str(item_type)
         self.quantity: int = quantity
         self.unit_price: float = unit_price
-        self.item_name: str = item_name
+        self.item_name: str = intern_str(item_name) # The same few names repeat across thousands of orders
         # Store status as Enum for type safety and better comparisons
         try:
              self.line_item_status: TicketStatus = TicketStatus(line_item_status)
@@ -103,6 +174,11 @@ class SalesLineItem:
             "line_item_status": self.line_item_status.value # Save Enum value as string
         }
 
+    @staticmethod
+    def has_required_fields(data: dict) -> bool:
+        return all([data.get("lineItemID"), data.get("item_id"), data.get("item_type"),
+                    data.get("quantity") is not None, data.get("unit_price") is not None])
+
     @classmethod
     def from_dict(cls, data: dict) -> Optional['SalesLineItem']:
         line_item_id = data.get("lineItemID")
@@ -113,7 +189,7 @@ class SalesLineItem:
         item_name = data.get("item_name", "N/A")
         line_item_status_str = data.get("line_item_status", TicketStatus.ACTIVE.value) # Default to Enum value string
 
-        if not all([line_item_id, item_id, item_type, quantity is not None, unit_price is not None]):
+        if not cls.has_required_fields(data):
             print(f"Warning: SalesLineItem data is missing required fields for creation: {data}")
             return None
 
@@ -136,6 +212,10 @@ class SalesLineItem:
         )
 
 class Order:
+    __slots__ = ('orderID', 'placingAccountID', '_orderLinetems', '_raw_line_items', '_payment', '_raw_payment',
+                 'status', 'cancellationRequests', 'refundRequests', 'orderTimestamp', 'version', 'totalAmount',
+                 '_stored_summary')
+
     def __init__(self, orderID: str, placingAccountID: str,
                  orderLinetems: Optional[List[SalesLineItem]] = None,
                  totalAmount: float = 0.0,
@@ -143,10 +223,11 @@ class Order:
                  status: OrderStatus = OrderStatus.PENDING_PAYMENT,
                  cancellationRequests: Optional[List[str]] = None,
                  refundRequests: Optional[List[str]] = None,
-                 orderTimestamp: Optional[datetime] = None):
+                 orderTimestamp: Optional[datetime] = None,
+                 version: int = 0):
 
         self.orderID: str = orderID
-        self.placingAccountID: str = placingAccountID
+        self.placingAccountID: str = intern_str(placingAccountID)
         self.orderLinetems: List[SalesLineItem] = orderLinetems if orderLinetems is not None else []
         self.payment: Optional[Payment] = payment
         # Store status as Enum
@@ -159,6 +240,8 @@ class Order:
         self.cancellationRequests: List[str] = cancellationRequests if cancellationRequests is not None else []
         self.refundRequests: List[str] = refundRequests if refundRequests is not None else []
         self.orderTimestamp: datetime = orderTimestamp if orderTimestamp is not None else datetime.now(timezone.utc)
+        self.version: int = version # Stored version this object was read at (see app/versioning.py)
+        self._stored_summary: Optional[dict] = None # "summary" as loaded; valid while line items are unhydrated
 
         # We will calculate totalAmount based on line items, but initialize or load it.
         self.totalAmount: float = totalAmount
@@ -166,6 +249,43 @@ class Order:
         # self.update_total_amount()
 
 
+    # --- Lazily hydrated fields ---
+    # An order loaded with from_dict(lazy=True) keeps its raw line item and payment
+    # dicts and only builds the SalesLineItem/Payment objects on first access, so
+    # pages that show just the order header never pay for decoding them.
+    @property
+    def orderLinetems(self) -> List[SalesLineItem]:
+        if self._raw_line_items is not _HYDRATED:
+            raw_line_items, self._raw_line_items = self._raw_line_items, _HYDRATED
+            self._orderLinetems = [sli_obj for li_data in raw_line_items if (sli_obj := SalesLineItem.from_dict(li_data))]
+        return self._orderLinetems
+
+    @orderLinetems.setter
+    def orderLinetems(self, line_items: List[SalesLineItem]):
+        self._orderLinetems = line_items
+        self._raw_line_items = _HYDRATED
+
+    @property
+    def payment(self) -> Optional[Payment]:
+        if self._raw_payment is not _HYDRATED:
+            raw_payment, self._raw_payment = self._raw_payment, _HYDRATED
+            self._payment = Payment.from_dict(raw_payment)
+        return self._payment
+
+    @payment.setter
+    def payment(self, payment: Optional[Payment]):
+        self._payment = payment
+        self._raw_payment = _HYDRATED
+
+    def _line_item_summaries(self) -> List[tuple]:
+        """(item_type, item_name, is_active) per line item, read from the raw dicts if not yet hydrated."""
+        if self._raw_line_items is _HYDRATED:
+            return [(item.item_type, item.item_name, item.line_item_status == TicketStatus.ACTIVE)
+                    for item in self._orderLinetems]
+        return [(li_data.get("item_type"), li_data.get("item_name", "N/A"),
+                 li_data.get("line_item_status", TicketStatus.ACTIVE.value) == TicketStatus.ACTIVE.value)
+                for li_data in self._raw_line_items if SalesLineItem.has_required_fields(li_data)]
+
     @property
     def placingAccount(self) -> Optional['Account']:
         # Ensure Account model has get_by_id
@@ -224,30 +344,33 @@ class Order:
 
         # Simulate transaction - call process_transaction method on Payment object
         if new_payment.process_transaction():
+            previous_payment, previous_status = self.payment, self.status
             self.payment = new_payment
             self.update_status(OrderStatus.PAID, save_to_file=False) # Update order status
 
-            # --- Encapsulate stock/seat updates here AFTER successful payment ---
-            # This ensures stock/seats are only reduced for paid orders
-            for li in self.orderLinetems:
-                if li.line_item_status == TicketStatus.ACTIVE:
-                    if li.item_type == "merchandise":
-                        merch = Merchandise.get_by_id(li.item_id)
-                        if merch:
-                            try:
-                                # update_stock method in Merchandise should handle saving itself
-                                merch.update_stock(-li.quantity)
-                                print(f"Stock updated for merchandise {li.item_id}: -{li.quantity}")
-                            except Exception as e:
-                                print(f"Error updating stock for merchandise {li.item_id} during payment processing: {e}")
-                                # Handle failure - potentially refund or mark order as failed/needs review
-                                # For now, just print error
-                        else:
-                            print(f"Warning: Merchandise item {li.item_id} not found for stock update during payment.")
-                    # NOTE: Ticket seat availability is handled during the initial purchase creation now (see create_ticket_order)
-            # --- End Stock/Seat Updates ---
-
-            self.save() # Save the order with updated status and payment
+            # Stock reductions and the PAID order commit together (or, e.g. on insufficient
+            # stock, not at all); joins the caller's unit of work if there is one
+            try:
+                with unit_of_work():
+                    # --- Encapsulate stock/seat updates here AFTER successful payment ---
+                    # This ensures stock/seats are only reduced for paid orders. All merchandise lines
+                    # are validated and applied as one batch of stock deltas (one merchandise write).
+                    stock_deltas = {}
+                    for li in self.orderLinetems:
+                        if li.line_item_status == TicketStatus.ACTIVE and li.item_type == "merchandise":
+                            stock_deltas[li.item_id] = stock_deltas.get(li.item_id, 0) - li.quantity
+                        # NOTE: Ticket seat availability is handled during the initial purchase creation now (see create_ticket_order)
+                    if stock_deltas:
+                        Merchandise.apply_stock_deltas(stock_deltas) # Missing items / insufficient stock fail the commit
+                        print(f"Stock changes recorded for order {self.orderID}: {stock_deltas}")
+                    # --- End Stock/Seat Updates ---
+
+                    self.save() # Save the order with updated status and payment
+            except BaseException:
+                # Nothing was written: don't leave this object PAID with a payment that was never stored
+                self.payment = previous_payment
+                self.status = previous_status
+                raise
             print(f"Payment processed and order {self.orderID} marked PAID.")
             return True
         else:
@@ -259,32 +382,26 @@ class Order:
             return False
 
 
+    def _current_stored_summary(self) -> Optional[dict]:
+        # Line items that were hydrated may have been changed since the summary was saved
+        return self._stored_summary if self._raw_line_items is not _HYDRATED else None
+
     def get_primary_item_type_summary(self) -> str:
-        if not self.orderLinetems:
-            return "No Items"
-        item_types_present = set(item.item_type.capitalize() for item in self.orderLinetems)
-        if len(item_types_present) == 1:
-            return item_types_present.pop()
-        elif len(item_types_present) > 1:
-            return f"Mixed ({', '.join(sorted(list(item_types_present)))})"
-        return "Various Items"
+        summary = self._current_stored_summary()
+        if summary is not None:
+            return summary["primaryItemType"]
+        return _item_type_summary(self._line_item_summaries())
 
     def get_item_summary_names(self, max_items_to_show=3) -> str:
-        if not self.orderLinetems:
-            return "N/A"
-
-        active_item_names = [item.item_name for item in self.orderLinetems if item.line_item_status == TicketStatus.ACTIVE] # Compare Enum values
+        summary = self._current_stored_summary()
+        if summary is not None and max_items_to_show == 3: # The stored names use the default cut-off
+            return summary["itemNames"]
+        return _item_names_summary(self._line_item_summaries(), max_items_to_show)
 
-        items_to_summarize = active_item_names
-        if not items_to_summarize:
-            items_to_summarize = [item.item_name for item in self.orderLinetems] # Fallback to all items if no active
-
-        if not items_to_summarize:
-             return "No items in order"
-
-        if len(items_to_summarize) > max_items_to_show:
-            return ", ".join(items_to_summarize[:max_items_to_show]) + "..."
-        return ", ".join(items_to_summarize)
+    def build_summary(self) -> dict:
+        """Summary of the current line items, as stored with the order by save()."""
+        line_items = self.orderLinetems # Hydrated first, so both lists below come from the same objects
+        return build_order_summary(self._line_item_summaries(), [item.quantity for item in line_items])
 
 
     def to_dict(self) -> dict:
@@ -298,28 +415,27 @@ class Order:
             "status": self.status.value, # Save Enum value as string
             "cancellationRequests": self.cancellationRequests,
             "refundRequests": self.refundRequests,
-            "orderTimestamp": self.orderTimestamp.isoformat()
+            "orderTimestamp": self.orderTimestamp.isoformat(),
+            "version": self.version
         }
 
     def save(self):
         """Saves the current Order object to the data source."""
         print(f"DEBUG Order.save(): Saving Order {self.orderID} with status {self.status.value}")
-        all_orders_data = data_manager.get_all_sales_data()
         order_dict_to_save = self.to_dict()
-
-        updated_all_orders_data = []
-        found = False
-        for existing_order_dict in all_orders_data:
-            if existing_order_dict.get("orderID") == self.orderID:
-                updated_all_orders_data.append(order_dict_to_save)
-                found = True
-            else:
-                updated_all_orders_data.append(existing_order_dict)
-        if not found:
-            updated_all_orders_data.append(order_dict_to_save)
+        # Computed once per save and stored with the order, so list views never read the line items
+        order_dict_to_save["summary"] = self.build_summary()
+        uow = current_unit_of_work()
+        if uow is not None:
+            # Written when the enclosing operation commits, together with its seat/stock changes
+            uow.register_save("sales", self.orderID, order_dict_to_save, self.version, on_commit=self._set_stored)
+            return
 
         try:
-            data_manager.save_all_sales_data(updated_all_orders_data)
+            # Compare-and-swap: fails with VersionConflictError if another request saved this
+            # order since it was loaded, rather than overwriting that request's change
+            self.version = data_manager.save_order_data(order_dict_to_save, expected_version=self.version)
+            identity_map.forget_unless("order", self.orderID, [self]) # Other copies loaded this request are stale
             print(f"DEBUG Order.save(): Successfully saved Order {self.orderID}")
         except Exception as e:
             print(f"CRITICAL ERROR Order.save(): Failed to save Order {self.orderID}: {e}")
@@ -327,16 +443,25 @@ class Order:
             raise # Re-raise the exception so the route can catch it
 
 
+    def _set_stored(self, order_data: dict):
+        self.version = int(order_data.get("version") or 0)
+
     @classmethod
-    def from_dict(cls, data: dict) -> Optional['Order']:
+    def from_dict(cls, data: dict, lazy: bool = False) -> Optional['Order']:
+        """
+        Builds an Order from its stored dict. With lazy=True the line items and
+        payment are decoded only when first accessed.
+        """
         if not data or not data.get("orderID") or not data.get("placingAccountID"):
              print(f"Warning: Order data is missing essential keys for creation: {data}")
              return None
 
         line_items_data = data.get("orderLinetems", [])
-        line_items_objs = [sli_obj for li_data in line_items_data if (sli_obj := SalesLineItem.from_dict(li_data))]
-
-        payment_obj = Payment.from_dict(data.get("payment")) # Use .get for safety
+        if lazy:
+            line_items_objs, payment_obj = None, None # Filled in below as raw dicts
+        else:
+            line_items_objs = [sli_obj for li_data in line_items_data if (sli_obj := SalesLineItem.from_dict(li_data))]
+            payment_obj = Payment.from_dict(data.get("payment")) # Use .get for safety
 
         status_str = data.get("status", OrderStatus.PENDING_PAYMENT.value)
         try:
@@ -345,47 +470,66 @@ class Order:
             print(f"Warning: Invalid order status string '{status_str}' for order {data.get('orderID')}. Defaulting to PENDING_PAYMENT.")
             status_enum = OrderStatus.PENDING_PAYMENT
 
-        order_timestamp_str = data.get("orderTimestamp")
-        order_timestamp_obj = datetime.now(timezone.utc) # Default to current time
-        if order_timestamp_str:
-            try:
-                if order_timestamp_str.endswith('Z'):
-                    order_timestamp_str = order_timestamp_str[:-1] + '+00:00'
-                dt_obj = datetime.fromisoformat(order_timestamp_str)
-                # Ensure timestamp is UTC and offset-aware
-                order_timestamp_obj = dt_obj.astimezone(timezone.utc) if dt_obj.tzinfo else dt_obj.replace(tzinfo=timezone.utc)
-            except ValueError as e:
-                print(f"Warning: Invalid order timestamp format '{order_timestamp_str}' for order {data.get('orderID')}: {e}. Using current time.")
+        order_timestamp_obj = _parse_order_timestamp(data.get("orderTimestamp"), data.get("orderID"))
 
-        return cls(
+        order = cls(
             orderID=data["orderID"],
             placingAccountID=data["placingAccountID"],
             orderLinetems=line_items_objs,
             totalAmount=float(data.get("totalAmount", 0.0)), # Use .get for safety
             payment=payment_obj,
             status=status_enum,
-            cancellationRequests=data.get("cancellationRequests", []), # Use .get for safety
-            refundRequests=data.get("refundRequests", []),         # Use .get for safety
-            orderTimestamp=order_timestamp_obj
+            # Copy the lists: the data may be shared with data_manager's read cache
+            cancellationRequests=list(data.get("cancellationRequests", [])),
+            refundRequests=list(data.get("refundRequests", [])),
+            orderTimestamp=order_timestamp_obj,
+            version=int(data.get("version") or 0)
         )
+        if lazy:
+            order._raw_line_items = list(line_items_data) # Copied: the dicts may be shared with data_manager's read cache
+            order._raw_payment = data.get("payment")
+            if isinstance(data.get("summary"), dict):
+                order._stored_summary = data["summary"]
+        return order
 
     @staticmethod
     def get_by_id(order_id: str) -> Optional['Order']:
         """Loads a specific Order object by ID."""
-        order_data = data_manager.get_order_by_id_data(order_id)
-        return Order.from_dict(order_data)
+        # Repeated lookups in one request return the same object (see app/identity_map.py)
+        return identity_map.lookup("order", order_id,
+                                   lambda: Order.from_dict(data_manager.get_order_by_id_data(order_id)))
 
     @staticmethod
-    def get_all() -> List['Order']:
-        """Loads all Order objects."""
+    def get_many(order_ids, lazy: bool = False) -> Dict[str, 'Order']:
+        """{orderID: Order} for the given IDs (unknown ones left out), from one read of the store."""
+        return identity_map.lookup_many("order", order_ids, lambda missing: {
+            order.orderID: order for o_data in data_manager.get_orders_by_ids_data(missing)
+            if (order := Order.from_dict(o_data, lazy=lazy))})
+
+    @staticmethod
+    def get_all(lazy: bool = False) -> List['Order']:
+        """Loads all Order objects (see from_dict for lazy)."""
         all_orders_data = data_manager.get_all_sales_data()
-        return [order_obj for o_data in all_orders_data if (order_obj := Order.from_dict(o_data))]
+        return [order_obj for o_data in all_orders_data if (order_obj := Order.from_dict(o_data, lazy=lazy))]
+
+    @staticmethod
+    def get_orders_by_account_id(account_id: str, lazy: bool = False) -> List['Order']:
+         """Loads Order objects for a specific account ID, oldest first. Only that account's orders are hydrated."""
+         account_orders_data = data_manager.get_orders_by_account_id_data(account_id)
+         return [order_obj for o_data in account_orders_data if (order_obj := Order.from_dict(o_data, lazy=lazy))]
 
     @staticmethod
-    def get_orders_by_account_id(account_id: str) -> List['Order']:
-         """Loads Order objects for a specific account ID."""
-         all_orders = Order.get_all()
-         return [order for order in all_orders if order.placingAccountID == account_id]
+    def get_history_page(account_id: str, limit: int, before: Optional[tuple] = None
+                         ) -> Tuple[List['OrderSummary'], Optional[tuple]]:
+        """
+        One page of the account's orders, newest first, as OrderSummary headers:
+        (summaries, cursor for the next page or None on the last page). `before`
+        is a cursor returned by the previous call.
+        """
+        headers = data_manager.get_order_headers_page_data(account_id, limit + 1, before) # One extra: is there more?
+        summaries = [summary for header in headers[:limit] if (summary := OrderSummary.from_header(header))]
+        next_cursor = summaries[-1].cursor if len(headers) > limit and summaries else None
+        return summaries, next_cursor
 
     def find_line_item_by_sli_id(self, line_item_id: str) -> Optional[SalesLineItem]:
         """Finds a specific SalesLineItem object within this order by its ID."""
@@ -433,37 +577,37 @@ class Order:
         # --- Perform the updates ---
         # The original SLI status was updated by the call above: original_sli_found.mark_rescheduled()
 
-        if original_trip_obj:
-            # update_availability handles saving the trip
-             original_trip_obj.update_availability(+original_sli_found.quantity) # Add seats back (quantity should be 1 for tickets)
-             print(f"  Original Trip {original_trip_obj.id} availability updated.")
-
-        # update_availability handles saving the trip
-        new_trip_obj.update_availability(-1) # Deduct seat from new trip
-        print(f"  New Trip {new_trip_obj.id} availability updated.")
-
-
-        # Create a new Sales Line Item for the new ticket
-        new_sli_id = data_manager.generate_unique_id("sli")
-        new_ticket_sli = SalesLineItem(
-            lineItemID=new_sli_id,
-            item_id=new_trip_obj.id, # Item ID is the NEW trip ID
-            item_type="ticket",
-            item_name=f"Ticket: {new_trip_obj.route} - {new_trip_obj.date} {new_trip_obj.time}",
-            quantity=1,
-            unit_price=new_trip_obj.price, # Use price of the new trip
-            line_item_status=TicketStatus.ACTIVE.value # New ticket starts as ACTIVE
-        )
-
-        self.add_line_item(new_ticket_sli) # This appends and calls update_total_amount()
-
+        # Both seat changes and the order save commit together; if any of them fails
+        # (e.g. the new trip sold out meanwhile) none of them is written
         try:
-            self.save() # Save the modified order (with updated statuses and new line item)
+            with unit_of_work():
+                if original_trip_obj:
+                    original_trip_obj.update_availability(+original_sli_found.quantity) # Add seats back (quantity should be 1 for tickets)
+                    print(f"  Original Trip {original_trip_obj.id} availability updated.")
+
+                new_trip_obj.update_availability(-1) # Deduct seat from new trip
+                print(f"  New Trip {new_trip_obj.id} availability updated.")
+
+
+                # Create a new Sales Line Item for the new ticket
+                new_sli_id = data_manager.generate_unique_id("sli")
+                new_ticket_sli = SalesLineItem(
+                    lineItemID=new_sli_id,
+                    item_id=new_trip_obj.id, # Item ID is the NEW trip ID
+                    item_type="ticket",
+                    item_name=f"Ticket: {new_trip_obj.route} - {new_trip_obj.date} {new_trip_obj.time}",
+                    quantity=1,
+                    unit_price=new_trip_obj.price, # Use price of the new trip
+                    line_item_status=TicketStatus.ACTIVE.value # New ticket starts as ACTIVE
+                )
+
+                self.add_line_item(new_ticket_sli) # This appends and calls update_total_amount()
+                self.save() # Save the modified order (with updated statuses and new line item)
             print(f"DEBUG Order.reschedule_ticket_line_item: END - Order {self.orderID} save successful.")
             return True
         except Exception as e:
             print(f"CRITICAL ERROR Order.reschedule_ticket_line_item: Failed to save Order {self.orderID} during reschedule: {e}")
-            # Need robust rollback here in a real system (e.g., undo availability changes and SLI status)
+            # Nothing was written; this in-memory Order is stale and should be reloaded
             return False
 
 
@@ -474,7 +618,12 @@ class Order:
         updates order status, and potentially initiates a refund.
         Saves the order and affected items.
         Returns True if cancellation process initiated (at least one item cancelled), False otherwise.
+        Item statuses, restocks/seat releases and the order (with any refund) commit together.
         """
+        with unit_of_work():
+            return self._cancel_items()
+
+    def _cancel_items(self) -> bool:
         print(f"DEBUG Order.initiate_cancellation(): START - Order {self.orderID}")
 
         if self.status in [OrderStatus.COMPLETED, OrderStatus.CANCELLED, OrderStatus.FAILED]:
@@ -484,7 +633,8 @@ class Order:
         self.cancellationRequests.append(f"Cancellation requested by user on {datetime.now(timezone.utc).isoformat()}")
 
         items_successfully_cancelled_count = 0
-        any_item_restocked = False
+        seat_deltas = {} # trip ID -> seats to return
+        stock_deltas = {} # merchandiseID -> units to restock
 
         for sli in self.orderLinetems:
             # --- Call method on SLI instead of direct attribute access ---
@@ -493,38 +643,25 @@ class Order:
                  items_successfully_cancelled_count += 1
                  print(f"  Successfully cancelled SLI {sli.lineItemID}.")
 
-                 # --- Restock/Release Seats ---
+                 # --- Collect seats/stock to release; applied below as one batch per store ---
                  if sli.item_type == "ticket":
                      # For tickets, item_id is the Trip ID in the current design
-                     trip_obj = Trip.get_by_id(sli.item_id)
-                     if trip_obj:
-                         try:
-                              # update_availability method in Trip should handle saving itself
-                             trip_obj.update_availability(+sli.quantity) # Add seats back (quantity is typically 1 for tickets)
-                             print(f"  Returned seat(s) to trip {trip_obj.id}.")
-                         except Exception as e:
-                             print(f"  Error updating trip availability for {trip_obj.id} during cancellation: {e}")
-                             # Log or handle partial failure
-                     else:
-                         print(f"  Warning: Trip {sli.item_id} not found for availability update during cancellation.")
-
+                     seat_deltas[sli.item_id] = seat_deltas.get(sli.item_id, 0) + sli.quantity
                  elif sli.item_type == "merchandise":
-                     merch_obj = Merchandise.get_by_id(sli.item_id)
-                     if merch_obj:
-                         try:
-                             # update_stock method in Merchandise should handle saving itself
-                             merch_obj.update_stock(+sli.quantity) # Add stock back
-                             any_item_restocked = True
-                             print(f"  Restocked {sli.quantity} of merchandise {merch_obj.merchandiseID}.")
-                         except Exception as e:
-                             print(f"  Error updating merchandise stock for {merch_obj.merchandiseID} during cancellation: {e}")
-                             # Log or handle partial failure
-                     else:
-                         print(f"  Warning: Merchandise {sli.item_id} not found for stock update during cancellation.")
-                 # --- End Restock/Release Seats ---
+                     stock_deltas[sli.item_id] = stock_deltas.get(sli.item_id, 0) + sli.quantity
             else:
                  print(f"  SLI {sli.lineItemID} was not cancelled (status was not ACTIVE).")
 
+        # --- Restock/Release Seats ---
+        # Validated and written together with the order when the unit of work commits
+        if seat_deltas:
+            Trip.apply_seat_deltas(seat_deltas)
+            print(f"  Returning seat(s) to trips: {seat_deltas}")
+        if stock_deltas:
+            Merchandise.apply_stock_deltas(stock_deltas)
+            print(f"  Restocking merchandise: {stock_deltas}")
+        # --- End Restock/Release Seats ---
+
 
         if items_successfully_cancelled_count == 0:
             print(f"  No active items were successfully cancelled in order {self.orderID}.")
@@ -602,20 +739,24 @@ class Order:
 
     # --- Factory methods to create new orders ---
     @staticmethod
-    def create_ticket_order(account_id: str, trip_id: str, payment_method_details: str) -> Optional['Order']:
+    def create_ticket_order(account_id: str, trip_id: str, payment_method_details: str,
+                            trip: Optional['Trip'] = None, account: Optional['Account'] = None) -> Optional['Order']:
         """
         Creates a new order for a single ticket purchase.
         Handles fetching trip details, checking availability, updating trip availability,
         creating order and line item, processing payment, and saving.
+        `trip` and `account` may be passed in if the caller already loaded them.
         Returns the created Order object on success, None on failure.
         Raises exceptions for specific failures like not enough seats.
         """
-        account = Account.get_by_id(account_id)
+        if account is None or account.accountID != account_id:
+            account = Account.get_by_id(account_id)
         if not account:
             print(f"ERROR create_ticket_order: Account {account_id} not found.")
             return None # Account not found is a critical failure
 
-        trip = Trip.get_by_id(trip_id)
+        if trip is None or trip.id != trip_id:
+            trip = Trip.get_by_id(trip_id)
         if not trip:
             print(f"ERROR create_ticket_order: Trip {trip_id} not found.")
             return None # Trip not found is a critical failure
@@ -640,30 +781,25 @@ class Order:
         )
         new_order.add_line_item(ticket_sli) # Adds the SLI and updates order total
 
-        # --- Update trip availability immediately when the ticket is added/allocated ---
-        # update_availability method handles saving the trip data
+        # --- Allocate the seat and take payment as one unit of work ---
+        # The seat, the order and its payment are written together when the block exits;
+        # if anything fails (including the trip selling out meanwhile) none of them is.
         try:
-             trip.update_availability(-1)
-             print(f"Trip {trip.id} availability updated successfully.")
+            with unit_of_work():
+                trip.update_availability(-1)
+                # Process payment - this will update order status to PAID and call new_order.save()
+                payment_success = new_order.process_payment(payment_method_details)
+        except ShortfallError:
+            print(f"ERROR create_ticket_order: Not enough seats on trip {trip_id} when the order was committed.")
+            raise ValueError(f"Not enough seats available for trip {trip.route} on {trip.date} {trip.time}.")
         except Exception as e:
-             print(f"CRITICAL ERROR create_ticket_order: Failed to update trip availability for {trip.id}: {e}")
+            print(f"CRITICAL ERROR create_ticket_order: Failed to place order {new_order.orderID} for trip {trip.id}: {e}")
+            raise RuntimeError(f"Failed to place order {new_order.orderID} for trip {trip.id}.") from e
 
-             raise RuntimeError(f"Failed to update seat availability for trip {trip.id}.") from e
-
-
-        # Process payment - this will update order status to PAID and call new_order.save()
-        try:
-             payment_success = new_order.process_payment(payment_method_details)
-             if not payment_success:
-                 print(f"ERROR create_ticket_order: Payment processing failed for order {new_order.orderID}.")
-                 # process_payment already saves the order with status FAILED, so return the order.
-                 return new_order
-        except Exception as e:
-             print(f"CRITICAL ERROR create_ticket_order: Exception during payment processing for order {new_order.orderID}: {e}")
-             # process_payment might not have been called or saved. Attempt to mark as FAILED if possible.
-             if new_order.status == OrderStatus.PENDING_PAYMENT:
-                  new_order.update_status(OrderStatus.FAILED, save_to_file=True)
-             raise RuntimeError(f"Error during payment processing for new order {new_order.orderID}.") from e
+        if not payment_success:
+            print(f"ERROR create_ticket_order: Payment processing failed for order {new_order.orderID}.")
+            # The order was saved with status FAILED (the seat stays allocated to it, as before)
+            return new_order
 
 
         print(f"DEBUG create_ticket_order: Successfully created and processed Order {new_order.orderID}")
@@ -671,16 +807,21 @@ class Order:
 
 
     @staticmethod
-    def create_merchandise_order(account_id: str, items_with_quantities: List[dict], payment_method_details: str) -> Optional['Order']:
+    def create_merchandise_order(account_id: str, items_with_quantities: List[dict], payment_method_details: str,
+                                 merchandise: Optional[Dict[str, 'Merchandise']] = None,
+                                 account: Optional['Account'] = None) -> Optional['Order']:
         """
         Creates a new order for merchandise items.
         Takes a list of dictionaries: [{'merch_id': '...', 'quantity': N}, ...].
         Handles fetching merchandise, checking stock, creating order and line items,
         processing payment (which updates stock), and saving.
+        `merchandise` ({merchandiseID: Merchandise}) and `account` may be passed in if
+        the caller already loaded them; any items not in it are fetched with one get_many.
         Returns the created Order object on success, None on critical failure.
         Raises exceptions for specific failures like not enough stock.
         """
-        account = Account.get_by_id(account_id)
+        if account is None or account.accountID != account_id:
+            account = Account.get_by_id(account_id)
         if not account:
             print(f"ERROR create_merchandise_order: Account {account_id} not found.")
             return None # Critical failure
@@ -688,6 +829,12 @@ class Order:
         order_id = data_manager.get_next_order_id()
         new_order = Order(orderID=order_id, placingAccountID=account_id)
 
+        merchandise = dict(merchandise or {})
+        missing_ids = [item_info.get('merch_id') for item_info in items_with_quantities
+                       if item_info.get('merch_id') and item_info.get('merch_id') not in merchandise]
+        if missing_ids:
+            merchandise.update(Merchandise.get_many(missing_ids)) # One store read however big the cart
+
         merchandise_line_items = []
         items_for_stock_update_check = {} # Store merch objects and final quantities before updating
 
@@ -697,7 +844,7 @@ class Order:
             if not merch_id or quantity <= 0:
                  continue # Skip invalid entries
 
-            merch_obj = Merchandise.get_by_id(merch_id)
+            merch_obj = merchandise.get(merch_id)
             if not merch_obj:
                 # If one item isn't found, should the whole order fail? Let's fail for now.
                 print(f"ERROR create_merchandise_order: Merchandise item {merch_id} not found.")
@@ -734,12 +881,16 @@ class Order:
         # Process payment - this will update order status to PAID and call new_order.save()
         # The logic to update merchandise stock is already in process_payment for ACTIVE merchandise items
         try:
-             payment_success = new_order.process_payment(payment_method_details)
+             payment_success = new_order.process_payment(payment_method_details) # Stock and order commit together
              if not payment_success:
                  print(f"ERROR create_merchandise_order: Payment processing failed for order {new_order.orderID}.")
                  # process_payment already saves the order with status FAILED.
                  # Stock wasn't deducted because process_payment checks for SUCCESSFUL status before updating stock.
                  return new_order # Return the order object with FAILED status
+        except ShortfallError:
+            # Stock ran out between the check above and the commit; nothing was written
+            print(f"ERROR create_merchandise_order: Not enough stock left when order {new_order.orderID} was committed.")
+            raise
         except Exception as e:
             print(f"CRITICAL ERROR create_merchandise_order: Exception during payment processing for order {new_order.orderID}: {e}")
              # process_payment might not have been called or saved. Attempt to mark as FAILED if possible.
@@ -752,4 +903,61 @@ class Order:
         return new_order # Return the successfully created order object
 
 
-    # --- END Factory methods ---
\ No newline at end of file
+    # --- END Factory methods ---
+
+
+class OrderSummary:
+    """
+    Header-only view of an order for the order history list: status, total,
+    payment status and item summaries, with no line item or payment objects.
+    """
+    __slots__ = ('orderID', 'placingAccountID', 'status', 'totalAmount', 'orderTimestamp', 'paymentStatus',
+                 'summary', '_stored_timestamp')
+
+    @classmethod
+    def from_header(cls, data: dict) -> Optional['OrderSummary']:
+        if not data or not data.get("orderID"):
+            return None
+        summary = cls()
+        summary.orderID = data["orderID"]
+        summary.placingAccountID = data.get("placingAccountID")
+        try:
+            summary.status = OrderStatus(data.get("status", OrderStatus.PENDING_PAYMENT.value))
+        except ValueError:
+            summary.status = OrderStatus.PENDING_PAYMENT
+        summary.totalAmount = float(data.get("totalAmount") or 0.0)
+        summary._stored_timestamp = data.get("orderTimestamp") or ""
+        summary.orderTimestamp = _parse_order_timestamp(data.get("orderTimestamp"), summary.orderID)
+        try:
+            summary.paymentStatus = PaymentStatus(data["paymentStatus"]) if data.get("paymentStatus") else None
+        except ValueError:
+            summary.paymentStatus = None
+        stored = data.get("summary")
+        if isinstance(stored, dict):
+            summary.summary = stored # Precomputed when the order was saved
+        else: # Orders saved before summaries were stored: the header carries their line items instead
+            line_items = data.get("lineItems") or ()
+            summary.summary = build_order_summary(
+                [(li.get("item_type"), li.get("item_name") or "N/A",
+                  (li.get("line_item_status") or TicketStatus.ACTIVE.value) == TicketStatus.ACTIVE.value)
+                 for li in line_items if li.get("item_type")],
+                [int(li.get("quantity") or 0) for li in line_items if li.get("item_type")])
+        return summary
+
+    @property
+    def cursor(self) -> tuple:
+        """Keyset cursor for the page after this order: its stored (orderTimestamp, orderID)."""
+        return (self._stored_timestamp, self.orderID)
+
+    @property
+    def has_active_ticket(self) -> bool:
+        return bool(self.summary.get("hasActiveTicket"))
+
+    def get_primary_item_type_summary(self) -> str:
+        return self.summary.get("primaryItemType", "No Items")
+
+    def get_item_summary_names(self) -> str:
+        return self.summary.get("itemNames", "N/A")
+
+    def __repr__(self):
+        return f"<OrderSummary {self.orderID} - {self.status.value}>"
@@ -3,8 +3,11 @@ from .enums import PaymentStatus
 from datetime import datetime, timezone
 from app import data_manager 
 from typing import Optional
+from .interning import intern_str
 
 class Payment:
+    __slots__ = ('paymentID', 'relatedOrderID', 'amount', 'timestamp', 'paymentMethodDetails', 'paymentStatus')
+
     def __init__(self, paymentID: str, relatedOrderID: str, amount: float,
                  paymentMethodDetails: str,
                  timestamp: Optional[datetime] = None,
@@ -13,7 +16,7 @@ class Payment:
         self.relatedOrderID: str = relatedOrderID
         self.amount: float = amount
         self.timestamp: datetime = timestamp if timestamp is not None else datetime.now(timezone.utc)
-        self.paymentMethodDetails: str = paymentMethodDetails
+        self.paymentMethodDetails: str = intern_str(paymentMethodDetails)
         # Ensure paymentStatus is an Enum member
         try:
             self.paymentStatus: PaymentStatus = PaymentStatus(paymentStatus) if isinstance(paymentStatus, str) else paymentStatus
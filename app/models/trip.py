@@ -1,15 +1,22 @@
 # app/models/trip.py
-from typing import List, Optional
-from app import data_manager 
+from datetime import datetime
+from typing import Dict, List, Optional
+from app import catalog, data_manager, identity_map, trip_index
+from app.unit_of_work import current_unit_of_work, unit_of_work
+from app.versioning import SAVE_RETRY_ATTEMPTS, VersionConflictError, wait_before_retry
+from .interning import intern_str
 
 class Trip:
-    def __init__(self, id: str, route: str, date: str, time: str, price: float, available_seats: int):
+    __slots__ = ('id', 'route', 'date', 'time', 'price', 'available_seats', 'version')
+
+    def __init__(self, id: str, route: str, date: str, time: str, price: float, available_seats: int, version: int = 0):
         self.id: str = id
-        self.route: str = route
-        self.date: str = date
-        self.time: str = time
+        self.route: str = intern_str(route)
+        self.date: str = intern_str(date)
+        self.time: str = intern_str(time)
         self.price: float = price
         self.available_seats: int = available_seats
+        self.version: int = version # Stored version this object was read at (see app/versioning.py)
 
     def __repr__(self):
         return f"<Trip {self.id} - {self.route} on {self.date} at {self.time}>"
@@ -22,7 +29,8 @@ class Trip:
             "date": self.date,
             "time": self.time,
             "price": self.price,
-            "available_seats": self.available_seats
+            "available_seats": self.available_seats,
+            "version": self.version
         }
 
     @classmethod
@@ -37,35 +45,86 @@ class Trip:
             date=data.get('date'),
             time=data.get('time'),
             price=float(data.get('price', 0.0)),
-            available_seats=int(data.get('available_seats', 0))
+            available_seats=int(data.get('available_seats', 0)),
+            version=int(data.get('version') or 0)
         )
 
     @staticmethod
     def get_by_id(trip_id: str) -> Optional['Trip']:
-        """Loads a specific trip by ID from the data source."""
-        trip_data = data_manager.get_trip_by_id_data(trip_id) # Assuming data_manager has this method
-        return Trip.from_dict(trip_data)
+        """Loads a specific trip by ID from the shared catalog snapshot (see app/catalog.py)."""
+        # Repeated lookups in one request return the same object (see app/identity_map.py)
+        return identity_map.lookup("trip", trip_id, lambda: Trip.from_dict(catalog.get_snapshot().trips.get(trip_id)))
+
+    @staticmethod
+    def get_many(trip_ids) -> Dict[str, 'Trip']:
+        """{trip ID: Trip} for the given IDs (unknown ones left out), from the catalog snapshot."""
+        def load_many(missing):
+            trips = catalog.get_snapshot().trips
+            return {trip_id: Trip.from_dict(trips[trip_id]) for trip_id in missing if trip_id in trips}
+        return identity_map.lookup_many("trip", trip_ids, load_many)
 
     @staticmethod
     def get_all() -> List['Trip']:
-        """Loads all trips from the data source."""
-        all_trips_data = data_manager.get_all_trips_data() # Assuming data_manager has this method
-        return [Trip.from_dict(data) for data in all_trips_data if Trip.from_dict(data) is not None]
+        """All trips, built from the shared catalog snapshot (no store access)."""
+        # Fresh objects each call: callers may change them, the snapshot's records stay untouched
+        return [trip for data in catalog.get_snapshot().trips.values() if (trip := Trip.from_dict(data)) is not None]
+
+    @staticmethod
+    def search(route: str = None, departs_from: datetime = None, departs_until: datetime = None,
+               with_seats: bool = False, exclude_id: str = None) -> List['Trip']:
+        """Trips matching the given filters, in departure order, from the trip index (see app/trip_index.py)."""
+        return [Trip.from_dict(data) for data in trip_index.get_index().search(
+            route=route, departs_from=departs_from, departs_until=departs_until,
+            with_seats=with_seats, exclude_id=exclude_id)]
 
     # Optional: Add methods for managing seat availability
     def check_availability(self, quantity: int = 1) -> bool:
         return self.available_seats >= quantity
 
     def update_availability(self, quantity_change: int):
-        """Increases (positive) or decreases (negative) available seats."""
-        self.available_seats += quantity_change
-        if self.available_seats < 0:
-            self.available_seats = 0 # Prevent negative stock
+        """
+        Increases (positive) or decreases (negative) available seats.
+        Saved as a compare-and-swap on the trip's version: if another request
+        changed the trip since it was loaded, the current seat count is re-read
+        and the change applied to it again, up to SAVE_RETRY_ATTEMPTS times.
+        Inside a unit of work the change is only recorded, and applied when the
+        operation commits; there, too few seats fails the whole operation.
+        """
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.register_delta("trips", self.id, "available_seats", quantity_change, on_commit=self._set_stored)
+            return
+        for attempt in range(SAVE_RETRY_ATTEMPTS):
+            trip_data = self.to_dict()
+            trip_data["available_seats"] = max(0, self.available_seats + quantity_change) # Prevent negative stock
+            try:
+                self.version = data_manager.save_trip_data(trip_data, expected_version=self.version)
+            except VersionConflictError as e:
+                conflict = e
+                wait_before_retry(attempt)
+                current = data_manager.get_trip_by_id_data(self.id)
+                if not current:
+                    raise
+                self.available_seats = int(current.get('available_seats', 0))
+                self.version = int(current.get('version') or 0)
+                continue
+            self.available_seats = trip_data["available_seats"]
+            identity_map.forget_unless("trip", self.id, [self])
+            return
+        raise conflict # Still contended after SAVE_RETRY_ATTEMPTS attempts
+
+    @staticmethod
+    def apply_seat_deltas(deltas: Dict[str, int]):
+        """
+        Applies {trip ID: change in available seats} in one pass: every trip must
+        exist and keep at least 0 seats, and all are written with one save of the
+        trips store, or none is (ValueError). Joins the caller's unit of work.
+        """
+        with unit_of_work() as uow:
+            for trip_id, change in deltas.items():
+                if change:
+                    uow.register_delta("trips", trip_id, "available_seats", change)
 
-        # IMPORTANT: Save the change back to the data source
-        all_trips = data_manager.get_all_trips_data()
-        for i, trip_data in enumerate(all_trips):
-            if trip_data.get("id") == self.id:
-                all_trips[i] = self.to_dict() # Update the dictionary in the list
-                break
-        data_manager.save_all_trips_data(all_trips) # Assuming data_manager has this method
\ No newline at end of file
+    def _set_stored(self, trip_data: dict):
+        self.available_seats = int(trip_data.get('available_seats', 0))
+        self.version = int(trip_data.get('version') or 0)
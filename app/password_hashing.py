@@ -0,0 +1,104 @@
+# artproject/app/password_hashing.py
+# Password hashing and verification run in a small process pool instead of the
+# request thread: werkzeug's scrypt takes tens of milliseconds of CPU per call,
+# so a burst of logins would otherwise hold every web worker and stall checkout
+# traffic behind it. At most PASSWORD_HASH_WORKERS hashes run at once and at most
+# PASSWORD_HASH_QUEUE_LIMIT more wait for a worker; beyond that callers get
+# PasswordHashingBusyError after PASSWORD_HASH_QUEUE_TIMEOUT seconds.
+#
+# New hashes use PASSWORD_HASH_METHOD. A stored hash made with other parameters
+# still verifies, and needs_rehash() tells the caller to replace it.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_METHOD = None # werkzeug method string, from config.PASSWORD_HASH_METHOD (None: werkzeug's default)
+WORKERS = int(os.environ.get('ART_PASSWORD_HASH_WORKERS', '2')) # 0 hashes in the calling thread
+QUEUE_LIMIT = int(os.environ.get('ART_PASSWORD_HASH_QUEUE_LIMIT', '32'))
+QUEUE_TIMEOUT = float(os.environ.get('ART_PASSWORD_HASH_QUEUE_TIMEOUT', '2.0'))
+
+_method_prefix = None # The "method:params" part of a hash made with HASH_METHOD, as werkzeug writes it
+_pool = None
+_pool_pid = None
+_slots = None # Bounds running + waiting jobs to WORKERS + QUEUE_LIMIT
+_pool_lock = threading.Lock()
+
+
+class PasswordHashingBusyError(RuntimeError):
+    """Too many password hashes are already running or queued."""
+
+
+def configure(config):
+    global HASH_METHOD, WORKERS, QUEUE_LIMIT, QUEUE_TIMEOUT, _method_prefix
+    HASH_METHOD = config.get('PASSWORD_HASH_METHOD', HASH_METHOD)
+    _method_prefix = _hash_prefix(HASH_METHOD)
+    WORKERS = int(config.get('PASSWORD_HASH_WORKERS', WORKERS))
+    QUEUE_LIMIT = int(config.get('PASSWORD_HASH_QUEUE_LIMIT', QUEUE_LIMIT))
+    QUEUE_TIMEOUT = float(config.get('PASSWORD_HASH_QUEUE_TIMEOUT', QUEUE_TIMEOUT))
+    _reset_pool()
+
+
+def _reset_pool():
+    global _pool, _pool_pid, _slots
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False)
+        _pool, _pool_pid, _slots = None, None, None
+
+
+def _get_pool():
+    global _pool, _pool_pid, _slots
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid(): # A forked worker process gets its own pool
+            # Spawned, not forked: the web process has other threads (e.g. the group-commit writer)
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            _slots = threading.BoundedSemaphore(WORKERS + QUEUE_LIMIT)
+            _pool_pid = os.getpid()
+        return _pool, _slots
+
+
+def _run(fn, *args):
+    if WORKERS <= 0:
+        return fn(*args)
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=QUEUE_TIMEOUT):
+        raise PasswordHashingBusyError("Too many sign-ins are being processed right now. Please try again shortly.")
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        print("Warning: A password hashing worker died; restarting the pool.")
+        _reset_pool()
+        raise
+    finally:
+        slots.release()
+
+
+def _method_args(method) -> tuple:
+    return (method,) if method else ()
+
+
+def _hash_prefix(method) -> str:
+    # Taken from a real hash: werkzeug expands short names ('scrypt' -> 'scrypt:32768:8:1')
+    return generate_password_hash('', *_method_args(method)).split('$', 1)[0]
+
+
+def hash_password(password: str) -> str:
+    return _run(generate_password_hash, password, *_method_args(HASH_METHOD))
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """True if the stored hash was made with other parameters than HASH_METHOD."""
+    global _method_prefix
+    if _method_prefix is None: # Not configured (e.g. a script): werkzeug's default method
+        _method_prefix = _hash_prefix(HASH_METHOD)
+    return bool(password_hash) and password_hash.split('$', 1)[0] != _method_prefix
@@ -0,0 +1,259 @@
+# artproject/app/sales_journal.py
+# Append-only journal for order records (enabled with SALES_JOURNAL in config.py).
+#
+# sales.json stays the base file. Each Order.save appends the full order as one
+# JSON line to the journal instead of rewriting sales.json, and an in-memory index
+# keeps the latest version of every order keyed by orderID. Every
+# `compact_every` appends (or on `flask compact-sales`) the journal is folded back
+# into sales.json and truncated. Records are whole orders, so replaying a journal
+# over a base that already contains some of them is harmless.
+import json
+import os
+import threading
+
+import click
+from flask.cli import with_appcontext
+
+from app.file_lock import file_lock
+from app.indexes import keyset_page, order_time_key
+from app.versioning import apply_versioned
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class SalesJournal:
+    def __init__(self, base_path: str, journal_path: str = None, compact_every: int = 500):
+        self.base_path = base_path
+        self.journal_path = journal_path or os.path.splitext(base_path)[0] + '_journal.jsonl'
+        self.lock_path = self.journal_path + '.lock'
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._orders = {} # orderID -> latest order dict, in first-saved order
+        self._account_orders = {} # placingAccountID -> set of orderIDs
+        self._base_key = None
+        self._journal_offset = 0 # Bytes of the journal already applied
+        self._journal_id = None # Inode of the journal file those bytes were read from
+        self._journal_records = 0
+        self._loaded = False
+
+    # --- Loading ---
+    def _read_base(self):
+        try:
+            with open(self.base_path, 'r') as f:
+                content = f.read()
+            data = json.loads(content) if content else []
+            return data if isinstance(data, list) else []
+        except FileNotFoundError:
+            return []
+        except json.JSONDecodeError:
+            print(f"Warning: Could not decode JSON from {self.base_path}. Starting from an empty base.")
+            return []
+
+    def _load_all(self):
+        self._base_key = _stat_key(self.base_path)
+        self._orders = {}
+        self._account_orders = {}
+        for order in self._read_base():
+            if isinstance(order, dict) and order.get("orderID"):
+                self._put(order)
+        self._journal_offset = 0
+        self._journal_id = None
+        self._journal_records = 0
+        self._loaded = True
+        self._replay_journal()
+
+    def _put(self, order):
+        previous = self._orders.get(order["orderID"])
+        if previous is not None and previous.get("placingAccountID") != order.get("placingAccountID"):
+            self._account_orders.get(previous.get("placingAccountID"), set()).discard(order["orderID"])
+        self._orders[order["orderID"]] = order
+        self._account_orders.setdefault(order.get("placingAccountID"), set()).add(order["orderID"])
+
+    def _replay_journal(self):
+        try:
+            with open(self.journal_path, 'rb') as f:
+                journal_id = os.fstat(f.fileno()).st_ino
+                replaced = self._journal_id is not None and journal_id != self._journal_id
+                if not replaced:
+                    f.seek(self._journal_offset)
+                    chunk = f.read()
+        except FileNotFoundError:
+            return
+        if replaced:
+            self._load_all() # A compaction swapped the journal since our last read; our offset is into the old one
+            return
+        self._journal_id = journal_id
+        end = chunk.rfind(b'\n') + 1 # Leave a partially written last line for the next refresh
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                order = json.loads(line)
+            except ValueError:
+                print(f"Warning: Skipping unreadable record in {self.journal_path}.")
+                continue
+            if isinstance(order, dict) and order.get("orderID"):
+                self._put(order)
+                self._journal_records += 1
+        self._journal_offset += end
+
+    def _refresh(self):
+        """Brings the index up to date with writes made by other processes."""
+        if not self._loaded or _stat_key(self.base_path) != self._base_key:
+            self._load_all() # First use, or another process compacted/replaced the base
+            return
+        try:
+            st = os.stat(self.journal_path)
+            journal_id, journal_size = st.st_ino, st.st_size
+        except OSError:
+            journal_id, journal_size = None, 0
+        if self._journal_id is not None and journal_id != self._journal_id:
+            self._load_all() # A compaction swapped in a new journal
+        elif journal_size < self._journal_offset:
+            self._load_all() # Journal was truncated underneath us
+        elif journal_size > self._journal_offset:
+            self._replay_journal()
+
+    # --- Reads ---
+    def get_all(self) -> list:
+        with self._lock:
+            self._refresh()
+            return list(self._orders.values())
+
+    def iter_all(self):
+        return iter(self.get_all())
+
+    def get(self, order_id: str):
+        with self._lock:
+            self._refresh()
+            return self._orders.get(order_id)
+
+    def get_many(self, order_ids) -> list:
+        """The orders with these IDs (unknown ones skipped), in the order asked for."""
+        with self._lock:
+            self._refresh()
+            return [order for order_id in order_ids if (order := self._orders.get(order_id)) is not None]
+
+    def get_by_account(self, account_id: str) -> list:
+        """Returns the account's orders, oldest first by orderTimestamp."""
+        with self._lock:
+            self._refresh()
+            orders = [self._orders[order_id] for order_id in self._account_orders.get(account_id, ())]
+        return sorted(orders, key=order_time_key)
+
+    def get_page_by_account(self, account_id: str, limit: int, before: tuple = None) -> list:
+        """The account's newest `limit` orders below the (orderTimestamp, orderID) cursor, newest first."""
+        return keyset_page(self.get_by_account(account_id), limit, before) # Already in memory: nothing to decode
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return {"orders": len(self._orders), "journal_records": self._journal_records,
+                    "journal_bytes": self._journal_offset}
+
+    # --- Writes ---
+    def append(self, order: dict, expected_version: int = None) -> int:
+        """Appends one order record and returns its new version; compacts once the journal reaches compact_every records."""
+        result = self.save_versioned([(order, expected_version)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def save_versioned(self, items: list) -> list:
+        """
+        Appends (order, expected_version) saves with a single write, skipping any
+        whose order changed since expected_version. Returns one result per item
+        (see versioning.apply_versioned).
+        """
+        with self._lock, file_lock(self.lock_path):
+            self._refresh() # Versions are checked against every process's appends
+            orders, results = apply_versioned(items, "orderID", self._orders.get)
+            if orders:
+                self._append_locked(orders)
+            return results
+
+    def append_many(self, orders: list):
+        """Appends several order records as given, with a single write and fsync."""
+        with self._lock, file_lock(self.lock_path):
+            self._refresh() # Apply other processes' appends so our offset stays contiguous
+            self._append_locked(orders)
+
+    def _append_locked(self, orders: list):
+        payload = b''.join((json.dumps(order, separators=(',', ':')) + '\n').encode('utf-8') for order in orders)
+        with open(self.journal_path, 'ab') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+            self._journal_id = os.fstat(f.fileno()).st_ino # Set here if this append created the journal
+        for order in orders:
+            self._put(order)
+        self._journal_offset += len(payload)
+        self._journal_records += len(orders)
+        if self.compact_every and self._journal_records >= self.compact_every:
+            self._compact_locked()
+
+    def replace_all(self, orders: list):
+        """save_all_sales_data semantics: the base becomes `orders` and the journal is emptied."""
+        with self._lock, file_lock(self.lock_path):
+            self._write_base(orders)
+
+    def compact(self) -> int:
+        """Folds the journal into the base file. Returns the number of journal records folded."""
+        with self._lock, file_lock(self.lock_path):
+            self._refresh()
+            return self._compact_locked()
+
+    def _compact_locked(self) -> int:
+        folded = self._journal_records
+        self._write_base(list(self._orders.values()))
+        return folded
+
+    def _write_base(self, orders: list):
+        tmp_path = self.base_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(orders, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.base_path)
+        # Readers that see the new base with the old journal only re-apply records
+        # already in the base. The journal is then replaced by a new, empty file rather
+        # than truncated in place: a reader holding an offset into the old one sees the
+        # inode change and reloads, instead of resuming mid-file once appends regrow it.
+        journal_tmp_path = self.journal_path + '.tmp'
+        open(journal_tmp_path, 'wb').close()
+        os.replace(journal_tmp_path, self.journal_path)
+        self._journal_id = os.stat(self.journal_path).st_ino
+        self._orders = {}
+        self._account_orders = {}
+        for order in orders:
+            if isinstance(order, dict) and order.get("orderID"):
+                self._put(order)
+        self._base_key = _stat_key(self.base_path)
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._loaded = True
+
+
+@click.command('compact-sales')
+@with_appcontext
+def compact_sales_command():
+    """Fold the order journal back into sales.json (or drop superseded lines from sales.jsonl)."""
+    from app import data_manager
+    jsonl_store = data_manager.get_sales_jsonl()
+    if jsonl_store is not None:
+        reclaimed = jsonl_store.compact()
+        click.echo(f"Compacted {jsonl_store.path}, reclaiming {reclaimed} bytes.")
+        return
+    journal = data_manager.get_sales_journal()
+    if journal is None:
+        click.echo("Neither the sales journal nor the JSONL sales store is enabled "
+                   "(set ART_SALES_JOURNAL=1 or ART_SALES_JSONL=1).")
+        return
+    folded = journal.compact()
+    click.echo(f"Folded {folded} journal records into {journal.base_path}.")
@@ -0,0 +1,300 @@
+# artproject/app/sales_jsonl.py
+# Memory-mapped order store (enabled with SALES_JSONL in config.py).
+#
+# sales.jsonl holds one order per line. Saving an order appends its new version
+# as a line; an offset index (orderID -> byte offset and length of its latest
+# line) lets a lookup slice that one record out of an mmap of the file and
+# decode only it, so order detail pages cost the same however many orders
+# exist, and the OS page cache rather than the Python heap holds the data.
+# Lines are written with orderID, placingAccountID and orderTimestamp first,
+# which lets the index - including each order's (orderTimestamp, orderID) sort
+# key for the order history pages - be built from each line's prefix without
+# decoding the whole record. Superseded lines are dropped by compaction
+# (`flask compact-sales`, or automatically once they make up most of the file);
+# it also rewrites lines saved before orderTimestamp was part of the prefix.
+import json
+import mmap
+import os
+import re
+import threading
+from typing import Iterator, Optional
+
+from app.file_lock import file_lock
+from app.indexes import keyset_page, order_time_key
+from app.versioning import apply_versioned
+
+_PREFIX_PATTERN = re.compile(rb'^\{"orderID":"((?:[^"\\]|\\.)*)","placingAccountID":((?:"(?:[^"\\]|\\.)*")|null)'
+                             rb'(?:,"orderTimestamp":((?:"(?:[^"\\]|\\.)*")|null))?')
+COMPACT_MIN_BYTES = 1 << 20 # Never bother compacting files smaller than this
+
+
+def encode_order(order: dict) -> bytes:
+    """One JSONL line for an order, with the three indexed fields first."""
+    ordered = {"orderID": order.get("orderID"), "placingAccountID": order.get("placingAccountID"),
+               "orderTimestamp": order.get("orderTimestamp")}
+    ordered.update(order)
+    return (json.dumps(ordered, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _json_string(raw: bytes):
+    # Most IDs contain no escapes, so skip the JSON decoder for them
+    return raw.decode('utf-8') if b'\\' not in raw else json.loads(b'"' + raw + b'"')
+
+
+def _optional_string(raw: bytes):
+    return _json_string(raw[1:-1]) if raw != b'null' else None
+
+
+def _line_keys(line: bytes):
+    """
+    (orderID, placingAccountID, sort key, from_prefix) of one line. from_prefix is
+    False for a line that had to be decoded whole (an older line layout).
+    """
+    match = _PREFIX_PATTERN.match(line)
+    if match and match.group(3) is not None:
+        order_id = _json_string(match.group(1))
+        return (order_id, _optional_string(match.group(2)),
+                order_time_key({"orderID": order_id, "orderTimestamp": _optional_string(match.group(3))}), True)
+    try:
+        order = json.loads(line)
+    except ValueError:
+        return None, None, None, False
+    if not isinstance(order, dict):
+        return None, None, None, False
+    return order.get("orderID"), order.get("placingAccountID"), order_time_key(order), False
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size)
+
+
+class JsonlSalesStore:
+    def __init__(self, path: str, legacy_path: str = None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.lock_path = path + '.lock'
+        self._lock = threading.RLock()
+        self._offsets = {} # orderID -> (offset, length) of its latest line, in first-saved order
+        self._account_orders = {} # placingAccountID -> set of orderIDs
+        self._time_keys = {} # orderID -> order_time_key of its latest line
+        self._unprefixed_lines = 0 # Indexed lines without the full prefix; compaction rewrites them
+        self._inode = None
+        self._indexed_bytes = 0 # Bytes of the file already indexed
+        self._live_bytes = 0 # Bytes in the lines the index points at
+        self._file = None
+        self._mm = None
+        self._loaded = False
+
+    # --- Index maintenance ---
+    def _close_map(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _map(self, size):
+        """(Re)maps the file when it has grown past the current mapping."""
+        if self._mm is not None and len(self._mm) >= size:
+            return
+        self._close_map()
+        if size == 0:
+            return # mmap cannot map an empty file
+        self._file = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _ensure_file(self):
+        """Creates the file (converting sales.json) on first use. Call without holding lock_path."""
+        if os.path.exists(self.path):
+            return
+        with self._lock, file_lock(self.lock_path):
+            if os.path.exists(self.path):
+                return
+            orders = []
+            if self.legacy_path:
+                from app import data_manager # Imported here: data_manager imports this module
+                orders = data_manager.read_json_file(self.legacy_path)
+                if orders:
+                    print(f"Converting {len(orders)} orders from {self.legacy_path} to {self.path}.")
+            self._write_file(orders)
+
+    def _reset_index(self):
+        self._offsets = {}
+        self._account_orders = {}
+        self._time_keys = {}
+        self._unprefixed_lines = 0
+        self._indexed_bytes = 0
+        self._live_bytes = 0
+
+    def _index_new_lines(self, size):
+        self._map(size)
+        if size <= self._indexed_bytes:
+            return
+        chunk_start = self._indexed_bytes
+        end = self._mm.rfind(b'\n', chunk_start, size) + 1 # Leave a partially written last line for the next refresh
+        if end <= chunk_start:
+            return
+        pos = chunk_start
+        for line in self._mm[chunk_start:end].split(b'\n')[:-1]:
+            if line.strip():
+                order_id, account_id, time_key, from_prefix = _line_keys(line)
+                if order_id:
+                    self._put(order_id, account_id, time_key, pos, len(line) + 1)
+                    if not from_prefix:
+                        self._unprefixed_lines += 1
+                else:
+                    print(f"Warning: Skipping unreadable record at byte {pos} of {self.path}.")
+            pos += len(line) + 1
+        self._indexed_bytes = end
+
+    def _put(self, order_id, account_id, time_key, offset, length):
+        previous = self._offsets.get(order_id)
+        if previous is not None:
+            self._live_bytes -= previous[1]
+            old_account = self._account_of(previous)
+            if old_account != account_id:
+                self._account_orders.get(old_account, set()).discard(order_id)
+        self._offsets[order_id] = (offset, length)
+        self._time_keys[order_id] = time_key
+        self._live_bytes += length
+        self._account_orders.setdefault(account_id, set()).add(order_id)
+
+    def _account_of(self, location):
+        offset, length = location
+        return _line_keys(self._mm[offset:offset + length - 1])[1]
+
+    def _refresh(self):
+        """Brings the index up to date with writes made by other processes."""
+        inode, size = _stat_key(self.path) or (None, 0) # A deleted file reads as empty
+        if not self._loaded or inode != self._inode or size < self._indexed_bytes:
+            # First use, or the file was compacted/replaced underneath us
+            self._close_map()
+            self._reset_index()
+            self._inode = inode
+            self._loaded = True
+        self._index_new_lines(size)
+
+    # --- Reads ---
+    def _decode(self, location) -> dict:
+        offset, length = location
+        return json.loads(self._mm[offset:offset + length])
+
+    def get(self, order_id: str) -> Optional[dict]:
+        self._ensure_file()
+        with self._lock:
+            self._refresh()
+            location = self._offsets.get(order_id)
+            return self._decode(location) if location else None
+
+    def get_many(self, order_ids) -> list:
+        """The orders with these IDs (unknown ones skipped), in the order asked for."""
+        self._ensure_file()
+        with self._lock:
+            self._refresh()
+            return [self._decode(location) for order_id in order_ids if (location := self._offsets.get(order_id))]
+
+    def iter_all(self) -> Iterator[dict]:
+        """Yields the latest version of every order, in first-saved order, decoding one at a time."""
+        self._ensure_file()
+        with self._lock:
+            self._refresh()
+            order_ids = list(self._offsets)
+        for order_id in order_ids:
+            with self._lock:
+                order = self._get_locked(order_id) # Offsets stay valid: compaction here re-indexes by orderID
+            if order is not None:
+                yield order
+
+    def get_by_account(self, account_id: str) -> list:
+        """Returns the account's orders, oldest first by orderTimestamp."""
+        self._ensure_file()
+        with self._lock:
+            self._refresh()
+            orders = [self._decode(self._offsets[order_id]) for order_id in self._account_orders.get(account_id, ())]
+        return sorted(orders, key=order_time_key)
+
+    def get_page_by_account(self, account_id: str, limit: int, before: tuple = None) -> list:
+        """
+        The account's newest `limit` orders below the (orderTimestamp, orderID)
+        cursor, newest first. Sort keys come from the index, so only the orders
+        on the page are decoded.
+        """
+        self._ensure_file()
+        with self._lock:
+            self._refresh()
+            keyed = sorted((self._time_keys[order_id], order_id)
+                           for order_id in self._account_orders.get(account_id, ()))
+            page = keyset_page(keyed, limit, before, sort_fn=lambda pair: pair[0])
+            return [self._decode(self._offsets[order_id]) for _, order_id in page]
+
+    def stats(self) -> dict:
+        self._ensure_file()
+        with self._lock:
+            self._refresh()
+            return {"orders": len(self._offsets), "file_bytes": self._indexed_bytes, "live_bytes": self._live_bytes}
+
+    # --- Writes ---
+    def save_versioned(self, items: list) -> list:
+        """
+        Appends (order, expected_version) saves with a single write and fsync.
+        Returns one result per item (see versioning.apply_versioned).
+        """
+        self._ensure_file()
+        with self._lock, file_lock(self.lock_path):
+            self._refresh() # Versions are checked against every process's appends
+            orders, results = apply_versioned(items, "orderID", self._get_locked)
+            if orders:
+                self._append_locked(orders)
+                if self._unprefixed_lines or \
+                        (self._indexed_bytes > COMPACT_MIN_BYTES and self._live_bytes * 2 < self._indexed_bytes):
+                    self._compact_locked() # Older line layouts, or superseded versions now outweigh the live ones
+            return results
+
+    def _get_locked(self, order_id):
+        location = self._offsets.get(order_id)
+        return self._decode(location) if location else None
+
+    def _append_locked(self, orders: list):
+        lines = [encode_order(order) for order in orders]
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self._index_new_lines(_stat_key(self.path)[1])
+
+    def replace_all(self, orders: list):
+        """save_all_sales_data semantics: the file ends up holding exactly `orders`."""
+        with self._lock, file_lock(self.lock_path):
+            self._write_file(orders)
+            self._loaded = False
+
+    def compact(self) -> int:
+        """Rewrites the file with only the latest version of each order. Returns the bytes reclaimed."""
+        self._ensure_file()
+        with self._lock, file_lock(self.lock_path):
+            self._refresh()
+            return self._compact_locked()
+
+    def _compact_locked(self) -> int:
+        before = self._indexed_bytes
+        orders = [self._decode(location) for location in self._offsets.values()]
+        self._write_file(orders)
+        self._loaded = False
+        self._refresh()
+        return before - self._indexed_bytes
+
+    def _write_file(self, orders: list):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            for order in orders:
+                if isinstance(order, dict) and order.get("orderID"):
+                    f.write(encode_order(order))
+            f.flush()
+            os.fsync(f.fileno())
+        self._close_map() # Windows cannot replace a file that is still mapped
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,256 @@
+# artproject/app/sales_segments.py
+# Time-partitioned order storage (enabled with SALES_PARTITIONED in config.py).
+#
+# Orders are split into one JSON file per calendar month of their orderTimestamp
+# (sales_segments/sales-2025-06.json, ...), plus manifest.json mapping each
+# orderID to the month it was filed under. A checkout only rewrites the current
+# month's segment; older segments change only when one of their orders is
+# cancelled or refunded, so they stay cached in data_manager's parsed-file cache
+# between requests. Orders never move between segments once filed.
+#
+# On first use an existing sales.json is split into segments (the file itself is
+# left in place but no longer read). A lost or stale manifest is rebuilt from the
+# segment files.
+import json
+import os
+import re
+import threading
+from typing import Callable, Iterator, List, Optional
+
+import click
+from flask.cli import with_appcontext
+
+from app import data_manager
+from app.file_lock import file_lock
+from app.indexes import order_time_key
+
+_MONTH_PATTERN = re.compile(r'^(\d{4})-(\d{2})')
+UNDATED_SEGMENT = "undated" # For orders without a parseable orderTimestamp
+
+
+def segment_key(order: dict) -> str:
+    """The month ("YYYY-MM") an order is filed under, from its orderTimestamp."""
+    match = _MONTH_PATTERN.match(str(order.get("orderTimestamp") or ""))
+    return f"{match.group(1)}-{match.group(2)}" if match else UNDATED_SEGMENT
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class SegmentedSalesStore:
+    def __init__(self, directory: str, legacy_path: str,
+                 commit_file: Callable[[str, str, list], list]):
+        """
+        commit_file(filepath, key_field, items) applies (record, expected_version)
+        saves to one JSON file and returns one result per item, like
+        data_manager._commit_records_to_file.
+        """
+        self.directory = directory
+        self.legacy_path = legacy_path
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.lock_path = self.manifest_path + '.lock'
+        self._commit_file = commit_file
+        self._lock = threading.RLock()
+        self._manifest = None # orderID -> segment key
+        self._manifest_key = None
+
+    def segment_path(self, key: str) -> str:
+        return os.path.join(self.directory, f'sales-{key}.json')
+
+    def segment_keys(self) -> List[str]:
+        """Every segment on disk, oldest month first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        keys = [name[len('sales-'):-len('.json')] for name in names
+                if name.startswith('sales-') and name.endswith('.json')]
+        return sorted(keys, key=lambda key: (key == UNDATED_SEGMENT, key))
+
+    # --- Manifest ---
+    def _read_manifest(self) -> Optional[dict]:
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+            return manifest if isinstance(manifest, dict) else None
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            print(f"Warning: Could not decode JSON from {self.manifest_path}. Rebuilding it from the segments.")
+            return None
+
+    def _write_manifest(self, manifest: dict):
+        data_manager.write_json_file_atomic(self.manifest_path, manifest)
+        self._manifest = manifest
+        self._manifest_key = _stat_key(self.manifest_path)
+
+    def _ensure_manifest(self) -> dict:
+        """Returns the current manifest, creating it (and the segments) on first use."""
+        with self._lock:
+            current_key = _stat_key(self.manifest_path)
+            if self._manifest is not None and current_key == self._manifest_key:
+                return self._manifest
+            manifest = self._read_manifest() if current_key else None
+            if manifest is not None:
+                self._manifest, self._manifest_key = manifest, current_key
+                return manifest
+            os.makedirs(self.directory, exist_ok=True) # The lock file lives in the segments directory
+            with file_lock(self.lock_path):
+                manifest = self._read_manifest() # Another process may have just created it
+                if manifest is None:
+                    manifest = self._rebuild_locked()
+                self._manifest, self._manifest_key = manifest, _stat_key(self.manifest_path)
+                return manifest
+
+    def _rebuild_locked(self) -> dict:
+        if not self.segment_keys():
+            legacy = data_manager.read_json_file(self.legacy_path)
+            if legacy:
+                print(f"Partitioning {len(legacy)} orders from {self.legacy_path} into {self.directory}.")
+                self._write_segments_locked(legacy)
+                return self._manifest
+        manifest = {}
+        for key in self.segment_keys():
+            for order in data_manager.read_json_file_cached(self.segment_path(key)):
+                if isinstance(order, dict) and order.get("orderID"):
+                    manifest.setdefault(order["orderID"], key)
+        self._write_manifest(manifest)
+        return manifest
+
+    # --- Reads ---
+    def iter_all(self) -> Iterator[dict]:
+        """Yields every order, segment by segment (oldest month first); segments are loaded only as reached."""
+        self._ensure_manifest()
+        for key in self.segment_keys():
+            yield from data_manager.read_json_file_cached(self.segment_path(key))
+
+    def get(self, order_id: str) -> Optional[dict]:
+        key = self._ensure_manifest().get(order_id)
+        if key is None:
+            return None
+        return data_manager.get_record_index(self.segment_path(key), "orderID").get(order_id)
+
+    def get_many(self, order_ids) -> list:
+        """The orders with these IDs (unknown ones skipped), in the order asked for; one index lookup per segment."""
+        manifest = self._ensure_manifest()
+        indexes = {}
+        orders = []
+        for order_id in order_ids:
+            key = manifest.get(order_id)
+            if key is None:
+                continue
+            if key not in indexes:
+                indexes[key] = data_manager.get_record_index(self.segment_path(key), "orderID")
+            order = indexes[key].get(order_id)
+            if order is not None:
+                orders.append(order)
+        return orders
+
+    def get_by_account(self, account_id: str) -> list:
+        """Returns the account's orders, oldest first by orderTimestamp."""
+        self._ensure_manifest()
+        orders = []
+        for key in self.segment_keys():
+            orders.extend(data_manager.get_record_index(self.segment_path(key), "placingAccountID").get(account_id))
+        return sorted(orders, key=order_time_key)
+
+    def get_page_by_account(self, account_id: str, limit: int, before: tuple = None) -> list:
+        """
+        The account's newest `limit` orders below the (orderTimestamp, orderID)
+        cursor, newest first. Walks the segments from the cursor's month back and
+        stops once the page is full, so older months are never read.
+        """
+        self._ensure_manifest()
+        keys = self.segment_keys()
+        # Undated orders sort before every dated one, so their segment comes last here
+        newest_first = [key for key in reversed(keys) if key != UNDATED_SEGMENT] + \
+                       [key for key in keys if key == UNDATED_SEGMENT]
+        cursor_month = segment_key({"orderTimestamp": before[0]}) if before else None
+        orders = []
+        for key in newest_first:
+            if cursor_month and cursor_month != UNDATED_SEGMENT and key != UNDATED_SEGMENT and key > cursor_month:
+                continue # Entirely newer than the cursor
+            index = data_manager.get_record_index(self.segment_path(key), "placingAccountID")
+            orders.extend(index.page(account_id, limit - len(orders), before))
+            if len(orders) >= limit:
+                break
+        return orders
+
+    # --- Writes ---
+    def save_versioned(self, items: list) -> list:
+        """
+        Applies (order, expected_version) saves, one segment write per touched
+        month. Returns one result per item (see versioning.apply_versioned).
+        """
+        self._ensure_manifest()
+        with self._lock, file_lock(self.lock_path):
+            manifest = self._read_manifest() # Latest, including other processes' new orders
+            if manifest is None:
+                manifest = self._manifest
+            by_segment = {} # segment key -> [item index]
+            for i, (order, _) in enumerate(items):
+                key = manifest.get(order.get("orderID")) or segment_key(order)
+                by_segment.setdefault(key, []).append(i)
+
+            results = [None] * len(items)
+            new_entries = {}
+            for key, positions in by_segment.items():
+                segment_results = self._commit_file(self.segment_path(key), "orderID",
+                                                    [items[i] for i in positions])
+                for i, result in zip(positions, segment_results):
+                    results[i] = result
+                    order_id = items[i][0].get("orderID")
+                    if not isinstance(result, Exception) and order_id not in manifest:
+                        new_entries[order_id] = key
+            if new_entries:
+                # Written after the segments: an order is never listed in the manifest before it exists
+                self._write_manifest(dict(manifest, **new_entries))
+            return results
+
+    def replace_all(self, orders: list):
+        """save_all_sales_data semantics: the segments end up holding exactly `orders`."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, file_lock(self.lock_path):
+            self._write_segments_locked(orders)
+
+    def _write_segments_locked(self, orders: list):
+        segments = {}
+        manifest = {}
+        for order in orders:
+            if not isinstance(order, dict) or not order.get("orderID"):
+                continue
+            key = segment_key(order)
+            segments.setdefault(key, []).append(order)
+            manifest.setdefault(order["orderID"], key)
+        for key in self.segment_keys():
+            if key not in segments:
+                os.remove(self.segment_path(key))
+                data_manager.invalidate_cache(self.segment_path(key))
+        for key, segment_orders in segments.items():
+            path = self.segment_path(key)
+            try:
+                data_manager.write_json_file_atomic(path, segment_orders)
+            finally:
+                data_manager.invalidate_cache(path)
+        self._write_manifest(manifest)
+
+    def stats(self) -> dict:
+        manifest = self._ensure_manifest()
+        return {"orders": len(manifest), "segments": self.segment_keys()}
+
+
+@click.command('partition-sales')
+@with_appcontext
+def partition_sales_command():
+    """Split sales.json into monthly segments (also happens automatically on first use)."""
+    store = data_manager.get_sales_segments()
+    if store is None:
+        click.echo("Partitioned sales storage is not enabled (set ART_SALES_PARTITIONED=1).")
+        return
+    stats = store.stats()
+    click.echo(f"{stats['orders']} orders in {len(stats['segments'])} segments under {store.directory}.")
@@ -0,0 +1,660 @@
+# artproject/app/sqlite_store.py
+# SQLite implementation of the data_manager storage API.
+# Selected with STORAGE_BACKEND = "sqlite" (see config.py); the functions here take
+# and return the same dictionaries as the JSON file functions in data_manager, so
+# the models do not need to know which backend is active.
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import click
+from flask.cli import with_appcontext
+
+from app.indexes import DuplicateKeyError, normalized_email
+from app.versioning import VersionConflictError, apply_deltas
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE_PATH = os.path.join(BASE_DIR, 'art_system.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account_id    TEXT PRIMARY KEY,
+    name          TEXT,
+    email         TEXT NOT NULL,
+    phone_number  TEXT,
+    password_hash TEXT,
+    orders        TEXT NOT NULL DEFAULT '[]',
+    email_key     TEXT -- normalized_email(email); unique index created in _add_email_keys
+);
+
+CREATE TABLE IF NOT EXISTS trips (
+    id              TEXT PRIMARY KEY,
+    route           TEXT,
+    date            TEXT,
+    time            TEXT,
+    price           REAL NOT NULL DEFAULT 0,
+    available_seats INTEGER NOT NULL DEFAULT 0,
+    version         INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_trips_route_date ON trips (route, date);
+
+CREATE TABLE IF NOT EXISTS merchandise (
+    merchandise_id TEXT PRIMARY KEY,
+    name           TEXT,
+    description    TEXT,
+    price          REAL NOT NULL DEFAULT 0,
+    stock_level    INTEGER NOT NULL DEFAULT 0,
+    version        INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id              TEXT PRIMARY KEY,
+    placing_account_id    TEXT NOT NULL,
+    total_amount          REAL NOT NULL DEFAULT 0,
+    status                TEXT NOT NULL,
+    cancellation_requests TEXT NOT NULL DEFAULT '[]',
+    refund_requests       TEXT NOT NULL DEFAULT '[]',
+    order_timestamp       TEXT,
+    version               INTEGER NOT NULL DEFAULT 0,
+    summary               TEXT -- JSON summary written by Order.save; NULL for older orders
+);
+-- Covers the keyset-paginated order history; replaces the older idx_orders_account
+DROP INDEX IF EXISTS idx_orders_account;
+CREATE INDEX IF NOT EXISTS idx_orders_account_time ON orders (placing_account_id, order_timestamp, order_id);
+
+CREATE TABLE IF NOT EXISTS line_items (
+    order_id         TEXT NOT NULL REFERENCES orders (order_id) ON DELETE CASCADE,
+    position         INTEGER NOT NULL,
+    line_item_id     TEXT NOT NULL,
+    item_id          TEXT,
+    item_type        TEXT,
+    item_name        TEXT,
+    quantity         INTEGER,
+    unit_price       REAL,
+    line_total       REAL,
+    line_item_status TEXT,
+    PRIMARY KEY (order_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_line_items_id ON line_items (line_item_id);
+CREATE INDEX IF NOT EXISTS idx_line_items_item ON line_items (item_type, item_id);
+
+CREATE TABLE IF NOT EXISTS payments (
+    order_id               TEXT PRIMARY KEY REFERENCES orders (order_id) ON DELETE CASCADE,
+    payment_id             TEXT NOT NULL,
+    related_order_id       TEXT,
+    amount                 REAL,
+    timestamp              TEXT,
+    payment_method_details TEXT,
+    payment_status         TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_payments_id ON payments (payment_id);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name       TEXT PRIMARY KEY,
+    next_value INTEGER NOT NULL
+);
+
+-- Rows written to each catalog table, kept by the triggers below for
+-- catalog_source_key: every write counts, whichever process or code path made it
+CREATE TABLE IF NOT EXISTS table_changes (
+    name    TEXT PRIMARY KEY,
+    changes INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trips_changed_on_insert AFTER INSERT ON trips BEGIN
+    INSERT INTO table_changes (name, changes) VALUES ('trips', 1)
+        ON CONFLICT (name) DO UPDATE SET changes = changes + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trips_changed_on_update AFTER UPDATE ON trips BEGIN
+    INSERT INTO table_changes (name, changes) VALUES ('trips', 1)
+        ON CONFLICT (name) DO UPDATE SET changes = changes + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trips_changed_on_delete AFTER DELETE ON trips BEGIN
+    INSERT INTO table_changes (name, changes) VALUES ('trips', 1)
+        ON CONFLICT (name) DO UPDATE SET changes = changes + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS merchandise_changed_on_insert AFTER INSERT ON merchandise BEGIN
+    INSERT INTO table_changes (name, changes) VALUES ('merchandise', 1)
+        ON CONFLICT (name) DO UPDATE SET changes = changes + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS merchandise_changed_on_update AFTER UPDATE ON merchandise BEGIN
+    INSERT INTO table_changes (name, changes) VALUES ('merchandise', 1)
+        ON CONFLICT (name) DO UPDATE SET changes = changes + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS merchandise_changed_on_delete AFTER DELETE ON merchandise BEGIN
+    INSERT INTO table_changes (name, changes) VALUES ('merchandise', 1)
+        ON CONFLICT (name) DO UPDATE SET changes = changes + 1;
+END;
+"""
+
+
+def configure(database_path):
+    global DATABASE_PATH
+    if database_path and database_path != DATABASE_PATH:
+        DATABASE_PATH = database_path
+        close_connection()
+
+
+# --- Connection Pool ---
+# One connection per worker thread, reopened after a fork so that worker
+# processes never share a connection inherited from the parent.
+_local = threading.local()
+
+def get_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.path == DATABASE_PATH:
+        return conn
+    conn = sqlite3.connect(DATABASE_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    _add_version_columns(conn)
+    _add_email_keys(conn)
+    _add_summary_column(conn)
+    _local.conn, _local.pid, _local.path = conn, os.getpid(), DATABASE_PATH
+    return conn
+
+def _add_version_columns(conn):
+    # Databases created before record versioning lack the column; existing rows start at version 0
+    for table in ("trips", "merchandise", "orders"):
+        columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "version" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+def _add_summary_column(conn):
+    # Databases created before stored order summaries; those orders fall back to their line items
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(orders)")}
+    if "summary" not in columns:
+        conn.execute("ALTER TABLE orders ADD COLUMN summary TEXT")
+
+def _add_email_keys(conn):
+    # Databases created before the unique email index lack email_key; fill it in from email
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(accounts)")}
+    if "email_key" not in columns:
+        conn.execute("ALTER TABLE accounts ADD COLUMN email_key TEXT")
+        conn.execute("DROP INDEX IF EXISTS idx_accounts_email_nocase")
+    missing = conn.execute("SELECT account_id, email FROM accounts WHERE email_key IS NULL AND email IS NOT NULL").fetchall()
+    if missing:
+        conn.executemany("UPDATE accounts SET email_key = ? WHERE account_id = ?",
+                         [(normalized_email(row["email"]), row["account_id"]) for row in missing])
+    try:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_accounts_email_key ON accounts (email_key)")
+    except sqlite3.IntegrityError:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_accounts_email_key_dup ON accounts (email_key)")
+        print("Warning: Some accounts share an email address; email uniqueness is not enforced until they are merged.")
+
+def close_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+@contextmanager
+def transaction():
+    """Runs the block in one write transaction, rolling back on any exception."""
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# --- Row <-> dict conversion ---
+def _account_to_dict(row):
+    return {
+        "accountID": row["account_id"],
+        "name": row["name"],
+        "email": row["email"],
+        "phoneNumber": row["phone_number"],
+        "password_hash": row["password_hash"],
+        "orders": json.loads(row["orders"] or "[]"),
+    }
+
+def _trip_to_dict(row):
+    return {
+        "id": row["id"],
+        "route": row["route"],
+        "date": row["date"],
+        "time": row["time"],
+        "price": row["price"],
+        "available_seats": row["available_seats"],
+        "version": row["version"],
+    }
+
+def _merchandise_to_dict(row):
+    return {
+        "merchandiseID": row["merchandise_id"],
+        "name": row["name"],
+        "description": row["description"],
+        "price": row["price"],
+        "stockLevel": row["stock_level"],
+        "version": row["version"],
+    }
+
+def _line_item_to_dict(row):
+    item = {
+        "lineItemID": row["line_item_id"],
+        "item_id": row["item_id"],
+        "item_type": row["item_type"],
+        "item_name": row["item_name"],
+        "quantity": row["quantity"],
+        "unit_price": row["unit_price"],
+        "lineTotal": row["line_total"],
+    }
+    if row["line_item_status"] is not None: # Some legacy line items were saved without a status
+        item["line_item_status"] = row["line_item_status"]
+    return item
+
+def _payment_to_dict(row):
+    return {
+        "paymentID": row["payment_id"],
+        "relatedOrderID": row["related_order_id"],
+        "amount": row["amount"],
+        "timestamp": row["timestamp"],
+        "paymentMethodDetails": row["payment_method_details"],
+        "paymentStatus": row["payment_status"],
+    }
+
+def _order_to_dict(row, line_item_rows, payment_row):
+    return {
+        "orderID": row["order_id"],
+        "placingAccountID": row["placing_account_id"],
+        "orderLinetems": [_line_item_to_dict(li) for li in line_item_rows],
+        "totalAmount": row["total_amount"],
+        "payment": _payment_to_dict(payment_row) if payment_row is not None else None,
+        "status": row["status"],
+        "cancellationRequests": json.loads(row["cancellation_requests"] or "[]"),
+        "refundRequests": json.loads(row["refund_requests"] or "[]"),
+        "orderTimestamp": row["order_timestamp"],
+        "version": row["version"],
+        **({"summary": json.loads(row["summary"])} if row["summary"] else {}),
+    }
+
+def _load_orders(conn, where="", params=(), order_by="rowid"):
+    order_rows = conn.execute(f"SELECT * FROM orders {where} ORDER BY {order_by}", params).fetchall()
+    if not order_rows:
+        return []
+    order_ids = [row["order_id"] for row in order_rows]
+    line_items_by_order = {order_id: [] for order_id in order_ids}
+    payments_by_order = {}
+    # Chunk the IN (...) lists to stay under SQLite's bound-parameter limit
+    for start in range(0, len(order_ids), 500):
+        chunk = order_ids[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for li in conn.execute(f"SELECT * FROM line_items WHERE order_id IN ({placeholders}) ORDER BY order_id, position", chunk):
+            line_items_by_order[li["order_id"]].append(li)
+        for pay in conn.execute(f"SELECT * FROM payments WHERE order_id IN ({placeholders})", chunk):
+            payments_by_order[pay["order_id"]] = pay
+    return [_order_to_dict(row, line_items_by_order[row["order_id"]], payments_by_order.get(row["order_id"]))
+            for row in order_rows]
+
+def _rows_by_keys(conn, table, key_column, keys):
+    """Rows whose key is in `keys`, as {key: row}; chunked like _load_orders."""
+    rows = {}
+    keys = list(dict.fromkeys(keys))
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for row in conn.execute(f"SELECT * FROM {table} WHERE {key_column} IN ({placeholders})", chunk):
+            rows[row[key_column]] = row
+    return rows
+
+
+# --- Upserts ---
+def _upsert_account(conn, acc, insert_only=False):
+    upsert = """ON CONFLICT (account_id) DO UPDATE SET
+               name = excluded.name, email = excluded.email, email_key = excluded.email_key,
+               phone_number = excluded.phone_number, password_hash = excluded.password_hash,
+               orders = excluded.orders"""
+    try:
+        conn.execute(
+            f"""INSERT INTO accounts (account_id, name, email, email_key, phone_number, password_hash, orders)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               {"" if insert_only else upsert}""",
+            (acc.get("accountID"), acc.get("name"), acc.get("email"), normalized_email(acc.get("email")),
+             acc.get("phoneNumber"), acc.get("password_hash"), json.dumps(acc.get("orders", []))))
+    except sqlite3.IntegrityError as e:
+        if "email_key" in str(e):
+            raise DuplicateKeyError('That email address is already registered.') from e
+        raise DuplicateKeyError(f"Account ID {acc.get('accountID')} is already in use.") from e
+
+def _upsert_trip(conn, trip):
+    conn.execute(
+        """INSERT INTO trips (id, route, date, time, price, available_seats, version)
+           VALUES (?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT (id) DO UPDATE SET
+               route = excluded.route, date = excluded.date, time = excluded.time,
+               price = excluded.price, available_seats = excluded.available_seats,
+               version = excluded.version""",
+        (trip.get("id"), trip.get("route"), trip.get("date"), trip.get("time"),
+         trip.get("price", 0.0), trip.get("available_seats", 0), trip.get("version") or 0))
+
+def _upsert_merchandise(conn, item):
+    conn.execute(
+        """INSERT INTO merchandise (merchandise_id, name, description, price, stock_level, version)
+           VALUES (?, ?, ?, ?, ?, ?)
+           ON CONFLICT (merchandise_id) DO UPDATE SET
+               name = excluded.name, description = excluded.description,
+               price = excluded.price, stock_level = excluded.stock_level,
+               version = excluded.version""",
+        (item.get("merchandiseID"), item.get("name"), item.get("description"),
+         item.get("price", 0.0), item.get("stockLevel", 0), item.get("version") or 0))
+
+def _upsert_order(conn, order):
+    order_id = order.get("orderID")
+    conn.execute(
+        """INSERT INTO orders (order_id, placing_account_id, total_amount, status,
+                               cancellation_requests, refund_requests, order_timestamp, version, summary)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT (order_id) DO UPDATE SET
+               placing_account_id = excluded.placing_account_id, total_amount = excluded.total_amount,
+               status = excluded.status, cancellation_requests = excluded.cancellation_requests,
+               refund_requests = excluded.refund_requests, order_timestamp = excluded.order_timestamp,
+               version = excluded.version, summary = excluded.summary""",
+        (order_id, order.get("placingAccountID"), order.get("totalAmount", 0.0), order.get("status"),
+         json.dumps(order.get("cancellationRequests", [])), json.dumps(order.get("refundRequests", [])),
+         order.get("orderTimestamp"), order.get("version") or 0,
+         json.dumps(order["summary"]) if order.get("summary") else None))
+
+    conn.execute("DELETE FROM line_items WHERE order_id = ?", (order_id,))
+    conn.executemany(
+        """INSERT INTO line_items (order_id, position, line_item_id, item_id, item_type, item_name,
+                                   quantity, unit_price, line_total, line_item_status)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [(order_id, position, li.get("lineItemID"), li.get("item_id"), li.get("item_type"), li.get("item_name"),
+          li.get("quantity"), li.get("unit_price"), li.get("lineTotal"), li.get("line_item_status"))
+         for position, li in enumerate(order.get("orderLinetems", []))])
+
+    payment = order.get("payment")
+    if payment:
+        conn.execute(
+            """INSERT INTO payments (order_id, payment_id, related_order_id, amount, timestamp,
+                                     payment_method_details, payment_status)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (order_id) DO UPDATE SET
+                   payment_id = excluded.payment_id, related_order_id = excluded.related_order_id,
+                   amount = excluded.amount, timestamp = excluded.timestamp,
+                   payment_method_details = excluded.payment_method_details,
+                   payment_status = excluded.payment_status""",
+            (order_id, payment.get("paymentID"), payment.get("relatedOrderID"), payment.get("amount"),
+             # Older records used "paymentTimestamp"; Payment.from_dict accepts either key
+             payment.get("timestamp", payment.get("paymentTimestamp")),
+             payment.get("paymentMethodDetails"), payment.get("paymentStatus")))
+    else:
+        conn.execute("DELETE FROM payments WHERE order_id = ?", (order_id,))
+
+def _replace_all(conn, table, key_column, key_field, records, upsert):
+    """save_all_* semantics: the table ends up holding exactly `records`."""
+    keys = [rec.get(key_field) for rec in records]
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _keep (key TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM _keep")
+    conn.executemany("INSERT OR IGNORE INTO _keep (key) VALUES (?)", [(k,) for k in keys])
+    conn.execute(f"DELETE FROM {table} WHERE {key_column} NOT IN (SELECT key FROM _keep)")
+    for rec in records:
+        upsert(conn, rec)
+
+def _save_versioned(table, key_column, key_field, record, expected_version, upsert, source_changes=None):
+    """
+    Upserts one record with its version bumped; returns the new version. The check
+    and the write share one BEGIN IMMEDIATE transaction, so no other writer can
+    slip in between them. source_changes (when given) gets {table: (catalog
+    source key before, after)}, read inside that transaction.
+    """
+    with transaction() as conn:
+        before = _table_source_key(conn, table) if source_changes is not None else None
+        version = _check_and_upsert(conn, table, key_column, key_field, record, expected_version, upsert)
+        if source_changes is not None:
+            source_changes[table] = (before, _table_source_key(conn, table))
+        return version
+
+def _check_and_upsert(conn, table, key_column, key_field, record, expected_version, upsert):
+    key = record.get(key_field)
+    row = conn.execute(f"SELECT version FROM {table} WHERE {key_column} = ?", (key,)).fetchone()
+    stored_version = row["version"] if row else 0
+    if expected_version is not None and expected_version != stored_version:
+        raise VersionConflictError(key, expected_version, stored_version)
+    upsert(conn, dict(record, version=stored_version + 1))
+    return stored_version + 1
+
+
+# --- ID Blocks ---
+def reserve_id_block(sequence, block_size, seed):
+    """Advances the counter for `sequence` by block_size; returns the first value of the block."""
+    with transaction() as conn:
+        row = conn.execute("SELECT next_value FROM counters WHERE name = ?", (sequence,)).fetchone()
+        start = row["next_value"] if row else seed(sequence)
+        conn.execute("INSERT OR REPLACE INTO counters (name, next_value) VALUES (?, ?)", (sequence, start + block_size))
+    return start
+
+
+# --- Accounts Data ---
+def get_all_accounts_data():
+    return [_account_to_dict(row) for row in get_connection().execute("SELECT * FROM accounts ORDER BY rowid")]
+
+def save_all_accounts_data(accounts_data):
+    with transaction() as conn:
+        _replace_all(conn, "accounts", "account_id", "accountID", accounts_data, _upsert_account)
+
+def create_account_data(account_data):
+    with transaction() as conn:
+        _upsert_account(conn, account_data, insert_only=True)
+
+def save_account_data(account_data):
+    with transaction() as conn:
+        _upsert_account(conn, account_data)
+
+def get_account_by_id_data(account_id):
+    row = get_connection().execute("SELECT * FROM accounts WHERE account_id = ?", (account_id,)).fetchone()
+    return _account_to_dict(row) if row else None
+
+def get_accounts_by_ids_data(account_ids):
+    rows = _rows_by_keys(get_connection(), "accounts", "account_id", account_ids)
+    return [_account_to_dict(rows[key]) for key in account_ids if key in rows]
+
+def get_account_by_email_data(email):
+    # Served by the unique email_key index; emails match case-insensitively, like the JSON backend's
+    row = get_connection().execute("SELECT * FROM accounts WHERE email_key = ? ORDER BY rowid LIMIT 1",
+                                   (normalized_email(email),)).fetchone()
+    return _account_to_dict(row) if row else None
+
+
+# --- Merchandise Data ---
+def get_all_merchandise_data():
+    return [_merchandise_to_dict(row) for row in get_connection().execute("SELECT * FROM merchandise ORDER BY rowid")]
+
+def save_all_merchandise_data(merch_data):
+    with transaction() as conn:
+        _replace_all(conn, "merchandise", "merchandise_id", "merchandiseID", merch_data, _upsert_merchandise)
+
+def save_merchandise_data(item_data, expected_version=None, source_changes=None):
+    return _save_versioned("merchandise", "merchandise_id", "merchandiseID", item_data, expected_version,
+                           _upsert_merchandise, source_changes)
+
+def get_merchandise_by_id_data(merch_id):
+    row = get_connection().execute("SELECT * FROM merchandise WHERE merchandise_id = ?", (merch_id,)).fetchone()
+    return _merchandise_to_dict(row) if row else None
+
+def get_merchandise_by_ids_data(merch_ids):
+    rows = _rows_by_keys(get_connection(), "merchandise", "merchandise_id", merch_ids)
+    return [_merchandise_to_dict(rows[key]) for key in merch_ids if key in rows]
+
+
+# --- Sales/Orders Data ---
+def get_all_sales_data():
+    return _load_orders(get_connection())
+
+def save_all_sales_data(sales_data):
+    with transaction() as conn:
+        _replace_all(conn, "orders", "order_id", "orderID", sales_data, _upsert_order)
+
+def save_order_data(order_data, expected_version=None):
+    return _save_versioned("orders", "order_id", "orderID", order_data, expected_version, _upsert_order)
+
+def get_order_by_id_data(order_id):
+    orders = _load_orders(get_connection(), "WHERE order_id = ?", (order_id,))
+    return orders[0] if orders else None
+
+def get_orders_by_ids_data(order_ids):
+    conn = get_connection()
+    orders = {}
+    unique_ids = list(dict.fromkeys(order_ids))
+    for start in range(0, len(unique_ids), 500):
+        chunk = unique_ids[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for order in _load_orders(conn, f"WHERE order_id IN ({placeholders})", chunk):
+            orders[order["orderID"]] = order
+    return [orders[key] for key in order_ids if key in orders]
+
+
+def get_orders_by_account_id_data(account_id):
+    # Served by idx_orders_account_time (placing_account_id, order_timestamp, order_id)
+    return _load_orders(get_connection(), "WHERE placing_account_id = ?", (account_id,),
+                        order_by="order_timestamp, order_id")
+
+def get_order_headers_page_data(account_id, limit, before=None):
+    """
+    data_manager.get_order_headers_page_data: one keyset query on
+    idx_orders_account_time; line items are read only for orders saved before
+    summaries were stored.
+    """
+    conn = get_connection()
+    where, params = "o.placing_account_id = ?", [account_id]
+    if before:
+        where += " AND (o.order_timestamp, o.order_id) < (?, ?)"
+        params += list(before)
+    rows = conn.execute(
+        "SELECT o.order_id, o.placing_account_id, o.status, o.total_amount, o.order_timestamp, o.summary, "
+        "p.payment_status "
+        f"FROM orders o LEFT JOIN payments p ON p.order_id = o.order_id WHERE {where} "
+        "ORDER BY o.order_timestamp DESC, o.order_id DESC LIMIT ?", params + [limit]).fetchall()
+    headers = {row["order_id"]: {
+        "orderID": row["order_id"],
+        "placingAccountID": row["placing_account_id"],
+        "status": row["status"],
+        "totalAmount": row["total_amount"],
+        "orderTimestamp": row["order_timestamp"],
+        "paymentStatus": row["payment_status"],
+        "summary": json.loads(row["summary"]) if row["summary"] else None,
+    } for row in rows}
+    unsummarized = [order_id for order_id, header in headers.items() if header["summary"] is None]
+    if unsummarized:
+        placeholders = ",".join("?" * len(unsummarized)) # A page is far below the bound-parameter limit
+        for order_id in unsummarized:
+            headers[order_id]["lineItems"] = []
+        for li in conn.execute("SELECT order_id, item_type, item_name, quantity, line_item_status FROM line_items "
+                               f"WHERE order_id IN ({placeholders}) ORDER BY order_id, position", unsummarized):
+            headers[li["order_id"]]["lineItems"].append({"item_type": li["item_type"], "item_name": li["item_name"],
+                                                         "quantity": li["quantity"],
+                                                         "line_item_status": li["line_item_status"]})
+    return list(headers.values())
+
+
+# --- Trips Data ---
+def get_all_trips_data():
+    return [_trip_to_dict(row) for row in get_connection().execute("SELECT * FROM trips ORDER BY rowid")]
+
+def save_all_trips_data(trips_data):
+    with transaction() as conn:
+        _replace_all(conn, "trips", "id", "id", trips_data, _upsert_trip)
+
+def save_trip_data(trip_data, expected_version=None, source_changes=None):
+    return _save_versioned("trips", "id", "id", trip_data, expected_version, _upsert_trip, source_changes)
+
+def get_trip_by_id_data(trip_id):
+    row = get_connection().execute("SELECT * FROM trips WHERE id = ?", (trip_id,)).fetchone()
+    return _trip_to_dict(row) if row else None
+
+def get_trips_by_ids_data(trip_ids):
+    rows = _rows_by_keys(get_connection(), "trips", "id", trip_ids)
+    return [_trip_to_dict(rows[key]) for key in trip_ids if key in rows]
+
+
+def _table_source_key(conn, table):
+    row = conn.execute("SELECT changes FROM table_changes WHERE name = ?", (table,)).fetchone()
+    return row["changes"] if row else 0
+
+def catalog_source_key():
+    """Per catalog table, a key that changes with every row inserted, updated or deleted (see table_changes)."""
+    conn = get_connection()
+    return {table: _table_source_key(conn, table) for table in ("trips", "merchandise")}
+
+
+# --- Unit of Work ---
+_UNIT_OF_WORK_TABLES = {
+    # store name -> (table, key column, key field, upsert, reader for one record)
+    "sales": ("orders", "order_id", "orderID", _upsert_order, get_order_by_id_data),
+    "trips": ("trips", "id", "id", _upsert_trip, get_trip_by_id_data),
+    "merchandise": ("merchandise", "merchandise_id", "merchandiseID", _upsert_merchandise, get_merchandise_by_id_data),
+}
+
+def commit_unit_of_work(saves, deltas, source_changes):
+    """
+    data_manager.commit_unit_of_work for SQLite: every change in one transaction.
+    Fills source_changes with {store name: (catalog source key before, after)}
+    for the catalog tables it writes.
+    """
+    committed = {}
+    with transaction() as conn: # The readers below use this thread's connection, so they see the transaction
+        for name in set(saves) | set(deltas):
+            table, key_column, key_field, upsert, read = _UNIT_OF_WORK_TABLES[name]
+            before = _table_source_key(conn, table) if name in ("trips", "merchandise") else None
+            items = apply_deltas(deltas.get(name, {}), read) + list(saves.get(name, ()))
+            for record, expected_version in items:
+                version = _check_and_upsert(conn, table, key_column, key_field,
+                                            record, expected_version, upsert)
+                committed.setdefault(name, {})[record.get(key_field)] = dict(record, version=version)
+            if before is not None:
+                source_changes[name] = (before, _table_source_key(conn, table))
+    return committed
+
+
+# --- JSON Import ---
+def import_json_files(replace=False):
+    """
+    Copies the JSON data files (and the order counter) into the SQLite database.
+    Existing rows with the same IDs are updated; with replace=True every table is
+    emptied first so the database mirrors the JSON files exactly.
+    Returns a dict of record counts per table.
+    """
+    from app import data_manager # Imported here: data_manager imports this module
+    accounts = data_manager.read_json_file(data_manager.ACCOUNTS_FILE)
+    trips = data_manager.read_json_file(data_manager.TRIPS_FILE)
+    merchandise = data_manager.read_json_file(data_manager.MERCHANDISE_FILE)
+    orders = data_manager.read_json_file(data_manager.SALES_FILE)
+    try:
+        with open(data_manager.ORDER_COUNTER_FILE, 'r') as f:
+            next_order_number = int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        next_order_number = None
+
+    with transaction() as conn:
+        if replace:
+            for table in ("payments", "line_items", "orders", "trips", "merchandise", "accounts"):
+                conn.execute(f"DELETE FROM {table}")
+        for acc in accounts:
+            _upsert_account(conn, acc)
+        for trip in trips:
+            _upsert_trip(conn, trip)
+        for item in merchandise:
+            _upsert_merchandise(conn, item)
+        for order in orders:
+            _upsert_order(conn, order)
+        if next_order_number is not None:
+            conn.execute("INSERT OR REPLACE INTO counters (name, next_value) VALUES ('order', ?)", (next_order_number,))
+
+    return {"accounts": len(accounts), "trips": len(trips), "merchandise": len(merchandise), "orders": len(orders)}
+
+
+@click.command('import-json')
+@click.option('--replace', is_flag=True, help='Empty the SQLite tables before importing.')
+@with_appcontext
+def import_json_command(replace):
+    """Import the JSON data files into the SQLite database."""
+    counts = import_json_files(replace=replace)
+    click.echo(f"Imported into {DATABASE_PATH}: " + ", ".join(f"{n} {name}" for name, n in counts.items()))
@@ -0,0 +1,288 @@
+# artproject/app/static_assets.py
+# Build step and serving for the stylesheet and script. Each asset is minified
+# and written under static/dist/ with a content hash in its name
+# (css/style.3f2a9c81d0e4.css) next to .gz and .br copies (Brotli is in
+# requirements.txt; without it the build still runs and writes only .gz).
+# url_for('static', filename='css/style.css') then links the hashed file, which
+# is served with the pre-compressed copy the browser accepts and a one-year
+# immutable Cache-Control: a changed file gets a new URL, so repeat views never
+# revalidate it.
+#
+# The build also extracts the rules layout.html needs for its first paint (page
+# frame, header, sidebar, theme) into a critical stylesheet that the layout
+# inlines; the full stylesheet then loads without blocking rendering.
+#
+# `flask build-assets` builds ahead of deploy; otherwise the app builds on
+# startup whenever the sources no longer match the manifest. Files of earlier
+# builds are kept, so pages cached with their URLs still load.
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import request, send_from_directory
+from flask.cli import with_appcontext
+from markupsafe import Markup
+
+try:
+    import brotli
+except ImportError: # Optional: only .gz copies are written without it
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+LAYOUT_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'layout.html')
+DIST_NAME = 'dist' # Build output, under STATIC_DIR
+ASSETS = ('css/style.css', 'js/main.js') # Paths relative to STATIC_DIR
+CRITICAL_SOURCE = 'css/style.css'
+# Classes main.js sets on elements of the layout that its markup does not show
+# ('light-theme'/'dark-theme' are built as theme + '-theme')
+SCRIPT_CLASSES = ('light-theme', 'dark-theme')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+ENABLED = os.environ.get('ART_STATIC_PIPELINE', '1') == '1'
+
+_hashed = {} # source path -> hashed path under DIST_NAME
+_served = frozenset() # hashed paths, as requested under DIST_NAME
+_critical_css = None
+
+
+# --- Minification ---
+_CSS_COMMENT_OR_STRING = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'', re.S)
+
+def minify_css(css: str) -> str:
+    strings = []
+    def protect(match):
+        if match.group().startswith('/*'):
+            return ''
+        strings.append(match.group())
+        return f"\x00{len(strings) - 1}\x00"
+    css = _CSS_COMMENT_OR_STRING.sub(protect, css) # Comments dropped, strings left untouched below
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css) # Not before ':', where the space is a descendant combinator
+    css = css.replace(';}', '}')
+    return re.sub(r'\x00(\d+)\x00', lambda m: strings[int(m.group(1))], css).strip()
+
+
+def minify_js(js: str) -> str:
+    """Drops indentation, blank lines and whole-line // comments; keeps line breaks (automatic semicolons)."""
+    lines = js.splitlines()
+    if any(line.count('`') % 2 for line in lines):
+        return js # A template literal spans lines; its whitespace is content
+    kept = (line.strip() for line in lines)
+    return '\n'.join(line for line in kept if line and not line.startswith('//')) + '\n'
+
+
+# --- Critical CSS ---
+def _blocks(css: str):
+    """Top-level (prelude, body) pairs of minified CSS; body is None for statements like @import."""
+    blocks, depth, start, prelude_end, quote = [], 0, 0, 0, None
+    for i, ch in enumerate(css):
+        if quote:
+            if ch == quote and css[i - 1] != '\\':
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch == '{':
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:prelude_end].strip(), css[prelude_end + 1:i]))
+                start = i + 1
+        elif ch == ';' and depth == 0:
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+    return blocks
+
+
+def _layout_tokens(layout_html: str, script: str) -> dict:
+    """{'': tag names, '.': classes, '#': IDs} appearing in the layout (or set on it by the script)."""
+    markup = re.sub(r'{[{%#].*?[%}#]}', ' ', layout_html, flags=re.S) # Jinja tags out of the attribute values
+    classes = set(SCRIPT_CLASSES)
+    for value in re.findall(r'class="([^"]*)"', markup):
+        classes.update(value.split())
+    for args in re.findall(r'classList\.(?:add|remove|toggle)\(([^)]*)\)', script):
+        classes.update(re.findall(r"['\"]([\w-]+)['\"]", args))
+    return {'': set(re.findall(r'<([a-z][a-z0-9]*)', markup)), '.': classes,
+            '#': set(re.findall(r'id="([\w-]+)"', markup))}
+
+
+_PSEUDO = re.compile(r'::?[\w-]+(\([^)]*\))?')
+_ATTRIBUTE = re.compile(r'\[[^\]]*\]')
+_SIMPLE_SELECTOR = re.compile(r'([.#]?)(-?[\w-]+|\*)')
+
+def _selector_matches(selector: str, tokens: dict) -> bool:
+    """True if every tag, class and ID in the selector appears in the layout (pseudo-classes ignored)."""
+    selector = _ATTRIBUTE.sub('', _PSEUDO.sub('', selector))
+    for kind, name in _SIMPLE_SELECTOR.findall(selector):
+        if name != '*' and name not in tokens[kind]:
+            return False
+    return True
+
+
+def _critical_rules(css: str, tokens: dict, keyframes: dict) -> str:
+    kept = []
+    for prelude, body in _blocks(css):
+        if body is None:
+            continue
+        if prelude.startswith('@keyframes'):
+            keyframes[prelude.split()[1]] = f"{prelude}{{{body}}}" # Later definitions win, as in the browser
+        elif prelude.startswith(('@media', '@supports')):
+            inner = _critical_rules(body, tokens, keyframes)
+            if inner:
+                kept.append(f"{prelude}{{{inner}}}")
+        elif not prelude.startswith('@') and any(_selector_matches(s, tokens) for s in prelude.split(',')):
+            kept.append(f"{prelude}{{{body}}}")
+    return ''.join(kept)
+
+
+def critical_css(minified_css: str, layout_html: str, script: str = '') -> str:
+    """The rules of the stylesheet that apply to the layout's own markup, plus the animations they use."""
+    keyframes = {}
+    rules = _critical_rules(minified_css, _layout_tokens(layout_html, script), keyframes)
+    used = [block for name, block in keyframes.items() if re.search(rf'\b{re.escape(name)}\b', rules)]
+    return rules + ''.join(used)
+
+
+# --- Build ---
+def _write_if_changed(path: str, content: bytes):
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return # Keep the mtime, so other workers' builds change nothing
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path) # Concurrent builders write identical bytes; readers never see a partial file
+
+
+def _write_asset(dist_dir: str, source_path: str, content: bytes, compress: bool = True) -> str:
+    root, ext = os.path.splitext(source_path)
+    hashed_path = f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+    target = os.path.join(dist_dir, hashed_path)
+    if compress:
+        _write_if_changed(target + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+    if compress and brotli is not None:
+        _write_if_changed(target + '.br', brotli.compress(content, quality=11))
+    _write_if_changed(target, content) # Last: its presence means the compressed copies are there too
+    return hashed_path
+
+
+def _read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _source_digests(static_dir: str) -> dict:
+    digests = {}
+    for name, path in [(p, os.path.join(static_dir, p)) for p in ASSETS] + [('layout.html', LAYOUT_TEMPLATE)]:
+        with open(path, 'rb') as f:
+            digests[name] = hashlib.sha256(f.read()).hexdigest()
+    digests["brotli"] = brotli is not None # Installing it should add the .br copies
+    return digests
+
+
+def build(static_dir: str = STATIC_DIR) -> dict:
+    """Writes the hashed, minified and compressed assets and their manifest; returns the manifest."""
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    files, minified = {}, {}
+    for path in ASSETS:
+        text = _read_text(os.path.join(static_dir, path))
+        minified[path] = minify_css(text) if path.endswith('.css') else minify_js(text)
+        files[path] = _write_asset(dist_dir, path, minified[path].encode('utf-8'))
+    critical = critical_css(minified[CRITICAL_SOURCE], _read_text(LAYOUT_TEMPLATE), minified.get('js/main.js', ''))
+    # Inlined by the layout, never requested: no compressed copies
+    files['critical.css'] = _write_asset(dist_dir, 'css/critical.css', critical.encode('utf-8'), compress=False)
+    manifest = {"sources": _source_digests(static_dir), "files": files}
+    _write_if_changed(os.path.join(dist_dir, 'manifest.json'), json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+
+def _load_manifest(static_dir: str):
+    try:
+        with open(os.path.join(static_dir, DIST_NAME, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    if manifest.get("sources") != _source_digests(static_dir) or \
+            not all(os.path.exists(os.path.join(dist_dir, p)) for p in manifest.get("files", {}).values()):
+        return None
+    return manifest
+
+
+# --- Serving ---
+def _send_hashed(dist_dir: str, path: str):
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.exists(os.path.join(dist_dir, path + suffix)):
+            response = send_from_directory(dist_dir, path + suffix, mimetype=mimetypes.guess_type(path)[0],
+                                           max_age=IMMUTABLE_MAX_AGE)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(dist_dir, path, max_age=IMMUTABLE_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True # The URL names the content: never revalidate
+    return response
+
+
+def init_app(app):
+    """Builds the assets if they are stale, then links and serves them (STATIC_PIPELINE=False: sources as-is)."""
+    global _hashed, _served, _critical_css
+    app.cli.add_command(build_assets_command)
+    if not app.config.get('STATIC_PIPELINE', ENABLED):
+        _critical_css = None
+        return
+    static_dir = app.static_folder
+    manifest = _load_manifest(static_dir)
+    if manifest is None:
+        print("Static assets are missing or out of date; building them.")
+        manifest = build(static_dir)
+    files = dict(manifest["files"])
+    critical_path = files.pop('critical.css')
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    _critical_css = Markup(_read_text(os.path.join(dist_dir, critical_path))) # Our own CSS; must not be escaped
+    _hashed = files
+    _served = frozenset(files.values())
+
+    @app.url_defaults
+    def _link_hashed_asset(endpoint, values):
+        if endpoint == 'static':
+            hashed_path = _hashed.get(values.get('filename'))
+            if hashed_path:
+                values['filename'] = f"{DIST_NAME}/{hashed_path}"
+
+    serve_static = app.view_functions['static']
+
+    def static_view(filename):
+        name = filename[len(DIST_NAME) + 1:] if filename.startswith(DIST_NAME + '/') else None
+        if name in _served:
+            return _send_hashed(dist_dir, name)
+        return serve_static(filename=filename)
+    app.view_functions['static'] = static_view
+
+    @app.context_processor
+    def _inject_critical_css():
+        return {"critical_css": _critical_css}
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Write the hashed, minified and pre-compressed static assets under static/dist/."""
+    from flask import current_app
+    manifest = build(current_app.static_folder)
+    for source, hashed in manifest["files"].items():
+        click.echo(f"{source} -> {DIST_NAME}/{hashed}")
+    if brotli is None:
+        click.echo("The brotli package is not installed; only .gz copies were written.")
@@ -0,0 +1,89 @@
+# artproject/app/trip_index.py
+# Search index over the trips in the catalog snapshot (see app/catalog.py). Trips
+# are sorted by departure (the "2024-06-15" date plus the "10:00 AM" time), so a
+# departure window is two bisects; each route and "has seats" is a bitmap over
+# those sorted positions (a Python int, bit i = trip i), so combining filters is
+# a bitwise AND instead of a scan of every trip. The index is built once per
+# catalog version and shared by all request threads like the snapshot itself.
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import List, Optional
+
+from app import catalog
+
+_DEPARTURE_FORMATS = ("%Y-%m-%d %I:%M %p", "%Y-%m-%d %H:%M")
+_UNKNOWN_DEPARTURE = datetime.max # Unparseable trips sort last and fall outside any bounded window
+
+
+def parse_departure(date: str, time: str) -> Optional[datetime]:
+    text = f"{(date or '').strip()} {(time or '').strip()}"
+    for fmt in _DEPARTURE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class TripIndex:
+    __slots__ = ('version', 'records', 'departures', 'route_bits', 'available_bits')
+
+    def __init__(self, version: int, trip_records):
+        keyed = []
+        for record in trip_records:
+            departure = parse_departure(record.get('date'), record.get('time'))
+            if departure is None:
+                print(f"Warning: Trip {record.get('id')} has an unreadable departure "
+                      f"'{record.get('date')} {record.get('time')}'; listing it last.")
+                departure = _UNKNOWN_DEPARTURE
+            keyed.append((departure, record))
+        keyed.sort(key=lambda pair: pair[0]) # Stable: same departure keeps store order
+        self.version = version
+        self.records = tuple(record for _, record in keyed)
+        self.departures = [departure for departure, _ in keyed]
+        self.route_bits = {} # route -> bitmap of its trips
+        self.available_bits = 0 # bitmap of trips with at least one seat
+        for position, record in enumerate(self.records):
+            bit = 1 << position
+            route = record.get('route')
+            self.route_bits[route] = self.route_bits.get(route, 0) | bit
+            if int(record.get('available_seats') or 0) > 0:
+                self.available_bits |= bit
+
+    def search(self, route: str = None, departs_from: datetime = None, departs_until: datetime = None,
+               with_seats: bool = False, exclude_id: str = None) -> List[dict]:
+        """Trip records matching every given filter, in departure order (window bounds inclusive)."""
+        low = 0 if departs_from is None else bisect_left(self.departures, departs_from)
+        high = len(self.records) if departs_until is None else bisect_right(self.departures, departs_until)
+        if low >= high:
+            return []
+        bits = ((1 << high) - 1) ^ ((1 << low) - 1) # The departure window
+        if route is not None:
+            bits &= self.route_bits.get(route, 0)
+        if with_seats:
+            bits &= self.available_bits
+        matches = []
+        while bits:
+            lowest = bits & -bits
+            record = self.records[lowest.bit_length() - 1]
+            if record.get('id') != exclude_id:
+                matches.append(record)
+            bits ^= lowest
+        return matches
+
+    def routes(self) -> List[str]:
+        return sorted(route for route in self.route_bits if route)
+
+
+_index: Optional[TripIndex] = None
+
+
+def get_index() -> TripIndex:
+    """The index for the current catalog snapshot, rebuilt when a new snapshot is published."""
+    global _index
+    snapshot = catalog.get_snapshot()
+    index = _index
+    if index is None or index.version != snapshot.version:
+        # Concurrent builders make identical indexes; the last reference swap wins
+        index = _index = TripIndex(snapshot.version, snapshot.trips.values())
+    return index
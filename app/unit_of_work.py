@@ -0,0 +1,91 @@
+# artproject/app/unit_of_work.py
+# Unit of work for business operations that touch several stores at once
+# (a checkout changes trip seats, stock levels and the order). Inside
+#
+#     with unit_of_work():
+#         trip.update_availability(-1)
+#         order.save()
+#
+# model saves and seat/stock changes are only recorded; when the block exits they
+# are committed together by data_manager.commit_unit_of_work, each store written
+# once, or not at all if the block raises or any change is rejected (a version
+# conflict, or not enough seats/stock). Nested blocks join the outermost one.
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from app import data_manager, identity_map
+
+_local = threading.local()
+_IDENTITY_KINDS = {"sales": "order", "trips": "trip", "merchandise": "merchandise"} # store -> identity map kind
+
+
+class UnitOfWork:
+    def __init__(self):
+        self._saves = {} # store name -> {key: (record, expected_version)}, last save of a key wins
+        self._deltas = {} # store name -> {(key, field): summed change}
+        self._callbacks = [] # (store name, key, callback taking the committed record)
+
+    def register_save(self, store_name: str, key, record: dict, expected_version: Optional[int],
+                      on_commit: Callable[[dict], None] = None):
+        """Records a whole-record save; expected_version is checked at commit (first save of a key counts)."""
+        saves = self._saves.setdefault(store_name, {})
+        if key in saves:
+            expected_version = saves[key][1] # Later saves build on the first one, not on the stored record
+        saves[key] = (record, expected_version)
+        if on_commit:
+            self._callbacks.append((store_name, key, on_commit))
+
+    def register_delta(self, store_name: str, key, field: str, change: int,
+                       on_commit: Callable[[dict], None] = None):
+        """Records a numeric change, applied at commit to the stored value (which must not drop below zero)."""
+        deltas = self._deltas.setdefault(store_name, {})
+        deltas[(key, field)] = deltas.get((key, field), 0) + change
+        if on_commit:
+            self._callbacks.append((store_name, key, on_commit))
+
+    def is_empty(self) -> bool:
+        return not self._saves and not self._deltas
+
+    def commit(self):
+        if self.is_empty():
+            return
+        saves = {name: list(records.values()) for name, records in self._saves.items()}
+        committed = data_manager.commit_unit_of_work(saves, self._deltas)
+        refreshed = {} # (store name, key) -> objects brought up to date by their callbacks
+        for store_name, key, on_commit in self._callbacks:
+            record = committed.get(store_name, {}).get(key)
+            if record is not None:
+                on_commit(record)
+                refreshed.setdefault((store_name, key), []).append(getattr(on_commit, '__self__', None))
+        for store_name, records in committed.items():
+            for key in records:
+                # Other objects this request loaded for the record are now out of date
+                identity_map.forget_unless(_IDENTITY_KINDS[store_name], key, refreshed.get((store_name, key), []))
+
+
+def current_unit_of_work() -> Optional[UnitOfWork]:
+    """The unit of work open on this thread, if any."""
+    return getattr(_local, 'current', None)
+
+
+@contextmanager
+def unit_of_work():
+    outer = current_unit_of_work()
+    if outer is not None:
+        yield outer # Joins the enclosing operation; it commits (or discards) everything
+        return
+    uow = UnitOfWork()
+    _local.current = uow
+    try:
+        yield uow
+    except BaseException:
+        identity_map.clear() # Objects loaded in this request may hold the dropped changes
+        raise
+    finally:
+        _local.current = None # On an exception the recorded changes are simply dropped
+    try:
+        uow.commit()
+    except BaseException:
+        identity_map.clear()
+        raise
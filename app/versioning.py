@@ -0,0 +1,98 @@
+# artproject/app/versioning.py
+# Optimistic concurrency for order, trip and merchandise records. Every stored
+# record carries an integer "version" that the storage layer bumps on each save.
+# A save may name the version it was based on; if the stored record has moved on
+# since, the save is rejected with VersionConflictError instead of silently
+# overwriting the other writer's change.
+import random
+import time
+from typing import Callable, List, Optional, Tuple
+
+SAVE_RETRY_ATTEMPTS = 8 # Bounded re-read + re-apply attempts for delta updates (seats, stock)
+RETRY_BACKOFF_SECONDS = 0.002
+
+
+class VersionConflictError(RuntimeError):
+    """The record was changed by another writer after it was read."""
+    def __init__(self, key, expected_version, current_version):
+        super().__init__(f"Record '{key}' was modified concurrently "
+                         f"(expected version {expected_version}, found {current_version}).")
+        self.key = key
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+class ShortfallError(ValueError):
+    """A numeric change would take a record's field (seats, stock) below zero."""
+    def __init__(self, key, field, available, requested):
+        super().__init__(f"Not enough {field} for '{key}': {available} available, {requested} requested.")
+        self.key = key
+        self.field = field
+        self.available = available
+        self.requested = requested
+
+
+def record_version(record: Optional[dict]) -> int:
+    """Stored version of a record; records written before versioning count as 0, missing ones too."""
+    if not record:
+        return 0
+    try:
+        return int(record.get("version") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def wait_before_retry(attempt: int):
+    """
+    Jittered exponential backoff after a conflict. Without it, writers that
+    collided in one group-commit batch would all resubmit into the next batch
+    and collide again.
+    """
+    time.sleep(random.uniform(0, RETRY_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+def apply_versioned(items: List[Tuple[dict, Optional[int]]], key_field: str,
+                    current: Callable[[object], Optional[dict]]) -> Tuple[List[dict], list]:
+    """
+    Checks a batch of (record, expected_version) saves against the stored records.
+    `current(key)` returns the stored record for a key (or None).
+    Returns (records to write, results) where results[i] is the new version of
+    items[i] or the VersionConflictError it was rejected with. Saves of the same
+    key later in the batch see the earlier ones, as if they had run one by one.
+    """
+    accepted = []
+    results = []
+    pending = {} # key -> record accepted earlier in this batch
+    for record, expected_version in items:
+        key = record.get(key_field)
+        stored = pending[key] if key in pending else current(key)
+        stored_version = record_version(stored)
+        if expected_version is not None and expected_version != stored_version:
+            results.append(VersionConflictError(key, expected_version, stored_version))
+            continue
+        new_record = dict(record, version=stored_version + 1)
+        pending[key] = new_record
+        accepted.append(new_record)
+        results.append(new_record["version"])
+    return accepted, results
+
+
+def apply_deltas(deltas: dict, current: Callable[[object], Optional[dict]]) -> List[Tuple[dict, int]]:
+    """
+    Turns {(key, field): delta} numeric changes into (record, expected_version)
+    saves against the stored records. Raises ValueError if a record is missing,
+    or ShortfallError if a field would drop below zero, so the caller can
+    abandon the whole batch.
+    """
+    updated = {} # key -> (new record, version it was based on)
+    for (key, field), delta in deltas.items():
+        record, stored_version = updated.get(key) or (current(key), None)
+        if record is None:
+            raise ValueError(f"Record '{key}' not found.")
+        if stored_version is None:
+            stored_version = record_version(record)
+        new_value = int(record.get(field) or 0) + delta
+        if new_value < 0:
+            raise ShortfallError(key, field, record.get(field), -delta)
+        updated[key] = (dict(record, **{field: new_value}), stored_version)
+    return list(updated.values())
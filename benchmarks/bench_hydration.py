@@ -0,0 +1,65 @@
+# artproject/benchmarks/bench_hydration.py
+# Cost of building Order objects from the stored sales history: full hydration
+# versus lazy hydration (Order.from_dict(lazy=True)), for the header-only access
+# pattern (ID + status), the My Orders table pattern, and touching everything.
+#   python benchmarks/bench_hydration.py [copies]    (default: 1 100; each copy is the whole sales.json)
+import contextlib
+import copy
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import data_manager # noqa: E402
+from app.models.order import Order # noqa: E402
+
+
+def sales_history(copies):
+    """The current sales data, repeated `copies` times with distinct order IDs."""
+    base = list(data_manager.get_all_sales_data())
+    orders = []
+    for i in range(copies):
+        for order in base:
+            order = copy.deepcopy(order)
+            order["orderID"] = f"{order['orderID']}-{i}"
+            orders.append(order)
+    return orders
+
+
+def header_only(order):
+    return order.orderID, order.status
+
+
+def list_page(order):
+    # What list_orders_new.html reads for each row
+    return (order.get_primary_item_type_summary(), order.get_item_summary_names(), order.status,
+            order.totalAmount, order.payment and order.payment.paymentStatus, order.orderTimestamp)
+
+
+def everything(order):
+    return len(order.orderLinetems), order.payment
+
+
+def time_pass(orders, lazy, access):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # from_dict prints warnings for legacy records
+        for data in orders:
+            order = Order.from_dict(data, lazy=lazy)
+            if order is not None:
+                access(order)
+    return (time.perf_counter() - start) * 1e3
+
+
+def main(copy_counts):
+    print(f"{'orders':>8} {'access':>12} {'full (ms)':>10} {'lazy (ms)':>10} {'speedup':>8}")
+    for copies in copy_counts:
+        orders = sales_history(copies)
+        for name, access in (("header only", header_only), ("list page", list_page), ("everything", everything)):
+            full_ms = time_pass(orders, False, access)
+            lazy_ms = time_pass(orders, True, access)
+            print(f"{len(orders):>8} {name:>12} {full_ms:>10.1f} {lazy_ms:>10.1f} {full_ms / lazy_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 100])
@@ -0,0 +1,63 @@
+# artproject/benchmarks/bench_indexes.py
+# Lookup latency of data_manager's hash indexes versus the linear scan they replaced.
+#   python benchmarks/bench_indexes.py [sizes...]     (default: 1000 100000 1000000)
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import data_manager # noqa: E402
+
+
+def make_trips(n):
+    return [{"id": f"TRP{i:07d}", "route": f"Route {i % 50}", "date": "2024-06-15", "time": "10:00 AM",
+             "price": 5.0, "available_seats": i % 40} for i in range(n)]
+
+
+def linear_lookup(trip_id):
+    """The pre-index implementation of get_trip_by_id_data (scan after the cached parse)."""
+    for trip in data_manager.get_all_trips_data():
+        if trip.get("id") == trip_id:
+            return trip
+    return None
+
+
+def time_lookups(fn, ids):
+    start = time.perf_counter()
+    for trip_id in ids:
+        assert fn(trip_id) is not None
+    return (time.perf_counter() - start) / len(ids) * 1e6 # microseconds per lookup
+
+
+def run(n, tmp_dir):
+    path = os.path.join(tmp_dir, f"trips_{n}.json")
+    with open(path, 'w') as f:
+        json.dump(make_trips(n), f)
+    data_manager.TRIPS_FILE = path
+    data_manager.clear_cache()
+
+    start = time.perf_counter()
+    data_manager.get_trip_by_id_data("TRP0000000") # Parse + build the index once
+    warmup_ms = (time.perf_counter() - start) * 1e3
+
+    rng = random.Random(n)
+    indexed_us = time_lookups(data_manager.get_trip_by_id_data, [f"TRP{rng.randrange(n):07d}" for _ in range(10000)])
+    scan_count = max(5, min(1000, 20_000_000 // n)) # Keep the slow path to a few seconds
+    linear_us = time_lookups(linear_lookup, [f"TRP{rng.randrange(n):07d}" for _ in range(scan_count)])
+    os.remove(path)
+    return warmup_ms, indexed_us, linear_us
+
+
+def main(sizes):
+    print(f"{'records':>10} {'parse+index (ms)':>17} {'indexed (us)':>13} {'linear scan (us)':>17} {'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in sizes:
+            warmup_ms, indexed_us, linear_us = run(n, tmp_dir)
+            print(f"{n:>10} {warmup_ms:>17.1f} {indexed_us:>13.2f} {linear_us:>17.1f} {linear_us / indexed_us:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 100_000, 1_000_000])
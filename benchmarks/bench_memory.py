@@ -0,0 +1,127 @@
+# artproject/benchmarks/bench_memory.py
+# tracemalloc report: memory retained by fully hydrated Order objects (with their
+# SalesLineItems and Payments), plus Trip and Merchandise objects, scaled to 100k
+# records each. Records are decoded one JSON line at a time and only the model
+# objects are kept, as when orders are read from sales.jsonl or SQLite.
+# Each model is measured twice on the same lines: as the app builds it (__slots__,
+# repeated strings interned) and as a baseline of plain classes holding the same
+# fields in a per-instance __dict__ without interning, as the models did before.
+#   python benchmarks/bench_memory.py [orders]    (default: 100000)
+import contextlib
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import data_manager # noqa: E402
+from app.models.enums import OrderStatus, PaymentStatus, TicketStatus # noqa: E402
+from app.models.merchandise import Merchandise # noqa: E402
+from app.models.order import Order, SalesLineItem, _parse_order_timestamp # noqa: E402
+from app.models.trip import Trip # noqa: E402
+
+
+# --- Baseline: dict-backed, non-interned copies of the models ---
+# Same fields and conversions as the app's models (enums, floats, UTC datetimes).
+class PlainTrip:
+    def __init__(self, data):
+        self.id = data.get('id')
+        self.route = data.get('route')
+        self.date = data.get('date')
+        self.time = data.get('time')
+        self.price = float(data.get('price', 0.0))
+        self.available_seats = int(data.get('available_seats', 0))
+        self.version = int(data.get('version') or 0)
+
+
+class PlainMerchandise:
+    def __init__(self, data):
+        self.merchandiseID = data['merchandiseID']
+        self.name = data['name']
+        self.description = data['description']
+        self.price = data['price']
+        self.stockLevel = data['stockLevel']
+        self.version = data.get('version', 0)
+
+
+class PlainPayment:
+    def __init__(self, data):
+        self.paymentID = data.get("paymentID")
+        self.relatedOrderID = data.get("relatedOrderID")
+        self.amount = float(data.get("amount"))
+        self.timestamp = _parse_order_timestamp(data.get("timestamp", data.get("paymentTimestamp")), self.paymentID)
+        self.paymentMethodDetails = data.get("paymentMethodDetails")
+        self.paymentStatus = PaymentStatus(data.get("paymentStatus", PaymentStatus.PENDING.value))
+
+
+class PlainSalesLineItem:
+    def __init__(self, data):
+        self.lineItemID = data.get("lineItemID")
+        self._item_id = data.get("item_id")
+        self.item_type = data.get("item_type")
+        self.quantity = int(data.get("quantity"))
+        self.unit_price = float(data.get("unit_price"))
+        self.item_name = data.get("item_name", "N/A")
+        self.line_item_status = TicketStatus(data.get("line_item_status", TicketStatus.ACTIVE.value))
+        self.lineTotal = self.quantity * self.unit_price
+
+
+class PlainOrder:
+    def __init__(self, data):
+        self.orderID = data["orderID"]
+        self.placingAccountID = data["placingAccountID"]
+        self.orderLinetems = [PlainSalesLineItem(li) for li in data.get("orderLinetems", [])
+                              if SalesLineItem.has_required_fields(li)]
+        self.payment = PlainPayment(data["payment"]) if data.get("payment") else None
+        self.status = OrderStatus(data.get("status", OrderStatus.PENDING_PAYMENT.value))
+        self.cancellationRequests = list(data.get("cancellationRequests", []))
+        self.refundRequests = list(data.get("refundRequests", []))
+        self.orderTimestamp = _parse_order_timestamp(data.get("orderTimestamp"), self.orderID)
+        self.version = int(data.get("version") or 0)
+        self.totalAmount = float(data.get("totalAmount", 0.0))
+
+
+def json_lines(records, n, key_field):
+    """n JSON lines cycling through `records`, each with a distinct key."""
+    lines = []
+    for i in range(n):
+        record = dict(records[i % len(records)])
+        record[key_field] = f"{record[key_field]}-{i}"
+        lines.append(json.dumps(record))
+    return lines
+
+
+def retained_bytes(lines, build):
+    """Bytes still allocated after building one object per line (and dropping the decoded dicts)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    with contextlib.redirect_stdout(io.StringIO()): # from_dict prints warnings for legacy records
+        objects = [build(json.loads(line)) for line in lines]
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return retained
+
+
+def main(n):
+    cases = [
+        # (model, records, key field, baseline build, app build)
+        ("Order", list(data_manager.get_all_sales_data()), "orderID", PlainOrder, Order.from_dict),
+        ("Trip", data_manager.get_all_trips_data(), "id", PlainTrip, Trip.from_dict),
+        ("Merchandise", data_manager.get_all_merchandise_data(), "merchandiseID", PlainMerchandise,
+         lambda data: Merchandise(**data)),
+    ]
+    print(f"Retained per 100k records (MB), {n} records per model")
+    print(f"{'model':>12} {'baseline':>10} {'slotted':>10} {'delta':>10} {'delta %':>8} {'B/record':>17}")
+    for name, records, key_field, build_baseline, build in cases:
+        lines = json_lines(records, n, key_field)
+        baseline = retained_bytes(lines, build_baseline) / n
+        slotted = retained_bytes(lines, build) / n
+        print(f"{name:>12} {baseline * 100_000 / 2**20:>10.1f} {slotted * 100_000 / 2**20:>10.1f} "
+              f"{(slotted - baseline) * 100_000 / 2**20:>+10.1f} {(slotted - baseline) / baseline:>+8.1%} "
+              f"{baseline:>8.0f} -> {slotted:<5.0f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,62 @@
+# artproject/config.py
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Config:
+    # Storage backend for app.data_manager: "json" (the *.json files) or "sqlite".
+    # Run `flask --app run import-json` once before switching to "sqlite".
+    STORAGE_BACKEND = os.environ.get('ART_STORAGE_BACKEND', 'json')
+    SQLITE_DATABASE = os.environ.get('ART_SQLITE_DATABASE', os.path.join(BASE_DIR, 'art_system.db'))
+
+    # JSON backend only: append each order save to sales_journal.jsonl and fold it
+    # back into sales.json every SALES_JOURNAL_COMPACT_EVERY records (or `flask compact-sales`).
+    SALES_JOURNAL = os.environ.get('ART_SALES_JOURNAL', '0') == '1'
+    SALES_JOURNAL_COMPACT_EVERY = int(os.environ.get('ART_SALES_JOURNAL_COMPACT_EVERY', '500'))
+
+    # JSON backend only: keep orders in one file per month under SALES_SEGMENTS_DIR
+    # (plus a manifest of orderID -> month) instead of sales.json. Not combinable with
+    # SALES_JOURNAL. An existing sales.json is split up on first use.
+    SALES_PARTITIONED = os.environ.get('ART_SALES_PARTITIONED', '0') == '1'
+    SALES_SEGMENTS_DIR = os.environ.get('ART_SALES_SEGMENTS_DIR', os.path.join(BASE_DIR, 'sales_segments'))
+
+    # JSON backend only: keep orders in sales.jsonl (one order per line) and read single
+    # orders through an mmap and an orderID -> byte offset index. Not combinable with the
+    # two options above; sales.json is converted on first use.
+    SALES_JSONL = os.environ.get('ART_SALES_JSONL', '0') == '1'
+    SALES_JSONL_FILE = os.environ.get('ART_SALES_JSONL_FILE', os.path.join(BASE_DIR, 'sales.jsonl'))
+
+    # JSON backend only: order, trip and merchandise saves are queued to one writer
+    # thread that commits them in batches (one write + fsync per file per batch).
+    GROUP_COMMIT = os.environ.get('ART_GROUP_COMMIT', '1') == '1'
+
+    # Trips and merchandise are served from one in-memory snapshot shared by all request
+    # threads; changes made by other worker processes show up within this many seconds.
+    CATALOG_CHECK_INTERVAL = float(os.environ.get('ART_CATALOG_CHECK_INTERVAL', '1.0'))
+
+    # Rendered catalog blocks (merchandise grids, featured items) kept per catalog version,
+    # least recently used dropped first; counters are printed every REPORT_EVERY lookups (0: never).
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('ART_FRAGMENT_CACHE_SIZE', '64'))
+    FRAGMENT_CACHE_REPORT_EVERY = int(os.environ.get('ART_FRAGMENT_CACHE_REPORT_EVERY', '0'))
+
+    # Serve style.css and main.js minified under content-hashed names (pre-compressed,
+    # cached for a year) and inline the layout's critical CSS; built on startup when
+    # stale, or ahead of deploy with `flask build-assets`. False serves the sources as-is.
+    STATIC_PIPELINE = os.environ.get('ART_STATIC_PIPELINE', '1') == '1'
+
+    # Orders per page of the order history list (keyset-paginated, newest first).
+    ORDERS_PAGE_SIZE = int(os.environ.get('ART_ORDERS_PAGE_SIZE', '20'))
+
+    # IDs (orders, accounts, line items, payments) are leased to each worker in
+    # blocks of this size, so issuing one needs no file or database access.
+    ID_BLOCK_SIZE = int(os.environ.get('ART_ID_BLOCK_SIZE', '20'))
+
+    # Password hashing runs in a pool of this many processes (0: in the request thread),
+    # with at most PASSWORD_HASH_QUEUE_LIMIT more requests waiting, each for up to
+    # PASSWORD_HASH_QUEUE_TIMEOUT seconds. Stored hashes made with a different
+    # PASSWORD_HASH_METHOD (werkzeug method string) are upgraded on the next login.
+    PASSWORD_HASH_METHOD = os.environ.get('ART_PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('ART_PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('ART_PASSWORD_HASH_QUEUE_LIMIT', '32'))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('ART_PASSWORD_HASH_QUEUE_TIMEOUT', '2.0'))
@@ -1,9 +1,11 @@
 from app import create_app
 import logging
 
-app = create_app()
-
+# Only when run as a script: password hashing workers are spawned processes that
+# re-import this module, and must not each build the app. `flask --app run` finds
+# create_app itself.
 if __name__ == '__main__':
+    app = create_app()
     app.run(debug=True)
     app.debug = True
     app.logger.setLevel(logging.DEBUG)
@@ -11,4 +13,4 @@ if __name__ == '__main__':
     # you might need to ensure the default stream handler is also at DEBUG
     # For simple `print`, this is not needed.
     # For `app.logger`, Flask usually configures a basic handler.
-    print("Starting Flask app with run.py, DEBUG=True")
\ No newline at end of file
+    print("Starting Flask app with run.py, DEBUG=True")
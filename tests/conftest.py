@@ -0,0 +1,57 @@
+# artproject/tests/conftest.py
+# Each test gets its own copy of the JSON data files and runs once per storage
+# backend: the JSON files (with and without the group-commit writer), the three
+# alternative order stores of the JSON backend, and SQLite. Tests of one store
+# pick it with @pytest.mark.parametrize("backend", [...], indirect=True).
+import os
+import shutil
+
+import pytest
+
+from app import catalog, data_manager, sqlite_store
+
+DATA_FILES = ("trips.json", "merchandise_data.json", "sales.json", "accounts_data.json", "order_counter.txt")
+SALES_STORES = {"journal": "SALES_JOURNAL", "segments": "SALES_PARTITIONED", "jsonl": "SALES_JSONL"} # backend -> config flag
+
+
+@pytest.fixture(params=["json", "json-group-commit", "journal", "segments", "jsonl", "sqlite"])
+def backend(request, tmp_path, monkeypatch):
+    """Points data_manager at a copy of the data files; returns the backend name."""
+    for name in DATA_FILES:
+        shutil.copy(os.path.join(data_manager.BASE_DIR, name), tmp_path / name)
+    files = {
+        "SALES_FILE": str(tmp_path / "sales.json"),
+        "TRIPS_FILE": str(tmp_path / "trips.json"),
+        "MERCHANDISE_FILE": str(tmp_path / "merchandise_data.json"),
+        "ACCOUNTS_FILE": str(tmp_path / "accounts_data.json"),
+        "ORDER_COUNTER_FILE": str(tmp_path / "order_counter.txt"),
+    }
+    for attr, path in files.items():
+        monkeypatch.setattr(data_manager, attr, path)
+    monkeypatch.setattr(data_manager, "BASE_DIR", str(tmp_path))
+    monkeypatch.setitem(data_manager._RECORD_STORES, "sales", (files["SALES_FILE"], "orderID"))
+    monkeypatch.setitem(data_manager._RECORD_STORES, "trips", (files["TRIPS_FILE"], "id"))
+    monkeypatch.setitem(data_manager._RECORD_STORES, "merchandise", (files["MERCHANDISE_FILE"], "merchandiseID"))
+    # configure() assigns these directly; listing them here puts them back after the test
+    for attr in ("STORAGE_BACKEND", "GROUP_COMMIT_ENABLED", "SALES_JOURNAL_ENABLED", "SALES_PARTITIONED",
+                 "SALES_JSONL", "SALES_JSONL_FILE", "SALES_SEGMENTS_DIR",
+                 "_sales_journal", "_sales_segments", "_sales_jsonl", "_id_allocator"):
+        monkeypatch.setattr(data_manager, attr, getattr(data_manager, attr))
+    monkeypatch.setattr(sqlite_store, "DATABASE_PATH", str(tmp_path / "art.db"))
+
+    config = {
+        "STORAGE_BACKEND": "sqlite" if request.param == "sqlite" else "json",
+        "GROUP_COMMIT": request.param == "json-group-commit",
+        "SALES_JSONL_FILE": str(tmp_path / "sales.jsonl"),
+        "SALES_SEGMENTS_DIR": str(tmp_path / "sales_segments"),
+    }
+    for name, flag in SALES_STORES.items():
+        config[flag] = request.param == name
+    data_manager.configure(config)
+    if request.param == "sqlite":
+        sqlite_store.import_json_files(replace=True)
+    catalog.invalidate()
+    yield request.param
+    sqlite_store.close_connection()
+    data_manager.clear_cache()
+    catalog.invalidate()
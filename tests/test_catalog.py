@@ -0,0 +1,60 @@
+# artproject/tests/test_catalog.py
+# The shared catalog snapshot (app/catalog.py) notices writes made by other
+# processes, and doesn't reload for its own.
+import sqlite3
+import threading
+
+import pytest
+
+from app import catalog, data_manager, sqlite_store
+
+on_sqlite = pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+
+
+@pytest.fixture(autouse=True)
+def check_every_time(monkeypatch):
+    monkeypatch.setattr(catalog, "CHECK_INTERVAL", 0)
+
+
+def in_other_thread(fn):
+    """Runs fn on its own thread, and so on its own SQLite connection, like another process."""
+    thread = threading.Thread(target=fn)
+    thread.start()
+    thread.join()
+
+
+@on_sqlite
+def test_row_rewritten_elsewhere_with_the_same_version_is_seen(backend):
+    seats = catalog.get_snapshot().trips["TRP001"]["available_seats"]
+
+    conn = sqlite3.connect(sqlite_store.DATABASE_PATH)
+    with conn:
+        conn.execute("UPDATE trips SET available_seats = ? WHERE id = 'TRP001'", (seats - 1,)) # Version unchanged
+    conn.close()
+
+    assert catalog.get_snapshot().trips["TRP001"]["available_seats"] == seats - 1
+
+
+@on_sqlite
+def test_save_all_elsewhere_keeping_row_count_and_versions_is_seen(backend):
+    snapshot = catalog.get_snapshot()
+    items = [dict(item) for item in data_manager.get_all_merchandise_data()]
+    items[0]["stockLevel"] += 5
+
+    in_other_thread(lambda: sqlite_store.save_all_merchandise_data(items))
+
+    assert catalog.get_snapshot().merchandise[items[0]["merchandiseID"]]["stockLevel"] == items[0]["stockLevel"]
+    assert catalog.get_snapshot().version > snapshot.version
+
+
+def test_own_save_is_published_without_a_reload(backend, monkeypatch):
+    catalog.get_snapshot()
+    record = data_manager.get_trip_by_id_data("TRP001")
+    data_manager.save_trip_data(dict(record, available_seats=3), expected_version=record.get("version") or 0)
+    reloads = []
+    reload = catalog._reload
+    monkeypatch.setattr(catalog, "_reload", lambda: reloads.append(1) or reload())
+
+    assert catalog.get_snapshot().trips["TRP001"]["available_seats"] == 3
+    assert reloads == []
+    assert dict(catalog.get_snapshot().source_key) == data_manager.catalog_source_key()
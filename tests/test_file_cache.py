@@ -0,0 +1,73 @@
+# artproject/tests/test_file_cache.py
+# The parsed data file cache (data_manager._file_cache) notices a file replaced
+# by another process, even when the new file has the old size and mtime.
+import json
+import os
+
+import pytest
+
+from app import data_manager
+from app.versioning import VersionConflictError
+
+on_json = pytest.mark.parametrize("backend", ["json", "json-group-commit"], indirect=True)
+
+
+@pytest.fixture(autouse=True)
+def saved_trips(backend):
+    """Saves TRP001 once, so trips.json is laid out as the app writes it and the trip has a version."""
+    data_manager.save_trip_data(data_manager.get_trip_by_id_data("TRP001"))
+
+
+def replace_elsewhere(filepath, edit):
+    """Rewrites filepath the way another process would, keeping its size and mtime."""
+    st = os.stat(filepath)
+    records = data_manager.read_json_file(filepath)
+    edit(records)
+    data_manager.write_json_file_atomic(filepath, records)
+    os.utime(filepath, ns=(st.st_atime_ns, st.st_mtime_ns)) # Same clock tick
+    assert (os.stat(filepath).st_mtime_ns, os.stat(filepath).st_size) == (st.st_mtime_ns, st.st_size)
+
+
+def sell_seat(trip_id, seats):
+    def edit(trips):
+        for trip in trips:
+            if trip["id"] == trip_id:
+                trip["available_seats"] = seats
+                trip["version"] = (trip.get("version") or 0) + 1
+    return edit
+
+
+@on_json
+def test_same_size_same_tick_replacement_is_seen(backend):
+    record = data_manager.get_trip_by_id_data("TRP001")
+    seats = record["available_seats"]
+    assert len(str(seats)) == len(str(seats - 1)) # The rewrite must keep the file size
+
+    replace_elsewhere(data_manager.TRIPS_FILE, sell_seat("TRP001", seats - 1))
+
+    assert data_manager.get_trip_by_id_data("TRP001")["available_seats"] == seats - 1
+
+
+@on_json
+def test_save_against_a_same_size_replacement_conflicts(backend):
+    record = data_manager.get_trip_by_id_data("TRP001")
+    stale_version = record.get("version") or 0
+    assert len(str(stale_version)) == len(str(stale_version + 1))
+
+    replace_elsewhere(data_manager.TRIPS_FILE, sell_seat("TRP001", record["available_seats"] - 1))
+
+    with pytest.raises(VersionConflictError):
+        data_manager.save_trip_data(dict(record, available_seats=0), expected_version=stale_version)
+    with open(data_manager.TRIPS_FILE) as f:
+        stored = next(t for t in json.load(f) if t["id"] == "TRP001")
+    assert stored["available_seats"] == record["available_seats"] - 1
+
+
+@on_json
+def test_save_all_replaces_the_file(backend):
+    before = os.stat(data_manager.TRIPS_FILE).st_ino
+    data_manager.get_all_trips_data()
+
+    data_manager.save_all_trips_data(data_manager.read_json_file(data_manager.TRIPS_FILE))
+
+    assert os.stat(data_manager.TRIPS_FILE).st_ino != before
@@ -0,0 +1,75 @@
+# artproject/tests/test_order_pages.py
+# Keyset pagination of an account's order history (app/indexes.py, and
+# data_manager.get_order_headers_page_data on every backend).
+import random
+
+import pytest
+
+from app import data_manager
+from app.indexes import GroupIndex, field_key, keyset_page, order_time_key
+
+# Several orders share each timestamp, so pages must break ties on orderID
+TIMESTAMPS = ["2025-06-01T08:00:00+00:00", "2025-06-01T08:00:00+00:00", "2025-06-01T08:00:00+00:00",
+              "2025-06-02T12:30:00+00:00", "2025-07-15T09:00:00+00:00", "2025-07-15T09:00:00+00:00",
+              "2025-07-15T09:00:00+00:00", "2025-07-15T09:00:00+00:00", "2025-08-01T00:00:00+00:00",
+              "2025-08-01T00:00:00+00:00", "2025-09-30T23:59:59+00:00"]
+
+
+def account_orders(account_id="acc900"):
+    orders = [{"orderID": f"ORD9{i:03d}", "placingAccountID": account_id, "status": "PAID", "totalAmount": 1.0,
+               "orderLinetems": [], "orderTimestamp": ts} for i, ts in enumerate(TIMESTAMPS)]
+    random.Random(7).shuffle(orders) # Saved out of timestamp order
+    return orders
+
+
+def newest_first(orders):
+    return [o["orderID"] for o in sorted(orders, key=order_time_key, reverse=True)]
+
+
+def walk(fetch_page, limit):
+    """Every page in turn, each fetched with the (orderTimestamp, orderID) cursor of the previous page's last order."""
+    pages = []
+    before = None
+    for _ in range(len(TIMESTAMPS) + 1): # A cursor that stops advancing must fail the test, not hang it
+        page = fetch_page(limit, before)
+        if not page:
+            return pages
+        assert len(page) <= limit
+        pages.append([o["orderID"] for o in page])
+        before = (page[-1]["orderTimestamp"], page[-1]["orderID"])
+    pytest.fail(f"Still getting pages after {len(TIMESTAMPS)} orders: {pages[-3:]}")
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 20])
+def test_group_index_pages_cover_every_order_once(limit):
+    orders = account_orders() + account_orders("acc901")
+    index = GroupIndex(orders, field_key("placingAccountID"), order_time_key)
+
+    pages = walk(lambda n, before: index.page("acc900", n, before), limit)
+
+    assert [order_id for page in pages for order_id in page] == newest_first(account_orders())
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+@pytest.mark.parametrize("limit", [1, 3, 20])
+def test_keyset_page_covers_every_order_once(limit):
+    orders = sorted(account_orders(), key=order_time_key)
+
+    pages = walk(lambda n, before: keyset_page(orders, n, before), limit)
+
+    assert [order_id for page in pages for order_id in page] == newest_first(orders)
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4])
+def test_order_history_pages_cover_every_order_once(backend, limit):
+    orders = account_orders()
+    for order in orders:
+        data_manager.save_order_data(order)
+    data_manager.save_order_data(dict(orders[0], placingAccountID="acc901", orderID="ORD9999"))
+
+    pages = walk(lambda n, before: data_manager.get_order_headers_page_data("acc900", n, before), limit)
+
+    walked = [order_id for page in pages for order_id in page]
+    assert len(walked) == len(set(walked)) # Nothing repeated
+    assert walked == newest_first(orders) # Nothing skipped, newest first
+    assert all(len(page) == limit for page in pages[:-1])
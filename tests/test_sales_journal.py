@@ -0,0 +1,138 @@
+# artproject/tests/test_sales_journal.py
+# The order journal (app/sales_journal.py): replay over the base file, other
+# processes' appends and compactions, partial lines and version checks.
+import json
+import os
+
+import pytest
+
+from app import data_manager
+from app.sales_journal import SalesJournal
+from app.versioning import VersionConflictError
+
+on_journal = pytest.mark.parametrize("backend", ["journal"], indirect=True)
+
+
+def order(order_id, account_id="acc900", **fields):
+    return dict({"orderID": order_id, "placingAccountID": account_id, "status": "PAID", "totalAmount": 10.0,
+                 "orderLinetems": [], "orderTimestamp": "2026-03-01T10:00:00+00:00"}, **fields)
+
+
+def journal_line(record):
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+@pytest.fixture
+def journal(backend):
+    return data_manager.get_sales_journal()
+
+
+@on_journal
+def test_journal_is_replayed_over_the_base_file(journal):
+    base = data_manager.read_json_file(journal.base_path)
+    with open(journal.journal_path, 'ab') as f:
+        f.write(journal_line(dict(base[0], status="REFUNDED", version=1)))
+        f.write(journal_line(order("ORD9001")))
+
+    reader = SalesJournal(journal.base_path)
+
+    assert reader.get(base[0]["orderID"])["status"] == "REFUNDED"
+    assert reader.get("ORD9001") == order("ORD9001")
+    assert reader.stats()["orders"] == len(base) + 1
+    assert reader.stats()["journal_records"] == 2
+    assert [o["orderID"] for o in reader.get_all()][:2] == [base[0]["orderID"], base[1]["orderID"]]
+
+
+@on_journal
+def test_appends_are_picked_up_by_another_instance(journal):
+    reader = SalesJournal(journal.base_path)
+    assert reader.get("ORD9001") is None
+
+    journal.append(order("ORD9001"))
+    journal.append(order("ORD9001", status="CANCELLED"), expected_version=1)
+
+    assert reader.get("ORD9001")["status"] == "CANCELLED"
+    assert reader.get("ORD9001")["version"] == 2
+
+
+@on_journal
+def test_compaction_by_another_instance_makes_readers_reload(journal):
+    reader = SalesJournal(journal.base_path)
+    journal.append(order("ORD9001"))
+    assert reader.get("ORD9001")["version"] == 1
+
+    assert journal.compact() == 1
+    journal.append(order("ORD9002", totalAmount=12345.0)) # Regrows the new journal past the reader's offset
+    journal.append(order("ORD9003"))
+
+    assert os.path.getsize(journal.journal_path) > reader._journal_offset
+    assert reader.get("ORD9001")["version"] == 1
+    assert reader.get("ORD9002")["totalAmount"] == 12345.0
+    assert reader.get("ORD9003") is not None
+    assert reader.stats()["journal_records"] == 2
+
+
+@on_journal
+def test_replaced_journal_is_detected_by_its_inode(journal):
+    reader = SalesJournal(journal.base_path)
+    journal.append(order("ORD9001"))
+    assert reader.get("ORD9001") is not None
+
+    # Another process swaps in a new, longer journal while the base stays as it was
+    tmp_path = journal.journal_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(journal_line(order("ORD9002", status="CANCELLED", version=1)))
+        f.write(journal_line(order("ORD9003", version=1)))
+    os.replace(tmp_path, journal.journal_path)
+
+    assert reader.get("ORD9001") is None # Only in the old journal
+    assert reader.get("ORD9002")["status"] == "CANCELLED"
+    assert reader.get("ORD9003") is not None
+
+
+@on_journal
+def test_half_written_last_line_is_skipped_until_complete(journal):
+    journal.append(order("ORD9001"))
+    reader = SalesJournal(journal.base_path)
+    line = journal_line(order("ORD9002", version=1))
+    with open(journal.journal_path, 'ab') as f:
+        f.write(line[:25]) # Another process is halfway through its append
+
+    assert reader.get("ORD9002") is None
+    assert reader.get("ORD9001") is not None
+    offset = reader.stats()["journal_bytes"]
+
+    with open(journal.journal_path, 'ab') as f:
+        f.write(line[25:])
+    assert reader.get("ORD9002") == order("ORD9002", version=1)
+    assert reader.stats()["journal_bytes"] == offset + len(line)
+
+
+@on_journal
+def test_save_versioned_rejects_a_stale_version(journal):
+    assert journal.save_versioned([(order("ORD9001"), None)]) == [1]
+    journal.append(order("ORD9001", status="CANCELLED"), expected_version=1)
+    size = os.path.getsize(journal.journal_path)
+
+    results = journal.save_versioned([(order("ORD9001", status="REFUNDED"), 1), (order("ORD9002"), 0)])
+
+    assert isinstance(results[0], VersionConflictError)
+    assert (results[0].expected_version, results[0].current_version) == (1, 2)
+    assert results[1] == 1
+    assert journal.get("ORD9001")["status"] == "CANCELLED"
+    assert SalesJournal(journal.base_path).get("ORD9001")["status"] == "CANCELLED"
+    assert os.path.getsize(journal.journal_path) > size # Only the accepted save was appended
+    with pytest.raises(VersionConflictError):
+        journal.append(order("ORD9001"), expected_version=1)
+
+
+@on_journal
+def test_compacts_after_compact_every_records(journal):
+    journal.compact_every = 3
+    for i in range(3):
+        journal.append(order(f"ORD900{i}"))
+
+    assert journal.stats()["journal_records"] == 0
+    assert os.path.getsize(journal.journal_path) == 0
+    base_ids = {o["orderID"] for o in data_manager.read_json_file(journal.base_path)}
+    assert {"ORD9000", "ORD9001", "ORD9002"} <= base_ids
@@ -0,0 +1,144 @@
+# artproject/tests/test_sales_jsonl.py
+# The JSONL order store (app/sales_jsonl.py): offset index, line prefixes,
+# partial lines, compaction and other processes' writes.
+import json
+
+import pytest
+
+from app import data_manager
+from app.indexes import order_time_key
+from app.sales_jsonl import JsonlSalesStore, _line_keys, encode_order
+
+on_jsonl = pytest.mark.parametrize("backend", ["jsonl"], indirect=True)
+
+
+def order(order_id, account_id="acc900", timestamp="2026-03-01T10:00:00+00:00", **fields):
+    return dict({"orderID": order_id, "placingAccountID": account_id, "status": "PAID",
+                 "totalAmount": 10.0, "orderLinetems": [], "orderTimestamp": timestamp}, **fields)
+
+
+@pytest.fixture
+def store(backend):
+    store = data_manager.get_sales_jsonl()
+    store.stats() # Converts the copied sales.json on first use
+    return store
+
+
+def file_lines(store):
+    with open(store.path, 'rb') as f:
+        return f.read().splitlines()
+
+
+@on_jsonl
+def test_converts_sales_json_on_first_use(store):
+    legacy = data_manager.read_json_file(data_manager.SALES_FILE)
+    assert store.stats()["orders"] == len({o["orderID"] for o in legacy})
+    assert [o["orderID"] for o in store.iter_all()][:3] == [o["orderID"] for o in legacy[:3]]
+
+
+@on_jsonl
+def test_saved_order_is_read_back_by_a_second_instance(store):
+    assert store.save_versioned([(order("ORD9001"), None)]) == [1]
+
+    other = JsonlSalesStore(store.path)
+    assert other.get("ORD9001") == dict(order("ORD9001"), version=1)
+
+    store.save_versioned([(order("ORD9001", status="CANCELLED"), 1)]) # Picked up incrementally
+    assert other.get("ORD9001")["status"] == "CANCELLED"
+    assert other.get("ORD9001")["version"] == 2
+    assert other.get_many(["ORD9001", "nope", "ORD1001"])[0]["orderID"] == "ORD9001"
+
+
+@on_jsonl
+def test_compact_drops_superseded_versions(store):
+    for version in range(5):
+        store.save_versioned([(order("ORD9001", totalAmount=float(version)), version)])
+    orders_before = store.stats()["orders"]
+    bytes_before = store.stats()["file_bytes"]
+
+    reclaimed = store.compact()
+
+    assert reclaimed > 0
+    assert store.stats()["file_bytes"] == bytes_before - reclaimed == store.stats()["live_bytes"]
+    assert store.stats()["orders"] == orders_before
+    ids = [json.loads(line)["orderID"] for line in file_lines(store)]
+    assert ids.count("ORD9001") == 1
+    assert store.get("ORD9001")["totalAmount"] == 4.0
+    assert store.get("ORD9001")["version"] == 5
+
+
+@on_jsonl
+def test_refresh_reindexes_after_another_process_replaces_the_file(store):
+    store.save_versioned([(order("ORD9001"), None)])
+    assert store.get("ORD9001")["orderID"] == "ORD9001"
+    inode = store._inode
+
+    # Another process rewrites the file with the same orders in a different order
+    # and one more, so the file grows and only the inode tells the offsets are stale
+    other = JsonlSalesStore(store.path)
+    orders = list(reversed(list(other.iter_all()))) + [order("ORD9002")]
+    other.replace_all(orders)
+
+    assert store.get("ORD9001") == dict(order("ORD9001"), version=1)
+    assert store.get("ORD9002")["orderID"] == "ORD9002"
+    assert store._inode != inode
+    assert [o["orderID"] for o in store.iter_all()] == [o["orderID"] for o in orders]
+
+
+@on_jsonl
+def test_partial_last_line_is_indexed_once_complete(store):
+    line = encode_order(order("ORD9001"))
+    orders = store.stats()["orders"]
+    with open(store.path, 'ab') as f:
+        f.write(line[:20]) # Another process is halfway through its append
+    assert store.get("ORD9001") is None
+    assert store.stats()["orders"] == orders
+
+    with open(store.path, 'ab') as f:
+        f.write(line[20:])
+    assert store.get("ORD9001") == order("ORD9001")
+    assert store.stats()["orders"] == orders + 1
+
+
+def test_line_keys_read_from_the_prefix():
+    escaped = order('ORD"9\\1', account_id="accé", timestamp=None)
+    assert _line_keys(encode_order(escaped).rstrip(b'\n')) == \
+        ('ORD"9\\1', "accé", order_time_key(escaped), True)
+    # A line in the older layout (orderTimestamp not in the prefix) is decoded whole
+    legacy = json.dumps({"orderID": "ORD9001", "placingAccountID": "acc900", "status": "PAID",
+                         "orderTimestamp": "2026-03-01T10:00:00+00:00"}, separators=(',', ':')).encode()
+    assert _line_keys(legacy) == ("ORD9001", "acc900", ("2026-03-01T10:00:00+00:00", "ORD9001"), False)
+
+
+@on_jsonl
+def test_next_save_rewrites_lines_in_the_older_layout(store):
+    with open(store.path, 'ab') as f:
+        f.write(json.dumps({"orderID": "ORD9001", "placingAccountID": "acc900", "status": "PAID",
+                            "orderTimestamp": "2026-03-01T10:00:00+00:00"}).encode() + b'\n')
+    store.stats()
+    assert store._unprefixed_lines == 1
+
+    store.save_versioned([(order("ORD9002"), None)])
+
+    assert store._unprefixed_lines == 0
+    assert all(line.startswith(b'{"orderID":') and b',"orderTimestamp":' in line.split(b',"status"')[0]
+               for line in file_lines(store))
+    assert store.get("ORD9001")["status"] == "PAID"
+
+
+@on_jsonl
+def test_page_by_account_with_a_before_cursor(store):
+    timestamps = ["2026-03-01T10:00:00+00:00", "2026-03-02T10:00:00+00:00", "2026-03-02T10:00:00+00:00",
+                  "2026-03-03T10:00:00+00:00", "2026-03-04T10:00:00+00:00"]
+    orders = [order(f"ORD90{i}", timestamp=ts) for i, ts in enumerate(timestamps)]
+    store.save_versioned([(o, None) for o in reversed(orders)])
+    store.save_versioned([(order("ORD9100", account_id="acc901"), None)])
+
+    first = store.get_page_by_account("acc900", 2)
+    assert [o["orderID"] for o in first] == ["ORD904", "ORD903"]
+    second = store.get_page_by_account("acc900", 2, before=order_time_key(first[-1]))
+    assert [o["orderID"] for o in second] == ["ORD902", "ORD901"]
+    third = store.get_page_by_account("acc900", 2, before=order_time_key(second[-1]))
+    assert [o["orderID"] for o in third] == ["ORD900"]
+    assert store.get_page_by_account("acc900", 2, before=order_time_key(third[-1])) == []
+
@@ -0,0 +1,117 @@
+# artproject/tests/test_sales_segments.py
+# Monthly order segments and their manifest (app/sales_segments.py).
+import os
+
+import pytest
+
+from app import data_manager
+from app.sales_segments import UNDATED_SEGMENT, segment_key
+
+on_segments = pytest.mark.parametrize("backend", ["segments"], indirect=True)
+
+
+def order(order_id, timestamp, account_id="acc900", **fields):
+    return dict({"orderID": order_id, "placingAccountID": account_id, "status": "PAID", "totalAmount": 10.0,
+                 "orderLinetems": [], "orderTimestamp": timestamp}, **fields)
+
+
+@pytest.fixture
+def segments(backend):
+    return data_manager.get_sales_segments()
+
+
+def segment_ids(segments, key):
+    return [o["orderID"] for o in data_manager.read_json_file(segments.segment_path(key))]
+
+
+def test_segment_key():
+    assert segment_key({"orderTimestamp": "2025-06-01T00:00:00+00:00"}) == "2025-06"
+    assert segment_key({"orderTimestamp": "2025-12-31T23:59:59Z"}) == "2025-12"
+    assert segment_key({"orderTimestamp": None}) == UNDATED_SEGMENT
+    assert segment_key({"orderTimestamp": "yesterday"}) == UNDATED_SEGMENT
+
+
+@on_segments
+def test_first_use_splits_sales_json_by_month(segments):
+    legacy = data_manager.read_json_file(data_manager.SALES_FILE)
+
+    stats = segments.stats()
+
+    months = sorted({segment_key(o) for o in legacy})
+    assert stats == {"orders": len(legacy), "segments": months}
+    for key in months:
+        assert segment_ids(segments, key) == [o["orderID"] for o in legacy if segment_key(o) == key]
+    manifest = data_manager.read_json_file(segments.manifest_path)
+    assert manifest == {o["orderID"]: segment_key(o) for o in legacy}
+
+
+@on_segments
+def test_new_orders_are_filed_under_their_month(segments):
+    results = segments.save_versioned([(order("ORD9001", "2027-02-14T09:00:00+00:00"), None),
+                                       (order("ORD9002", "2025-05-30T23:00:00+00:00"), None),
+                                       (order("ORD9003", None), None)])
+
+    assert results == [1, 1, 1]
+    assert segment_ids(segments, "2027-02") == ["ORD9001"]
+    assert segment_ids(segments, "2025-05")[-1] == "ORD9002"
+    assert segment_ids(segments, UNDATED_SEGMENT) == ["ORD9003"]
+    assert segments.segment_keys()[-2:] == ["2027-02", UNDATED_SEGMENT] # Undated sorts last
+    manifest = data_manager.read_json_file(segments.manifest_path)
+    assert (manifest["ORD9001"], manifest["ORD9002"], manifest["ORD9003"]) == ("2027-02", "2025-05", UNDATED_SEGMENT)
+    assert data_manager.get_order_by_id_data("ORD9001")["version"] == 1
+
+
+@on_segments
+def test_orders_never_move_between_segments(segments):
+    segments.save_versioned([(order("ORD9001", "2027-02-14T09:00:00+00:00"), None)])
+
+    segments.save_versioned([(order("ORD9001", "2027-03-01T09:00:00+00:00", status="CANCELLED"), 1)])
+
+    assert segment_ids(segments, "2027-02") == ["ORD9001"]
+    assert not os.path.exists(segments.segment_path("2027-03"))
+    assert segments.get("ORD9001")["status"] == "CANCELLED"
+
+
+@on_segments
+def test_replace_all_leaves_exactly_the_given_orders(segments):
+    segments.stats()
+    orders = [order("ORD9001", "2027-02-14T09:00:00+00:00"), order("ORD9002", "2027-04-01T09:00:00+00:00"),
+              order("ORD9003", "2027-02-20T09:00:00+00:00")]
+
+    data_manager.save_all_sales_data(orders)
+
+    assert segments.segment_keys() == ["2027-02", "2027-04"]
+    assert segment_ids(segments, "2027-02") == ["ORD9001", "ORD9003"]
+    assert data_manager.read_json_file(segments.manifest_path) == \
+        {"ORD9001": "2027-02", "ORD9002": "2027-04", "ORD9003": "2027-02"}
+    assert [o["orderID"] for o in data_manager.get_all_sales_data()] == ["ORD9001", "ORD9003", "ORD9002"]
+    assert data_manager.get_order_by_id_data("ORD1001") is None
+
+
+@on_segments
+def test_get_all_sales_data_reads_segments_only_as_it_reaches_them(segments, monkeypatch):
+    segments.save_versioned([(order("ORD9001", "2027-02-14T09:00:00+00:00"), None)])
+    data_manager.clear_cache()
+    read = []
+    read_json_file_cached = data_manager.read_json_file_cached
+    monkeypatch.setattr(data_manager, "read_json_file_cached",
+                        lambda path: read.append(os.path.basename(path)) or read_json_file_cached(path))
+
+    orders = data_manager.get_all_sales_data()
+    assert read == []
+    first = next(orders)
+    assert read == ["sales-2025-05.json"]
+    assert segment_key(first) == "2025-05"
+
+    assert [o["orderID"] for o in orders][-1] == "ORD9001"
+    assert read == ["sales-2025-05.json", "sales-2025-06.json", "sales-2027-02.json"]
+
+
+@on_segments
+def test_lost_manifest_is_rebuilt_from_the_segments(segments):
+    segments.save_versioned([(order("ORD9001", "2027-02-14T09:00:00+00:00"), None)])
+    expected = data_manager.read_json_file(segments.manifest_path)
+    os.remove(segments.manifest_path)
+
+    assert data_manager.get_order_by_id_data("ORD9001")["orderID"] == "ORD9001"
+    assert data_manager.read_json_file(segments.manifest_path) == expected
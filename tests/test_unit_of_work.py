@@ -0,0 +1,204 @@
+# artproject/tests/test_unit_of_work.py
+# A checkout's seat, stock and order changes commit together or not at all
+# (app/unit_of_work.py, data_manager.commit_unit_of_work).
+import sqlite3
+
+import pytest
+
+from app import data_manager, sqlite_store, versioning
+from app.indexes import DuplicateKeyError
+from app.models.merchandise import Merchandise
+from app.models.enums import OrderStatus
+from app.models.order import Order, SalesLineItem
+from app.models.trip import Trip
+from app.unit_of_work import current_unit_of_work, unit_of_work
+from app.versioning import ShortfallError, VersionConflictError
+
+
+def new_order(order_id="ORD9001"):
+    return {
+        "orderID": order_id,
+        "placingAccountID": "acc001",
+        "orderLinetems": [{"lineItemID": "sli9001", "item_id": "art002", "item_type": "merchandise",
+                           "item_name": "ART Smart Journey Mug", "quantity": 2, "unit_price": 18.5,
+                           "lineTotal": 37.0, "line_item_status": "ACTIVE"}],
+        "totalAmount": 37.0,
+        "payment": None,
+        "status": "PENDING",
+        "cancellationRequests": [],
+        "refundRequests": [],
+        "orderTimestamp": "2026-01-01T00:00:00+00:00",
+    }
+
+
+def checkout(trip, item, order, expected_version=None):
+    """Sells one seat and two items and saves the order, as one operation."""
+    with unit_of_work():
+        trip.update_availability(-1)
+        item.update_stock(-2)
+        current_unit_of_work().register_save("sales", order["orderID"], order, expected_version)
+
+
+def stored_levels():
+    return (data_manager.get_trip_by_id_data("TRP001")["available_seats"],
+            data_manager.get_merchandise_by_id_data("art002")["stockLevel"])
+
+
+def fail_order_writes(backend, monkeypatch):
+    """Makes the order write of the next operation fail, after the other stores were checked."""
+    if backend == "sqlite":
+        def upsert_order(conn, order):
+            raise sqlite3.OperationalError("disk I/O error")
+        table, key_column, key_field, _, read = sqlite_store._UNIT_OF_WORK_TABLES["sales"]
+        monkeypatch.setitem(sqlite_store._UNIT_OF_WORK_TABLES, "sales", (table, key_column, key_field, upsert_order, read))
+        return sqlite3.OperationalError
+    commit_record_batch = data_manager._commit_record_batch
+
+    def failing_batch(store_name, items):
+        if store_name == "sales":
+            raise OSError("No space left on device")
+        return commit_record_batch(store_name, items)
+    monkeypatch.setattr(data_manager, "_commit_record_batch", failing_batch)
+    return OSError
+
+
+def test_checkout_commits_every_store(backend):
+    seats, stock = stored_levels()
+    trip, item = Trip.get_by_id("TRP001"), Merchandise.get_by_id("art002")
+
+    checkout(trip, item, new_order())
+
+    assert stored_levels() == (seats - 1, stock - 2)
+    assert (trip.available_seats, item.stockLevel) == (seats - 1, stock - 2)
+    assert data_manager.get_order_by_id_data("ORD9001")["version"] == 1
+    assert Trip.get_by_id("TRP001").available_seats == seats - 1 # The catalog sees the commit
+
+
+def test_failed_order_write_leaves_seats_and_stock_unchanged(backend, monkeypatch):
+    seats, stock = stored_levels()
+    trip, item = Trip.get_by_id("TRP001"), Merchandise.get_by_id("art002")
+    error = fail_order_writes(backend, monkeypatch)
+
+    with pytest.raises(error):
+        checkout(trip, item, new_order())
+
+    assert stored_levels() == (seats, stock)
+    assert data_manager.get_order_by_id_data("ORD9001") is None
+    assert (trip.available_seats, item.stockLevel) == (seats, stock)
+    assert Trip.get_by_id("TRP001").available_seats == seats
+    assert Merchandise.get_by_id("art002").stockLevel == stock
+
+
+def test_order_version_conflict_leaves_seats_and_stock_unchanged(backend):
+    seats, stock = stored_levels()
+    order = data_manager.get_order_by_id_data("ORD1001")
+    stale_version = versioning.record_version(order)
+    data_manager.save_order_data(order, expected_version=stale_version) # Another request updates the order
+
+    with pytest.raises(VersionConflictError):
+        checkout(Trip.get_by_id("TRP001"), Merchandise.get_by_id("art002"), order, expected_version=stale_version)
+
+    assert stored_levels() == (seats, stock)
+    assert versioning.record_version(data_manager.get_order_by_id_data("ORD1001")) == stale_version + 1
+
+
+def test_insufficient_stock_fails_the_whole_operation(backend):
+    seats, stock = stored_levels()
+    trip, item = Trip.get_by_id("TRP001"), Merchandise.get_by_id("art002")
+
+    with pytest.raises(ShortfallError) as excinfo:
+        with unit_of_work():
+            trip.update_availability(-1)
+            item.update_stock(-(stock + 1))
+            current_unit_of_work().register_save("sales", "ORD9001", new_order(), None)
+
+    assert (excinfo.value.key, excinfo.value.field) == ("art002", "stockLevel")
+    assert (excinfo.value.available, excinfo.value.requested) == (stock, stock + 1)
+    assert stored_levels() == (seats, stock)
+    assert data_manager.get_order_by_id_data("ORD9001") is None
+
+
+def test_missing_record_is_not_a_shortfall(backend):
+    with pytest.raises(ValueError) as excinfo:
+        with unit_of_work():
+            current_unit_of_work().register_delta("trips", "TRP999", "available_seats", -1)
+    assert not isinstance(excinfo.value, ShortfallError)
+
+
+def test_ticket_order_reports_seats_sold_out_before_commit(backend):
+    trip = Trip.get_by_id("TRP001")
+    stored = data_manager.get_trip_by_id_data("TRP001")
+    data_manager.save_trip_data(dict(stored, available_seats=0)) # Sold out after the trip was loaded
+    orders = len(data_manager.get_order_headers_page_data("acc001", 1000))
+
+    with pytest.raises(ValueError, match="Not enough seats"):
+        Order.create_ticket_order("acc001", "TRP001", "Simulated Card", trip=trip)
+
+    assert data_manager.get_trip_by_id_data("TRP001")["available_seats"] == 0
+    assert len(data_manager.get_order_headers_page_data("acc001", 1000)) == orders
+
+
+def test_ticket_order_does_not_relabel_other_commit_errors(backend, monkeypatch):
+    seats, _ = stored_levels()
+
+    def duplicate(saves, deltas):
+        raise DuplicateKeyError("Order ID already taken.")
+    monkeypatch.setattr(data_manager, "commit_unit_of_work", duplicate)
+
+    with pytest.raises(RuntimeError) as excinfo:
+        Order.create_ticket_order("acc001", "TRP001", "Simulated Card")
+    assert isinstance(excinfo.value.__cause__, DuplicateKeyError)
+    assert stored_levels()[0] == seats
+
+
+def pending_merchandise_order(quantity):
+    order = Order(orderID="ORD9001", placingAccountID="acc001")
+    order.add_line_item(SalesLineItem(lineItemID="sli9001", item_id="art002", item_type="merchandise",
+                                      quantity=quantity, unit_price=18.5, item_name="ART Smart Journey Mug"))
+    order.save()
+    return order
+
+
+def test_failed_payment_commit_leaves_the_order_unpaid(backend):
+    _, stock = stored_levels()
+    order = pending_merchandise_order(stock + 1)
+
+    with pytest.raises(ShortfallError):
+        order.process_payment("Simulated Card")
+
+    assert order.status == OrderStatus.PENDING_PAYMENT
+    assert order.payment is None
+    stored = data_manager.get_order_by_id_data("ORD9001")
+    assert stored["status"] == OrderStatus.PENDING_PAYMENT.value
+    assert not stored.get("payment")
+    assert stored_levels()[1] == stock
+
+
+def test_merchandise_order_is_marked_failed_when_its_commit_fails(backend, monkeypatch):
+    _, stock = stored_levels()
+
+    def disk_full(saves, deltas):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(data_manager, "commit_unit_of_work", disk_full)
+
+    with pytest.raises(RuntimeError) as excinfo:
+        Order.create_merchandise_order("acc001", [{"merch_id": "art002", "quantity": 2}], "Simulated Card")
+
+    order_id = str(excinfo.value).rsplit(" ", 1)[-1].rstrip(".")
+    stored = data_manager.get_order_by_id_data(order_id)
+    assert stored["status"] == OrderStatus.FAILED.value
+    assert not stored.get("payment") # The payment was never committed
+    assert stored_levels()[1] == stock
+
+
+def test_exception_in_block_discards_changes(backend):
+    seats, stock = stored_levels()
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            Trip.get_by_id("TRP001").update_availability(-1)
+            Merchandise.get_by_id("art002").update_stock(-2)
+            raise RuntimeError("payment declined")
+
+    assert stored_levels() == (seats, stock)
+    assert current_unit_of_work() is None
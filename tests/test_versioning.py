@@ -0,0 +1,117 @@
+# artproject/tests/test_versioning.py
+# Compare-and-swap saves of trips, merchandise and orders, and the bounded
+# re-read + re-apply retry of seat and stock changes (app/versioning.py).
+import pytest
+
+from app import data_manager, versioning
+from app.models import merchandise as merchandise_module
+from app.models import trip as trip_module
+from app.models.merchandise import Merchandise
+from app.models.trip import Trip
+from app.versioning import SAVE_RETRY_ATTEMPTS, VersionConflictError
+
+STORES = [
+    # (save, load, key, field that is changed)
+    (data_manager.save_trip_data, data_manager.get_trip_by_id_data, "TRP001", "available_seats"),
+    (data_manager.save_merchandise_data, data_manager.get_merchandise_by_id_data, "art001", "stockLevel"),
+    (data_manager.save_order_data, data_manager.get_order_by_id_data, "ORD1001", "totalAmount"),
+]
+
+
+@pytest.mark.parametrize("save, load, key, field", STORES, ids=["trip", "merchandise", "order"])
+def test_save_with_current_version_bumps_it(backend, save, load, key, field):
+    record = load(key)
+    version = versioning.record_version(record)
+    new_version = save(dict(record, **{field: record[field] + 1}), expected_version=version)
+    assert new_version == version + 1
+    stored = load(key)
+    assert stored[field] == record[field] + 1
+    assert versioning.record_version(stored) == version + 1
+
+
+@pytest.mark.parametrize("save, load, key, field", STORES, ids=["trip", "merchandise", "order"])
+def test_save_with_stale_version_raises_conflict(backend, save, load, key, field):
+    record = load(key)
+    version = versioning.record_version(record)
+    save(dict(record, **{field: record[field] + 1}), expected_version=version) # Another writer gets there first
+
+    with pytest.raises(VersionConflictError) as excinfo:
+        save(dict(record, **{field: record[field] + 5}), expected_version=version)
+    assert excinfo.value.key == key
+    assert excinfo.value.expected_version == version
+    assert excinfo.value.current_version == version + 1
+    stored = load(key)
+    assert stored[field] == record[field] + 1 # The other writer's change survives
+    assert versioning.record_version(stored) == version + 1
+
+
+def test_save_without_expected_version_overwrites(backend):
+    record = data_manager.get_trip_by_id_data("TRP001")
+    version = versioning.record_version(record)
+    data_manager.save_trip_data(dict(record, available_seats=1), expected_version=version)
+    assert data_manager.save_trip_data(dict(record, available_seats=2)) == version + 2
+    assert data_manager.get_trip_by_id_data("TRP001")["available_seats"] == 2
+
+
+def test_update_availability_reapplies_change_after_conflict(backend, monkeypatch):
+    waits = []
+    monkeypatch.setattr(trip_module, "wait_before_retry", waits.append)
+    trip = Trip.get_by_id("TRP001")
+    seats = trip.available_seats
+    stored = data_manager.get_trip_by_id_data("TRP001")
+    data_manager.save_trip_data(dict(stored, available_seats=seats - 3), # Someone else sells 3 seats
+                                expected_version=versioning.record_version(stored))
+
+    trip.update_availability(-2)
+
+    assert waits == [0]
+    assert trip.available_seats == seats - 5
+    stored = data_manager.get_trip_by_id_data("TRP001")
+    assert stored["available_seats"] == seats - 5
+    assert trip.version == versioning.record_version(stored)
+
+
+def test_update_stock_reapplies_change_after_conflict(backend, monkeypatch):
+    waits = []
+    monkeypatch.setattr(merchandise_module, "wait_before_retry", waits.append)
+    item = Merchandise.get_by_id("art002")
+    stock = item.stockLevel
+    stored = data_manager.get_merchandise_by_id_data("art002")
+    data_manager.save_merchandise_data(dict(stored, stockLevel=stock + 10), # A restock lands in between
+                                       expected_version=versioning.record_version(stored))
+
+    item.update_stock(-4)
+
+    assert waits == [0]
+    assert item.stockLevel == stock + 6
+    assert data_manager.get_merchandise_by_id_data("art002")["stockLevel"] == stock + 6
+
+
+def test_update_availability_gives_up_after_retry_attempts(backend, monkeypatch):
+    save_trip_data = data_manager.save_trip_data
+
+    def contended_save(trip_data, expected_version=None):
+        # Another writer changes the trip just before every save
+        stored = data_manager.get_trip_by_id_data(trip_data["id"])
+        save_trip_data(stored, expected_version=versioning.record_version(stored))
+        return save_trip_data(trip_data, expected_version=expected_version)
+
+    waits = []
+    monkeypatch.setattr(trip_module, "wait_before_retry", waits.append)
+    trip = Trip.get_by_id("TRP002")
+    seats = trip.available_seats
+    monkeypatch.setattr(data_manager, "save_trip_data", contended_save)
+
+    with pytest.raises(VersionConflictError):
+        trip.update_availability(-1)
+    assert waits == list(range(SAVE_RETRY_ATTEMPTS))
+    assert data_manager.get_trip_by_id_data("TRP002")["available_seats"] == seats
+
+
+def test_wait_before_retry_backs_off_exponentially(monkeypatch):
+    ceilings = []
+    monkeypatch.setattr(versioning.random, "uniform", lambda low, high: ceilings.append(high) or 0.0)
+    monkeypatch.setattr(versioning.time, "sleep", lambda seconds: None)
+    for attempt in range(4):
+        versioning.wait_before_retry(attempt)
+    assert ceilings == [versioning.RETRY_BACKOFF_SECONDS * 2 ** attempt for attempt in range(4)]